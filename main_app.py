@@ -1,50 +1,188 @@
-import json
-from pathlib import Path
-from nicegui import ui
-from mcrcon_new.rcon_manager import RCONManager
+import asyncio
+import re
+import time
+from datetime import datetime
+from dataclasses import asdict
+from nicegui import app, background_tasks, ui
+from mcrcon_new import metrics, services
+from mcrcon_new.command_queue import INTERACTIVE
+from mcrcon_new.presence import StatusUpdated, PlayersChanged
+from mcrcon_new.ban_sync import BansChanged
+from mcrcon_new.jobs import JOB_TYPES, DEFAULT_ITEM_THRESHOLD, DIMENSIONS, JobFinished, dimension_label, make_trigger
+from mcrcon_new.console import COMMAND, RESPONSE, ConsoleAppended
+from mcrcon_new.health import HealthChanged, describe
+from mcrcon_new.players import format_duration
 
 # --- 全局状态和管理器 ---
-rcon_manager = RCONManager()
-# 用于UI回调的共享对象
-rcon_manager.ui_update_callbacks = {}
+# 共享实例定义在 services 模块中，保证所有客户端使用同一份
+rcon_manager = services.rcon_manager
+async_rcon = services.async_rcon
+status_cache = services.status_cache
+event_bus = services.event_bus
+fleet = services.fleet
+job_engine = services.job_engine
+greeter = services.greeter
+console = services.console
+health = services.health
+audit = services.audit
+players = services.players
+services.install(app)
 
-# --- 数据加载 ---
-def load_items():
-    
-    """从 data/items.json 安全地加载物品数据"""
-    items_map = {}
-    
-    
-    
+# 只采用这些地址上的反向代理传来的用户名，否则任何客户端都能伪造审计日志中的管理员
+TRUSTED_PROXIES = frozenset(rcon_manager.audit_settings.get('trusted_proxies', []))
+
+def current_admin():
+    """发起当前操作的管理员：可信反向代理认证传来的用户名，没有时为浏览器的 IP 地址"""
     try:
-        data_path = Path(__file__).parent / 'data/items.json'
-        with open(data_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-            # 创建中文名到ID的映射
-            if 'items' in data:
-                items_map = {item['name']: item['id'] for item in data['items']}
-    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
-        print(f"Error loading data: {e}") # 打印错误以供调试
-    return items_map
+        client = ui.context.client
+    except RuntimeError:
+        # 后台任务中没有页面上下文
+        return None
+    if client.ip in TRUSTED_PROXIES:
+        headers = client.request.headers
+        user = headers.get('X-Forwarded-User') or headers.get('Remote-User')
+        if user:
+            return user
+    return client.ip or None
+
+audit.resolve_actor = current_admin
+
+def subscribe_ui(event_type, handler, owner):
+    """订阅事件并绑定到界面元素的生命周期，元素删除后自动取消订阅"""
+    async def callback(event):
+        if owner.is_deleted:
+            unsubscribe()
+            return
+        with owner:
+            result = handler(event)
+            if asyncio.iscoroutine(result):
+                await result
+    unsubscribe = event_bus.subscribe(event_type, callback)
+    return unsubscribe
+
+class KeyedList:
+    """按键增量维护容器中的行：只创建新增的行、删除消失的行
+
+    ``render_row(key)`` 在容器上下文中创建并返回一行元素；
+    ``render_empty()`` 在列表为空时显示占位内容。键序列未变化时什么也不做。
+    """
+
+    def __init__(self, container, render_row, render_empty=None):
+        self.container = container
+        self.render_row = render_row
+        self.render_empty = render_empty
+        self.rows = {}
+        self.placeholder = None
+        self.keys = None
+
+    def update(self, keys):
+        keys = list(dict.fromkeys(keys))
+        if keys == self.keys:
+            return
+        self.keys = keys
+        wanted = set(keys)
+        for key in [k for k in self.rows if k not in wanted]:
+            self.container.remove(self.rows.pop(key))
+
+        with self.container:
+            if keys and self.placeholder is not None:
+                self.container.remove(self.placeholder)
+                self.placeholder = None
+            elif not keys and self.placeholder is None and self.render_empty:
+                self.placeholder = self.render_empty()
+            for index, key in enumerate(keys):
+                if key not in self.rows:
+                    self.rows[key] = self.render_row(key)
+                    self.rows[key].move(target_index=index)
+
+# --- 数据加载 ---
+# 物品索引在 services 中只构建一次，页面按输入向它查询候选
+item_index = services.item_index
+ITEM_SUGGESTIONS = 20
+PLAYER_SUGGESTIONS = 20
+# 仪表盘状态历史的时间范围（秒），对应的汇总级别由 TimeSeriesStore.history 选择
+HISTORY_RANGES = {3600: '1小时', 86400: '24小时', 7 * 86400: '7天', 30 * 86400: '30天', 365 * 86400: '1年'}
+# 审计日志的快捷时间范围（秒），0 为自定义起止时间
+AUDIT_RANGES = {3600: '最近1小时', 86400: '最近24小时', 7 * 86400: '最近7天', 30 * 86400: '最近30天', 0: '自定义'}
+
+def item_search_select(label='选择物品'):
+    """带服务端模糊搜索的物品选择框，值为物品ID"""
+    def options_for(query, current=None):
+        options = {item['id']: f"{item['name']} ({item['id']})" for item in item_index.search(query, ITEM_SUGGESTIONS)}
+        # 保留当前选中项，避免更新候选时丢失选择
+        if current and current not in options:
+            options[current] = current
+        return options
+
+    select = ui.select(options=options_for(''), label=label, with_input=True).props('clearable')
+
+    def on_input(e):
+        select.set_options(options_for(e.args or '', select.value), value=select.value)
+
+    # 停止输入约 0.3 秒后才查询一次，避免每次按键都请求
+    select.on('input-value', on_input, throttle=0.3, leading_events=False)
+    return select
+
+def player_search_select(label='选择玩家', multiple=False, new_values=False):
+    """从玩家档案补全名字的选择框，在线玩家排在前面；``new_values`` 允许输入档案中没有的名字"""
+    def options_for(query, current=None):
+        online = set(players.online_names())
+        options = {name: f'{name} · 在线' if name in online else name
+                   for name in players.complete(query, PLAYER_SUGGESTIONS)}
+        # 保留当前选中项，避免更新候选时丢失选择
+        for value in (current or []) if multiple else [current]:
+            if value and value not in options:
+                options[value] = value
+        return options
+
+    select = ui.select(options=options_for(''), label=label, with_input=True, multiple=multiple,
+                       value=[] if multiple else None,
+                       new_value_mode='add-unique' if new_values else None).props('clearable')
+    query = {'text': ''}
+
+    def refresh():
+        select.set_options(options_for(query['text'], select.value), value=select.value)
+
+    def on_input(e):
+        query['text'] = e.args or ''
+        refresh()
 
-item_map = load_items()
+    select.on('input-value', on_input, throttle=0.3, leading_events=False)
+    # 玩家上下线后更新候选的顺序与在线标记
+    subscribe_ui(PlayersChanged, lambda e: refresh(), select)
+    return select
 
 # --- 核心逻辑 ---
-def execute_command_with_feedback(command: str):
+async def execute_command_with_feedback(command: str, priority=INTERACTIVE):
     """执行命令并根据响应提供用户反馈"""
     if not command:
         ui.notify('命令不能为空!', type='warning', position='bottom')
         return
-    response = rcon_manager.command(command)
-    
-    
-    fail_keywords = ['failed', 'nothing', 'unknown', 'incorrect', 'not found', 'invalid']
-    if any(keyword in response.lower() for keyword in fail_keywords):
+    response = await async_rcon.command(command, priority=priority)
+    notify_response(response, command)
+    return response
+
+def notify_response(response: str, command: str = None):
+    """根据命令响应内容提示成功或可能失败，``command`` 用于放宽幂等命令（如重复封禁）的判断"""
+    if rcon_manager.parser.is_failure(response, command):
         ui.notify(f"命令可能已失败: {response}", type='negative', position='bottom', multi_line=True)
     else:
         ui.notify(f"命令已发送: {response}", type='positive', position='bottom', multi_line=True)
-    return response
+
+def show_batch_report(report):
+    """弹窗展示批量操作的汇总与失败明细"""
+    ui.notify(report.summary(), type='negative' if report.failed else 'positive', position='bottom')
+    if not report.failed:
+        return
+    with ui.dialog() as dialog, ui.card().classes('w-full'):
+        ui.label(report.summary()).classes('text-h6')
+        rows = [{'command': r.command, 'detail': r.error or r.response} for r in report.failed]
+        ui.table(columns=[
+            {'name': 'command', 'label': '命令', 'field': 'command', 'align': 'left'},
+            {'name': 'detail', 'label': '失败原因', 'field': 'detail', 'align': 'left'},
+        ], rows=rows, pagination=20).classes('w-full')
+        ui.button('关闭', on_click=dialog.close)
+    dialog.open()
 
 # --- 页面内容定义 ---
 
@@ -52,70 +190,190 @@ def dashboard_page():
     """仪表盘页面"""
     ui.label('仪表盘').classes('text-h4 q-mb-md text-grey-8')
 
-    def update_ui():
-        status = rcon_manager.get_server_status()
-        status_card.clear()
-        with status_card:
-            if status['online']:
-                ui.icon('check_circle', color='positive', size='lg').classes('q-mr-md')
-                with ui.column():
-                    ui.label('服务器状态').classes('text-subtitle2')
-                    ui.label('在线').classes('text-h6 font-weight-bold text-positive')
-            else:
-                ui.icon('error', color='negative', size='lg').classes('q-mr-md')
-                with ui.column():
-                    ui.label('服务器状态').classes('text-subtitle2')
-                    ui.label('离线').classes('text-h6 font-weight-bold text-negative')
-
-        player_count_card.clear()
-        with player_count_card:
-            ui.icon('people', color='blue-grey-5', size='lg').classes('q-mr-md')
-            with ui.column():
-                ui.label('在线玩家').classes('text-subtitle2')
-                ui.label(str(status['player_count'])).classes('text-h6 font-weight-bold')
-
-        player_list.clear()
-        with player_list:
-            if status['players']:
-                for player in status['players']:
-                    with ui.item().classes('rounded-borders q-mb-sm bg-grey-2'):
-                        with ui.item_section().props('avatar'):
-                            ui.icon('person', color='primary')
-                        with ui.item_section():
-                            ui.label(player).classes('font-weight-medium')
-            else:
-                with ui.row().classes('items-center text-grey-6'):
-                    ui.icon('info', size='sm').classes('q-mr-sm')
-                    ui.label('当前没有玩家在线')
+    last_status = None
+
+    def render_player_row(player):
+        with ui.item().classes('rounded-borders q-mb-sm bg-grey-2') as row:
+            with ui.item_section().props('avatar'):
+                ui.icon('person', color='primary')
+            with ui.item_section():
+                ui.label(player).classes('font-weight-medium')
+        return row
+
+    def render_no_players():
+        with ui.row().classes('items-center text-grey-6') as row:
+            ui.icon('info', size='sm').classes('q-mr-sm')
+            ui.label('当前没有玩家在线')
+        return row
+
+    def update_ui(status):
+        nonlocal last_status
+        # 快照未变化时不向客户端推送任何内容
+        if status == last_status:
+            return
+        last_status = status
+        online_row.set_visibility(status['online'])
+        offline_row.set_visibility(not status['online'])
+        player_count_label.set_text(str(status['player_count']))
+        player_rows.update(status['players'])
 
     with ui.row().classes('w-full q-col-gutter-md q-mb-md'):
         status_card = ui.card().classes('col-6 row items-center justify-center q-pa-md').style('min-height: 120px')
         player_count_card = ui.card().classes('col-6 row items-center justify-center q-pa-md').style('min-height: 120px')
 
+    # 卡片内容只创建一次，之后仅切换可见性或更新文本
+    with status_card:
+        with ui.row().classes('items-center') as online_row:
+            ui.icon('check_circle', color='positive', size='lg').classes('q-mr-md')
+            with ui.column():
+                ui.label('服务器状态').classes('text-subtitle2')
+                ui.label('在线').classes('text-h6 font-weight-bold text-positive')
+        with ui.row().classes('items-center') as offline_row:
+            ui.icon('error', color='negative', size='lg').classes('q-mr-md')
+            with ui.column():
+                ui.label('服务器状态').classes('text-subtitle2')
+                ui.label('离线').classes('text-h6 font-weight-bold text-negative')
+        online_row.set_visibility(False)
+
+    with player_count_card:
+        ui.icon('people', color='blue-grey-5', size='lg').classes('q-mr-md')
+        with ui.column():
+            ui.label('在线玩家').classes('text-subtitle2')
+            player_count_label = ui.label('0').classes('text-h6 font-weight-bold')
+
     with ui.card().classes('w-full'):
         with ui.card_section():
             ui.label('在线玩家列表').classes('text-h6')
         ui.separator()
         player_list = ui.list().classes('q-pa-md')
+        player_rows = KeyedList(player_list, render_player_row, render_no_players)
+
+    with ui.card().classes('w-full q-mt-md'):
+        with ui.card_section():
+            ui.label('RCON 运行指标').classes('text-h6')
+        ui.separator()
+        metric_labels = {}
+        with ui.grid(columns=4).classes('w-full q-pa-md'):
+            for key, title in (('latency', '命令延迟 p50 / p99'), ('connect', '建连 / 验证平均耗时'),
+                               ('size', '平均响应大小'), ('commands', '已执行命令'),
+                               ('errors', '错误'), ('pool', '连接池使用'),
+                               ('cache', '状态缓存命中率'), ('queue', '排队命令')):
+                with ui.column().classes('q-gutter-none'):
+                    ui.label(title).classes('text-subtitle2 text-grey-7')
+                    metric_labels[key] = ui.label('-').classes('text-h6')
+                    if key == 'errors':
+                        error_detail = ui.label().classes('text-caption text-grey-6')
 
-    ui.timer(5.0, update_ui, once=False)
-    update_ui()
+    def update_metrics():
+        m = metrics.overview()
+        command = m['command']
+        metric_labels['latency'].set_text(f"{command['p50'] * 1000:.0f} / {command['p99'] * 1000:.0f} ms")
+        metric_labels['connect'].set_text(f"{m['connect']['avg'] * 1000:.0f} / {m['auth']['avg'] * 1000:.0f} ms")
+        metric_labels['size'].set_text(f"{m['response_bytes']['avg']:.0f} B")
+        metric_labels['commands'].set_text(str(command['count']))
+        errors = m['errors']
+        metric_labels['errors'].set_text(str(sum(errors.values())))
+        error_detail.set_text('，'.join(f'{t}: {n}' for t, n in sorted(errors.items(), key=lambda x: -x[1])))
+        metric_labels['pool'].set_text(f"{m['pool_in_use']} / {m['pool_size']}")
+        metric_labels['cache'].set_text(f"{m['cache_hit_rate'] * 100:.0f}%")
+        metric_labels['queue'].set_text(str(m['queue_depth']))
+
+    with ui.card().classes('w-full q-mt-md'):
+        with ui.card_section():
+            ui.label('服务器负载').classes('text-h6')
+        ui.separator()
+        health_labels = {}
+        with ui.grid(columns=4).classes('w-full q-pa-md'):
+            for name in fleet.servers:
+                with ui.column().classes('q-gutter-none'):
+                    ui.label(name).classes('text-subtitle2 text-grey-7')
+                    health_labels[name] = (ui.label('-').classes('text-h6'), ui.label().classes('text-caption'))
+
+    def update_health():
+        for name, (reading_label, state_label) in health_labels.items():
+            state = health.state(name)
+            reading_label.set_text(describe(state.stats) if state.stats else '-')
+            if state.overloaded:
+                text, color = '过载，自动化已暂缓', 'text-negative'
+            elif state.stats is not None:
+                text, color = '正常', 'text-positive'
+            elif state.unsupported_until:
+                text, color = '服务器不支持 TPS 查询', 'text-grey-6'
+            else:
+                text, color = '尚未探测', 'text-grey-6'
+            state_label.set_text(text)
+            state_label.classes(replace=f'text-caption {color}')
+
+    def on_health_changed(event):
+        update_health()
+        if event.overloaded:
+            ui.notify(f'服务器 {event.server} 负载过高（{describe(event.stats)}），自动化命令已暂缓',
+                      type='warning', position='bottom')
+        else:
+            ui.notify(f'服务器 {event.server} 负载已恢复', type='positive', position='bottom')
+
+    with ui.card().classes('w-full q-mt-md'):
+        with ui.card_section().classes('row items-center q-gutter-md'):
+            ui.label('状态历史').classes('text-h6')
+            history_server = ui.select(list(fleet.servers), value=rcon_manager.name, label='服务器').classes('w-40')
+            history_range = ui.select(HISTORY_RANGES, value=86400, label='时间范围').classes('w-32')
+            availability_label = ui.label().classes('text-subtitle2 text-grey-7')
+        ui.separator()
+        history_chart = ui.echart({
+            'tooltip': {'trigger': 'axis'},
+            'legend': {'data': ['平均人数', '最多人数', 'list 延迟 (ms)']},
+            'xAxis': {'type': 'time'},
+            'yAxis': [{'type': 'value', 'name': '人数', 'minInterval': 1},
+                      {'type': 'value', 'name': 'ms', 'splitLine': {'show': False}}],
+            'series': [
+                {'name': '平均人数', 'type': 'line', 'showSymbol': False, 'data': []},
+                {'name': '最多人数', 'type': 'line', 'step': 'end', 'showSymbol': False, 'data': []},
+                {'name': 'list 延迟 (ms)', 'type': 'line', 'yAxisIndex': 1, 'showSymbol': False, 'data': []},
+            ],
+        }).classes('w-full').style('height: 320px')
+
+    def update_history():
+        # 图表数据来自内存中的汇总桶，不查询数据库也不发送 RCON 请求
+        _, points = services.history.history(history_server.value, history_range.value)
+        options = history_chart.options
+        options['series'][0]['data'] = [[p['start'] * 1000, round(p['players_avg'], 2)] for p in points]
+        options['series'][1]['data'] = [[p['start'] * 1000, p['players_max']] for p in points]
+        options['series'][2]['data'] = [[p['start'] * 1000, None if p['latency_avg'] is None else round(p['latency_avg'], 1)]
+                                        for p in points]
+        history_chart.update()
+        if points:
+            availability = sum(p['availability'] for p in points) / len(points)
+            availability_label.set_text(f'可用性 {availability * 100:.2f}%')
+        else:
+            availability_label.set_text('暂无数据')
+
+    history_server.on_value_change(update_history)
+    history_range.on_value_change(update_history)
+
+    async def load_status():
+        update_ui(await status_cache.get())
+        update_health()
+        update_history()
+
+    # 状态由后台统一刷新并推送，页面不再各自轮询
+    subscribe_ui(StatusUpdated, lambda e: update_ui(e.status), player_list)
+    subscribe_ui(HealthChanged, on_health_changed, player_list)
+    ui.timer(0, load_status, once=True)
+    # 指标只在本进程内存中汇总，定时读取不会产生 RCON 请求
+    ui.timer(2, update_metrics)
+    ui.timer(10, update_health)
+    ui.timer(60, update_history)
 
 def players_page():
     """玩家管理页面"""
     ui.label('玩家管理').classes('text-h4 q-mb-md text-grey-8')
 
-    selects_to_update = []
-
-    def get_player_list():
-        return rcon_manager.get_server_status().get('players', [])
+    async def get_player_list():
+        return (await status_cache.get()).get('players', [])
 
-    initial_players = get_player_list()
-
-    def ban_and_update(player_name):
-        rcon_manager.ban_player(player_name)
-        if 'ban_list' in rcon_manager.ui_update_callbacks:
-            rcon_manager.ui_update_callbacks['ban_list']()
+    async def ban_and_update(player_name):
+        await async_rcon.ban_player(player_name, issuer='panel')
+        await event_bus.publish(BansChanged())
 
     with ui.grid(columns=2).classes('w-full q-col-gutter-md'):
         with ui.column().classes('w-full'):
@@ -124,8 +382,7 @@ def players_page():
                     ui.label('快速操作').classes('text-h6')
                 ui.separator()
                 with ui.card_section():
-                    player_quick = ui.select(options=initial_players, label='选择玩家').classes('w-full')
-                    selects_to_update.append(player_quick)
+                    player_quick = player_search_select().classes('w-full')
                     with ui.row().classes('q-mt-md q-gutter-sm'):
                         ui.button('杀死', on_click=lambda: execute_command_with_feedback(f'kill {player_quick.value}'), color='red-6').props('icon=medical_services')
                         ui.button('踢出', on_click=lambda: execute_command_with_feedback(f'kick {player_quick.value}'), color='orange-6').props('icon=logout')
@@ -137,19 +394,17 @@ def players_page():
                     ui.label('管理员权限').classes('text-h6')
                 ui.separator()
                 with ui.card_section():
-                    player_op = ui.select(options=initial_players, label='选择玩家').classes('w-full')
-                    selects_to_update.append(player_op)
+                    player_op = player_search_select().classes('w-full')
                     with ui.row().classes('q-mt-md q-gutter-sm'):
-                        ui.button('授予OP', on_click=lambda: rcon_manager.op_player(player_op.value), color='positive')
-                        ui.button('撤销OP', on_click=lambda: rcon_manager.deop_player(player_op.value), color='negative')
+                        ui.button('授予OP', on_click=lambda: async_rcon.op_player(player_op.value), color='positive')
+                        ui.button('撤销OP', on_click=lambda: async_rcon.deop_player(player_op.value), color='negative')
 
             with ui.card().classes('w-full q-mt-md'):
                 with ui.card_section():
                     ui.label('切换游戏模式').classes('text-h6')
                 ui.separator()
                 with ui.card_section():
-                    player_gamemode = ui.select(options=initial_players, label='选择玩家').classes('w-full')
-                    selects_to_update.append(player_gamemode)
+                    player_gamemode = player_search_select().classes('w-full')
                     mode = ui.select(['survival', 'creative', 'adventure', 'spectator'], label='游戏模式', value='survival')
                     ui.button('设置模式', on_click=lambda: execute_command_with_feedback(f'gamemode {mode.value} {player_gamemode.value}'), color='primary').classes('q-mt-md')
 
@@ -158,30 +413,66 @@ def players_page():
                     ui.label('传送玩家').classes('text-h6')
                 ui.separator()
                 with ui.card_section():
-                    player_tp = ui.select(options=initial_players, label='传送的玩家').classes('w-full')
-                    selects_to_update.append(player_tp)
+                    player_tp = player_search_select('传送的玩家').classes('w-full')
                     dest = ui.input('目标坐标或玩家').props('clearable')
                     ui.button('执行传送', on_click=lambda: execute_command_with_feedback(f'tp {player_tp.value} {dest.value}'), color='primary').classes('q-mt-md')
 
+            with ui.card().classes('w-full q-mt-md'):
+                with ui.card_section():
+                    ui.label('批量操作').classes('text-h6')
+                ui.separator()
+                with ui.card_section():
+                    bulk_names = ui.textarea(label='玩家名或IP (每行一个，也可用逗号或空格分隔)').classes('w-full')
+                    bulk_actions = {
+                        '加入白名单': lambda names: async_rcon.batch(f'whitelist add {n}' for n in names),
+                        '移出白名单': lambda names: async_rcon.batch(f'whitelist remove {n}' for n in names),
+                        '封禁': lambda names: async_rcon.ban_players(names, issuer='panel'),
+                        '解封': async_rcon.pardon_targets,
+                        '授予OP': lambda names: async_rcon.batch(f'op {n}' for n in names),
+                        '撤销OP': lambda names: async_rcon.batch(f'deop {n}' for n in names),
+                    }
+                    bulk_action = ui.select(options=list(bulk_actions.keys()), label='操作', value='加入白名单')
+
+                    async def run_bulk_action():
+                        names = list(dict.fromkeys(players.canonical(n) for n in re.split(r'[\s,，]+', bulk_names.value or '') if n))
+                        if not names:
+                            ui.notify('请输入至少一个玩家名', type='warning', position='bottom')
+                            return
+                        report = await bulk_actions[bulk_action.value](names)
+                        show_batch_report(report)
+                        if bulk_action.value in ('封禁', '解封'):
+                            await event_bus.publish(BansChanged())
+
+                    ui.button('执行', on_click=run_bulk_action, color='primary').classes('q-mt-md')
+
         with ui.column().classes('w-full'):
             with ui.card().classes('w-full'):
                 with ui.card_section():
                     ui.label('给予物品').classes('text-h6')
                 ui.separator()
                 with ui.card_section():
-                    player_give = ui.select(options=initial_players, label='选择玩家').classes('w-full')
-                    selects_to_update.append(player_give)
-                    item = ui.select(options=list(item_map.keys()), label='选择物品', with_input=True).props('clearable')
+                    player_give = player_search_select().classes('w-full')
+                    item = item_search_select()
                     count = ui.number('数量', value=1, min=1)
-                    ui.button('给予', on_click=lambda: execute_command_with_feedback(f'give {player_give.value} {item_map.get(item.value, item.value)} {int(count.value)}'), color='primary').classes('q-mt-md')
+                    async def give_item_to_all():
+                        item_id = item.value
+                        if not item_id:
+                            ui.notify('请先选择物品', type='warning', position='bottom')
+                            return
+                        online = await get_player_list()
+                        report = await async_rcon.batch(f'give {p} {item_id} {int(count.value)}' for p in online)
+                        show_batch_report(report)
+
+                    with ui.row().classes('q-mt-md q-gutter-sm'):
+                        ui.button('给予', on_click=lambda: execute_command_with_feedback(f'give {player_give.value} {item.value} {int(count.value)}'), color='primary')
+                        ui.button('给予所有在线玩家', on_click=give_item_to_all, color='secondary')
 
             with ui.card().classes('w-full q-mt-md'):
                 with ui.card_section():
                     ui.label('经验管理').classes('text-h6')
                 ui.separator()
                 with ui.card_section():
-                    player_xp = ui.select(options=initial_players, label='选择玩家').classes('w-full')
-                    selects_to_update.append(player_xp)
+                    player_xp = player_search_select().classes('w-full')
                     with ui.row().classes('items-center w-full'):
                         xp = ui.number('经验值', value=10).classes('flex-grow')
                         xp_type = ui.select(['points', 'levels'], value='points')
@@ -192,8 +483,7 @@ def players_page():
                     ui.label('给予玩家效果').classes('text-h6')
                 ui.separator()
                 with ui.card_section():
-                    player_effect = ui.select(options=initial_players, label='选择玩家').classes('w-full')
-                    selects_to_update.append(player_effect)
+                    player_effect = player_search_select('选择玩家（可多选）', multiple=True).classes('w-full').props('use-chips')
                     
                     effects = {
                         '速度': 'speed', '急迫': 'haste', '力量': 'strength',
@@ -207,26 +497,50 @@ def players_page():
                         duration = ui.number('持续时间 (秒)', value=30, min=1).classes('flex-grow')
                         amplifier = ui.number('效果等级', value=1, min=1, max=255).classes('flex-grow')
                     
-                    def give_effect():
-                        player = player_effect.value
+                    async def give_effect():
+                        targets = player_effect.value or []
                         effect_id = effects.get(effect_selection.value)
                         dur = int(duration.value)
                         amp = int(amplifier.value) - 1  # 效果等级在命令中是从0开始的
-                        if player and effect_id:
-                            command = f'effect give {player} {effect_id} {dur} {amp}'
-                            execute_command_with_feedback(command)
+                        if targets and effect_id:
+                            commands = [f'effect give {player} {effect_id} {dur} {amp}' for player in targets]
+                            if len(commands) == 1:
+                                await execute_command_with_feedback(commands[0])
+                            else:
+                                show_batch_report(await async_rcon.batch(commands))
 
                     ui.button('给予效果', on_click=give_effect, color='primary').classes('q-mt-md')
 
-    def update_player_options():
-        new_players = get_player_list()
-        for s in selects_to_update:
-            if s.value is not None and s.value not in new_players:
-                s.value = None
-            s.options = new_players
-            s.update()
+            with ui.card().classes('w-full q-mt-md'):
+                with ui.card_section():
+                    ui.label('玩家档案').classes('text-h6')
+                ui.separator()
+                with ui.card_section():
+                    profile_select = player_search_select('查找玩家').classes('w-full')
+                    profile_info = ui.column().classes('q-mt-sm gap-1')
 
-    ui.timer(5.0, update_player_options, once=False)
+                    def format_time(at):
+                        return datetime.fromtimestamp(at).strftime('%Y-%m-%d %H:%M') if at else '未知'
+
+                    def show_profile():
+                        profile_info.clear()
+                        profile = players.profile(profile_select.value) if profile_select.value else None
+                        with profile_info:
+                            if profile is None:
+                                if profile_select.value:
+                                    ui.label('档案中没有这名玩家').classes('text-grey-7')
+                                return
+                            online = profile.uuid in players.online
+                            ui.label(f'UUID：{profile.uuid}').classes('text-caption')
+                            ui.label('在线' if online else f'最后在线：{format_time(profile.last_seen)}') \
+                                .classes('text-positive' if online else '')
+                            ui.label(f'首次出现：{format_time(profile.first_seen)}')
+                            ui.label(f'累计在线：{format_duration(players.playtime(profile))}，共 {profile.sessions} 次')
+                            if profile.names:
+                                ui.label(f"曾用名：{'、'.join(profile.names)}")
+
+                    profile_select.on_value_change(show_profile)
+                    subscribe_ui(PlayersChanged, lambda e: show_profile(), profile_info)
 
 def server_page():
     """服务器管理页面"""
@@ -268,40 +582,43 @@ def server_page():
                 
                 whitelist_list = ui.list()
 
-                def update_whitelist_list():
-                    whitelist_list.clear()
-                    players = rcon_manager.get_whitelist()
-                    with whitelist_list:
-                        if players:
-                            for p in players:
-                                with ui.item():
-                                    with ui.item_section():
-                                        ui.label(p)
-                                    with ui.item_section(side=True):
-                                        ui.button(icon='delete', on_click=lambda name=p: remove_from_whitelist(name), color='negative').props('flat round dense')
-                        else:
-                            with ui.item():
-                                ui.item_section('白名单为空')
+                def render_whitelist_row(p):
+                    with ui.item() as row:
+                        with ui.item_section():
+                            ui.label(p)
+                        with ui.item_section(side=True):
+                            ui.button(icon='delete', on_click=lambda name=p: remove_from_whitelist(name), color='negative').props('flat round dense')
+                    return row
+
+                def render_whitelist_empty():
+                    with ui.item() as row:
+                        ui.item_section('白名单为空')
+                    return row
+
+                whitelist_rows = KeyedList(whitelist_list, render_whitelist_row, render_whitelist_empty)
+
+                async def update_whitelist_list():
+                    whitelist_rows.update(await async_rcon.get_whitelist())
                 
-                def add_to_whitelist():
-                    player_name = new_player_input.value
+                async def add_to_whitelist():
+                    player_name = players.canonical(new_player_input.value)
                     if player_name:
-                        rcon_manager.add_to_whitelist(player_name)
+                        await async_rcon.add_to_whitelist(player_name)
                         ui.notify(f'已将 {player_name} 添加到白名单')
-                        new_player_input.value = ''
-                        update_whitelist_list()
+                        new_player_input.value = None
+                        await update_whitelist_list()
 
-                def remove_from_whitelist(player_name):
-                    rcon_manager.remove_from_whitelist(player_name)
+                async def remove_from_whitelist(player_name):
+                    await async_rcon.remove_from_whitelist(player_name)
                     ui.notify(f'已将 {player_name} 从白名单移除')
-                    update_whitelist_list()
+                    await update_whitelist_list()
 
                 with ui.card_section():
                     with ui.row().classes('w-full items-center'):
-                        new_player_input = ui.input('玩家名').classes('flex-grow').props('clearable')
+                        new_player_input = player_search_select('玩家名', new_values=True).classes('flex-grow')
                         ui.button('添加', on_click=add_to_whitelist, icon='add')
                 
-                update_whitelist_list()
+                ui.timer(0, update_whitelist_list, once=True)
 
         with ui.column().classes('w-full'):
             with ui.card().classes('w-full'):
@@ -311,27 +628,50 @@ def server_page():
                 
                 ban_list_display = ui.list()
 
+                def render_ban_row(target):
+                    label = ui.label(target)
+                    entry = rcon_manager.get_ban_entry(target)
+                    player_uuid = players.resolve(target)
+                    if entry and entry.banned_at:
+                        banned_at = datetime.fromtimestamp(entry.banned_at).strftime('%Y-%m-%d %H:%M')
+                        uuid_text = f'\nUUID：{player_uuid}' if player_uuid else ''
+                        label.tooltip(f'{banned_at} 由 {entry.issuer or "未知"} 封禁：{entry.reason or "无原因"}{uuid_text}')
+                    elif player_uuid:
+                        label.tooltip(f'UUID：{player_uuid}')
+                    return label
+
+                def render_ban_empty():
+                    return ui.label('无')
+
+                with ban_list_display:
+                    ui.label('玩家:').classes('text-subtitle2')
+                    banned_players_column = ui.column().classes('gap-0')
+                    ui.separator().classes('q-my-md')
+                    ui.label('IP 地址:').classes('text-subtitle2')
+                    banned_ips_column = ui.column().classes('gap-0')
+                banned_player_rows = KeyedList(banned_players_column, render_ban_row, render_ban_empty)
+                banned_ip_rows = KeyedList(banned_ips_column, render_ban_row, render_ban_empty)
+
                 def update_ban_list():
-                    ban_list_display.clear()
-                    ban_list = rcon_manager.get_ban_list()
-                    with ban_list_display:
-                        ui.label('玩家:').classes('text-subtitle2')
-                        if ban_list['players']:
-                            for p in ban_list['players']:
-                                ui.label(p)
-                        else:
-                            ui.label('无')
-                        
-                        ui.separator().classes('q-my-md')
-                        ui.label('IP 地址:').classes('text-subtitle2')
-                        if ban_list['ips']:
-                            for ip in ban_list['ips']:
-                                ui.label(ip)
-                        else:
-                            ui.label('无')
+                    ban_list = async_rcon.get_ban_list()
+                    banned_player_rows.update(ban_list['players'])
+                    banned_ip_rows.update(ban_list['ips'])
                 
-                rcon_manager.ui_update_callbacks['ban_list'] = update_ban_list
                 update_ban_list()
+                # 任一管理员封禁或解封、同步拉取到新封禁时刷新
+                subscribe_ui(BansChanged, lambda e: update_ban_list(), ban_list_display)
+
+                async def sync_ban_list():
+                    result = await services.ban_reconciler.reconcile(priority=INTERACTIVE)
+                    if result is None:
+                        ui.notify('无法读取服务器封禁列表', type='negative', position='bottom')
+                        return
+                    ui.notify(f"同步完成：拉取 {result['pulled']}，移除 {result['removed']}，"
+                              f"推送封禁 {result['pushed_bans']}，推送解封 {result['pushed_pardons']}，"
+                              f"失败 {result['failed']}", position='bottom')
+
+                with ui.card_section():
+                    ui.button('与服务器同步', on_click=sync_ban_list, icon='sync').props('flat')
 
             with ui.card().classes('w-full q-mt-md'):
                 with ui.card_section():
@@ -339,28 +679,105 @@ def server_page():
                 ui.separator()
                 with ui.card_section():
                     pardon_input = ui.input('玩家名或IP地址').props('clearable')
-                    def pardon_and_update(target_name):
-                        rcon_manager.pardon_target(target_name)
-                        update_ban_list()
+                    async def pardon_and_update(target_name):
+                        await async_rcon.pardon_target(target_name)
+                        await event_bus.publish(BansChanged())
                     ui.button('解封', on_click=lambda: pardon_and_update(pardon_input.value), color='positive').classes('q-mt-md')
 
 
 def console_page():
     """实时控制台页面"""
     ui.label('实时控制台').classes('text-h4 q-mb-md')
-    log = ui.log(max_lines=50).classes('w-full h-96')
-    
-    def send_command():
-        cmd = command_input.value
-        log.push(f'--> {cmd}')
-        response = execute_command_with_feedback(cmd)
-        log.push(response)
+
+    def format_entry(entry, text):
+        stamp = datetime.fromtimestamp(entry.at).strftime('%H:%M:%S')
+        return f'[{stamp}] --> {text}' if entry.kind == COMMAND else text
+
+    # 保证分块推送时各条记录仍按顺序显示
+    stream_lock = asyncio.Lock()
+
+    async def stream_entry(entry):
+        # 长输出分块推送，每块之间让出事件循环，避免一次发送过大的消息
+        async with stream_lock:
+            for index, chunk in enumerate(entry.chunks()):
+                log.push(format_entry(entry, chunk) if index == 0 else chunk)
+                await asyncio.sleep(0)
+
+    async def replay():
+        log.clear()
+        for entry in console.tail(server_select.value):
+            await stream_entry(entry)
+
+    with ui.row().classes('w-full items-center'):
+        server_select = ui.select(list(fleet.servers), value=rcon_manager.name, label='服务器',
+                                  on_change=replay).classes('col-2')
+    # 记录保存在后端的共享缓冲区中，页面只显示，刷新后从缓冲区回放
+    log = ui.log(max_lines=console.buffer_size).classes('w-full h-96')
+
+    def on_console_appended(event):
+        if event.server == server_select.value:
+            background_tasks.create(stream_entry(event.entry))
+
+    subscribe_ui(ConsoleAppended, on_console_appended, log)
+    ui.timer(0, replay, once=True)
+
+    recall_index = [-1]
+
+    async def send_command():
+        cmd = command_input.value.strip()
+        if not cmd:
+            ui.notify('命令不能为空!', type='warning', position='bottom')
+            return
         command_input.value = ''
+        recall_index[0] = -1
+        response = await console.execute(server_select.value, cmd)
+        notify_response(response, cmd)
+
+    def recall(step):
+        history = console.recall(server_select.value)
+        if not history:
+            return
+        recall_index[0] = max(-1, min(len(history) - 1, recall_index[0] + step))
+        command_input.value = history[recall_index[0]] if recall_index[0] >= 0 else ''
+
+    def update_completions(e):
+        command_input.set_autocomplete(console.complete(server_select.value, e.args or ''))
 
     with ui.row().classes('w-full items-center'):
-        command_input = ui.input(placeholder='输入命令...').classes('flex-grow')
+        command_input = ui.input(placeholder='输入命令... (↑/↓ 回溯历史，Tab 补全)').classes('flex-grow')
+        command_input.on('keydown.enter', send_command)
+        command_input.on('keydown.up', lambda: recall(1))
+        command_input.on('keydown.down', lambda: recall(-1))
+        command_input.on('update:model-value', update_completions, throttle=0.3, leading_events=False)
         ui.button('发送', on_click=send_command)
-    
+
+    with ui.expansion('搜索历史', icon='search').classes('w-full q-mt-md'):
+        with ui.row().classes('w-full items-center'):
+            search_input = ui.input(placeholder='关键字').classes('col')
+            kind_select = ui.select({'': '全部', COMMAND: '命令', RESPONSE: '响应'}, value='',
+                                    label='类型').classes('col-2')
+            search_button = ui.button('搜索', icon='search')
+        results_table = ui.table(columns=[
+            {'name': 'time', 'label': '时间', 'field': 'time', 'align': 'left'},
+            {'name': 'kind', 'label': '类型', 'field': 'kind', 'align': 'left'},
+            {'name': 'text', 'label': '内容', 'field': 'text', 'align': 'left',
+             'style': 'white-space: pre-wrap'},
+        ], rows=[], row_key='seq', pagination=20).classes('w-full')
+
+        async def search_history():
+            entries = await asyncio.to_thread(console.search, server_select.value, search_input.value.strip(),
+                                              kind_select.value or None)
+            results_table.rows = [{
+                'seq': entry.seq,
+                'time': datetime.fromtimestamp(entry.at).strftime('%Y-%m-%d %H:%M:%S'),
+                'kind': '命令' if entry.kind == COMMAND else '响应',
+                'text': entry.text,
+            } for entry in entries]
+            results_table.update()
+
+        search_input.on('keydown.enter', search_history)
+        search_button.on_click(search_history)
+
     with ui.expansion('常用命令示例', icon='help_outline').classes('w-full q-mt-md'):
         ui.label('/help - 查看帮助').classes('text-grey')
         ui.label('/list - 查看在线玩家').classes('text-grey')
@@ -370,78 +787,333 @@ def automation_page():
     """自动化任务页面"""
     ui.label('自动化任务').classes('text-h4 q-mb-md')
 
-    known_players = set(rcon_manager.get_server_status().get('players', []))
-
     with ui.card().classes('w-full'):
         with ui.card_section():
             ui.label('玩家监控与欢迎').classes('text-h6')
         
         with ui.card_section():
+            # 监控在后台进行，页面只负责修改设置和显示记录
             welcome_messages_input = ui.textarea(
                 label='欢迎消息 (每行一条)',
-                value='欢迎来到服务器!\n请遵守服务器规则，享受游戏！'
+                value='\n'.join(greeter.messages)
             ).classes('w-full')
-            
+            welcome_messages_input.on('blur', lambda: greeter.configure(
+                messages=welcome_messages_input.value.strip().split('\n')))
+
             monitor_log = ui.log(max_lines=20).classes('w-full h-64 q-my-md')
+            last_shown = [None]
+
+            def refresh_monitor_log():
+                # 只追加上次刷新之后的新记录
+                entries = list(greeter.log)
+                start = entries.index(last_shown[0]) + 1 if last_shown[0] in entries else 0
+                for at, text in entries[start:]:
+                    monitor_log.push(f"[{datetime.fromtimestamp(at).strftime('%H:%M:%S')}] {text}")
+                if entries:
+                    last_shown[0] = entries[-1]
+
+            refresh_monitor_log()
+            ui.timer(1, refresh_monitor_log)
+            ui.switch('启用玩家监控', value=greeter.enabled,
+                      on_change=lambda e: greeter.configure(enabled=e.value))
+
+    with ui.card().classes('w-full q-mt-md'):
+        with ui.card_section():
+            ui.label('计划任务').classes('text-h6')
+        ui.separator()
+
+        with ui.card_section():
+            with ui.row().classes('w-full items-center'):
+                job_type_select = ui.select(JOB_TYPES, value='clear_items', label='任务类型').classes('col-2')
+                job_server_select = ui.select(list(fleet.servers), value=rcon_manager.name,
+                                              label='服务器').classes('col-2')
+                trigger_select = ui.select({'interval': '固定间隔', 'cron': 'Cron 表达式'}, value='interval',
+                                           label='触发方式').classes('col-2')
+                interval_input = ui.number(label='间隔 (分钟)', value=30, min=1).classes('col-2')
+                cron_input = ui.input(label='Cron (分 时 日 月 星期)', value='0 */2 * * *').classes('col-2')
+                jitter_input = ui.number(label='随机延迟 (秒)', value=0, min=0).classes('col-1')
+            interval_input.bind_visibility_from(trigger_select, 'value', value='interval')
+            cron_input.bind_visibility_from(trigger_select, 'value', value='cron')
+            job_commands_input = ui.textarea(label='命令 (每行一条)').classes('w-full')
+            job_commands_input.bind_visibility_from(job_type_select, 'value', value='command')
+            with ui.row().classes('w-full items-center') as clear_options:
+                threshold_input = ui.number(label='清理阈值 (个)', value=DEFAULT_ITEM_THRESHOLD, min=0,
+                                            precision=0).classes('col-2')
+                dimensions_select = ui.select(DIMENSIONS, multiple=True, value=[], label='维度 (留空为所有维度)',
+                                              new_value_mode='add-unique').props('use-chips').classes('col-4')
+                warning_input = ui.number(label='清理前警告 (秒)', value=30, min=0, precision=0).classes('col-2')
+                ui.label('先统计掉落物数量，超过阈值的维度才清理').classes('text-caption text-grey-6')
+            clear_options.bind_visibility_from(job_type_select, 'value', value='clear_items')
 
-            def send_welcome_message(player_name):
-                messages = welcome_messages_input.value.strip().split('\n')
-                for msg in messages:
-                    execute_command_with_feedback(f'tell {player_name} {msg}')
+            def job_params():
+                if job_type_select.value == 'command':
+                    return {'commands': [c.strip() for c in job_commands_input.value.split('\n') if c.strip()]}
+                return {'threshold': int(threshold_input.value or 0), 'dimensions': list(dimensions_select.value),
+                        'warning_seconds': int(warning_input.value or 0)}
 
-            def player_monitor_task():
-                nonlocal known_players
-                status = rcon_manager.get_server_status()
-                if not status.get('online'):
+            def add_job():
+                params = job_params()
+                if job_type_select.value == 'command' and not params['commands']:
+                    ui.notify('命令不能为空!', type='warning', position='bottom')
                     return
-                
-                current_players = set(status.get('players', []))
-                
-                new_players = current_players - known_players
-                for player in new_players:
-                    monitor_log.push(f'玩家 {player} 加入了服务器。')
-                    send_welcome_message(player)
-
-                left_players = known_players - current_players
-                for player in left_players:
-                    monitor_log.push(f'玩家 {player} 离开了服务器。')
-                
-                known_players = current_players
+                try:
+                    trigger = make_trigger(trigger_select.value, minutes=interval_input.value,
+                                           cron=cron_input.value, jitter=jitter_input.value or 0)
+                    job_engine.add_job(job_type_select.value, job_server_select.value, trigger, params)
+                except ValueError as e:
+                    ui.notify(f'无法添加任务: {e}', type='negative', position='bottom')
+                    return
+                ui.notify('计划任务已保存。', type='positive', position='bottom')
+                refresh_jobs()
 
-            monitor_timer = ui.timer(10.0, player_monitor_task, active=False)
-            
-            def toggle_monitoring(e):
-                if e.value:
-                    monitor_log.push('玩家监控已启动...')
-                    monitor_timer.activate()
-                else:
-                    monitor_log.push('玩家监控已停止。')
-                    monitor_timer.deactivate()
+            ui.button('保存任务', icon='add', on_click=add_job).classes('q-mt-sm')
+
+        jobs_table = ui.table(columns=[
+            {'name': 'name', 'label': '任务', 'field': 'name', 'align': 'left'},
+            {'name': 'server', 'label': '服务器', 'field': 'server', 'align': 'left'},
+            {'name': 'trigger', 'label': '触发器', 'field': 'trigger', 'align': 'left'},
+            {'name': 'next_run', 'label': '下次执行', 'field': 'next_run', 'align': 'left'},
+            {'name': 'actions', 'label': '操作', 'field': 'id', 'align': 'right'},
+        ], rows=[], row_key='id').classes('w-full')
+        jobs_table.add_slot('body-cell-actions', '''
+            <q-td :props="props">
+                <q-btn flat dense icon="play_arrow" @click="$parent.$emit('run', props.row.id)" />
+                <q-btn v-if="props.row.paused" flat dense icon="play_circle" @click="$parent.$emit('resume', props.row.id)" />
+                <q-btn v-else flat dense icon="pause" @click="$parent.$emit('pause', props.row.id)" />
+                <q-btn flat dense color="negative" icon="delete" @click="$parent.$emit('remove', props.row.id)" />
+            </q-td>
+        ''')
+
+        def refresh_jobs():
+            rows = [{
+                'id': job['id'],
+                'name': job['name'],
+                'server': job['server'],
+                'trigger': job['trigger'],
+                'next_run': datetime.fromtimestamp(job['next_run']).strftime('%Y-%m-%d %H:%M:%S')
+                            if job['next_run'] else '已暂停',
+                'paused': job['next_run'] is None,
+            } for job in job_engine.jobs()]
+            if rows != jobs_table.rows:
+                jobs_table.rows = rows
+                jobs_table.update()
+
+        async def run_job_now(e):
+            await job_engine.run_now(e.args)
+
+        def change_job(action):
+            def handler(e):
+                action(e.args)
+                refresh_jobs()
+            return handler
 
-            ui.switch('启用玩家监控', on_change=toggle_monitoring)
+        jobs_table.on('run', run_job_now)
+        jobs_table.on('pause', change_job(job_engine.pause_job))
+        jobs_table.on('resume', change_job(job_engine.resume_job))
+        jobs_table.on('remove', change_job(job_engine.remove_job))
+        refresh_jobs()
+        # 下次执行时间随执行推进，定时刷新；只读取内存中的计划，不产生 RCON 请求
+        ui.timer(10, refresh_jobs)
 
     with ui.card().classes('w-full q-mt-md'):
         with ui.card_section():
-            ui.label('定时清理掉落物').classes('text-h6')
-        
+            ui.label('执行历史').classes('text-h6')
+        ui.separator()
+
+        def history_row(run):
+            return {
+                'key': f"{run['job_id']}-{run['started_at']}",
+                'time': datetime.fromtimestamp(run['started_at']).strftime('%Y-%m-%d %H:%M:%S'),
+                'job': JOB_TYPES.get(run['job_type'], run['job_type']),
+                'server': run['server'],
+                'duration': f"{run['duration'] * 1000:.0f}",
+                'result': '成功' if run['ok'] else '失败',
+                'detail': run['detail'],
+            }
+
+        history_table = ui.table(columns=[
+            {'name': 'time', 'label': '时间', 'field': 'time', 'align': 'left'},
+            {'name': 'job', 'label': '任务', 'field': 'job', 'align': 'left'},
+            {'name': 'server', 'label': '服务器', 'field': 'server', 'align': 'left'},
+            {'name': 'duration', 'label': '耗时 (ms)', 'field': 'duration', 'align': 'right'},
+            {'name': 'result', 'label': '结果', 'field': 'result', 'align': 'left'},
+            {'name': 'detail', 'label': '详情', 'field': 'detail', 'align': 'left'},
+        ], rows=[history_row(run) for run in job_engine.recent_runs()], row_key='key',
+            pagination=10).classes('w-full')
+
+    with ui.card().classes('w-full q-mt-md'):
         with ui.card_section():
-            clear_interval_input = ui.number(label='清理间隔 (分钟)', value=30, min=1)
-            
-            def clear_items_task():
-                execute_command_with_feedback('kill @e[type=item]')
-
-            clear_timer = ui.timer(clear_interval_input.value * 60, clear_items_task, active=False)
-
-            def toggle_clearing(e):
-                if e.value:
-                    clear_timer.interval = clear_interval_input.value * 60
-                    clear_timer.activate()
-                    ui.notify(f'已启动定时清理，每 {clear_interval_input.value} 分钟执行一次。')
-                else:
-                    clear_timer.deactivate()
-                    ui.notify('定时清理已停止。')
-            
-            ui.switch('启用定时清理', on_change=toggle_clearing)
+            ui.label('掉落物数量记录').classes('text-h6')
+        ui.separator()
+
+        def count_rows():
+            return [{
+                'key': f"{record['server']}-{record['dimension']}-{record['at']}",
+                'time': datetime.fromtimestamp(record['at']).strftime('%Y-%m-%d %H:%M:%S'),
+                'server': record['server'],
+                'dimension': dimension_label(record['dimension']),
+                'count': record['count'],
+                'killed': '未清理' if record['killed'] is None else record['killed'],
+            } for record in job_engine.recent_item_counts()]
+
+        counts_table = ui.table(columns=[
+            {'name': 'time', 'label': '时间', 'field': 'time', 'align': 'left'},
+            {'name': 'server', 'label': '服务器', 'field': 'server', 'align': 'left'},
+            {'name': 'dimension', 'label': '维度', 'field': 'dimension', 'align': 'left'},
+            {'name': 'count', 'label': '掉落物数量', 'field': 'count', 'align': 'right'},
+            {'name': 'killed', 'label': '已清理', 'field': 'killed', 'align': 'right'},
+        ], rows=count_rows(), row_key='key', pagination=10).classes('w-full')
+
+    def on_job_finished(event):
+        history_table.rows.insert(0, history_row(asdict(event.run)))
+        del history_table.rows[job_engine.history.maxlen:]
+        history_table.update()
+        if event.run.job_type == 'clear_items':
+            counts_table.rows = count_rows()
+            counts_table.update()
+        refresh_jobs()
+
+    subscribe_ui(JobFinished, on_job_finished, history_table)
+
+def fleet_page():
+    """服务器集群页面"""
+    ui.label('服务器集群').classes('text-h4 q-mb-md text-grey-8')
+
+    with ui.card().classes('w-full'):
+        with ui.card_section():
+            ui.label('服务器状态').classes('text-h6')
+        ui.separator()
+        status_table = ui.table(columns=[
+            {'name': 'name', 'label': '服务器', 'field': 'name', 'align': 'left', 'sortable': True},
+            {'name': 'tags', 'label': '标签', 'field': 'tags', 'align': 'left'},
+            {'name': 'status', 'label': '状态', 'field': 'status', 'align': 'left', 'sortable': True},
+            {'name': 'players', 'label': '在线人数', 'field': 'players', 'align': 'left'},
+            {'name': 'names', 'label': '在线玩家', 'field': 'names', 'align': 'left'},
+        ], rows=[], row_key='name').classes('w-full')
+        total_label = ui.label().classes('q-pa-md text-subtitle2')
+
+    async def refresh_statuses():
+        statuses = await fleet.statuses()
+        rows = []
+        for name, status in statuses.items():
+            rows.append({
+                'name': name,
+                'tags': ', '.join(fleet.servers[name].tags),
+                'status': '在线' if status['online'] else '离线',
+                'players': f"{status['player_count']} / {status.get('max_players', 0)}",
+                'names': ', '.join(status['players']),
+            })
+        # 状态未变化时不推送
+        if rows != status_table.rows:
+            status_table.rows = rows
+            status_table.update()
+        online = sum(1 for s in statuses.values() if s['online'])
+        player_count = sum(s['player_count'] for s in statuses.values())
+        total_label.set_text(f'{online} / {len(statuses)} 台在线，共 {player_count} 名玩家')
+
+    ui.timer(0, refresh_statuses, once=True)
+    ui.timer(status_cache.ttl, refresh_statuses)
+
+    with ui.card().classes('w-full q-mt-md'):
+        with ui.card_section():
+            ui.label('批量下发命令').classes('text-h6')
+        ui.separator()
+        with ui.card_section():
+            targets = {'all': '全部服务器'}
+            targets.update({f'tag:{tag}': f'标签: {tag}' for tag in fleet.tags()})
+            targets.update({f'server:{name}': name for name in fleet.servers})
+            with ui.row().classes('w-full items-center'):
+                target_select = ui.select(targets, value='all', label='目标').classes('col-3')
+                fleet_command = ui.input(placeholder='例如: say 服务器将在5分钟后重启').classes('col')
+                send_button = ui.button('发送', icon='send')
+        result_table = ui.table(columns=[
+            {'name': 'name', 'label': '服务器', 'field': 'name', 'align': 'left'},
+            {'name': 'result', 'label': '结果', 'field': 'result', 'align': 'left'},
+            {'name': 'detail', 'label': '响应', 'field': 'detail', 'align': 'left'},
+        ], rows=[], row_key='name').classes('w-full')
+
+        async def send_to_fleet():
+            command = fleet_command.value.strip()
+            if not command:
+                ui.notify('命令不能为空!', type='warning', position='bottom')
+                return
+            kind, _, value = target_select.value.partition(':')
+            send_button.disable()
+            try:
+                # 所有目标服务器并发执行，总耗时约为一次往返
+                report = await fleet.fan_out(command, names=[value] if kind == 'server' else None,
+                                             tag=value if kind == 'tag' else None)
+            finally:
+                send_button.enable()
+            ui.notify(report.summary(), type='negative' if report.failed else 'positive', position='bottom')
+            result_table.rows = [
+                {'name': name, 'result': '成功' if r.ok else '失败', 'detail': r.error or r.response}
+                for name, r in report.results.items()
+            ]
+            result_table.update()
+
+        send_button.on_click(send_to_fleet)
+        fleet_command.on('keydown.enter', send_to_fleet)
+
+def audit_page():
+    """审计日志页面"""
+    ui.label('审计日志').classes('text-h4 q-mb-md text-grey-8')
+
+    with ui.card().classes('w-full'):
+        with ui.card_section():
+            with ui.row().classes('w-full items-center'):
+                actor_select = ui.select([], label='管理员', clearable=True).classes('col-2')
+                player_input = ui.input(label='玩家').props('clearable').classes('col-2')
+                command_input = ui.input(label='命令名或关键字').props('clearable').classes('col-2')
+                server_select = ui.select(list(fleet.servers), label='服务器', clearable=True).classes('col-2')
+                range_select = ui.select(AUDIT_RANGES, value=86400, label='时间范围').classes('col-2')
+            with ui.row().classes('w-full items-center') as custom_range:
+                since_input = ui.input(label='开始时间').props('type=datetime-local').classes('col-3')
+                until_input = ui.input(label='结束时间').props('type=datetime-local').classes('col-3')
+            custom_range.bind_visibility_from(range_select, 'value', value=0)
+            ui.button('查询', icon='search', on_click=lambda: run_query()).classes('q-mt-sm')
+        ui.separator()
+        results_table = ui.table(columns=[
+            {'name': 'time', 'label': '时间', 'field': 'time', 'align': 'left'},
+            {'name': 'actor', 'label': '管理员', 'field': 'actor', 'align': 'left'},
+            {'name': 'server', 'label': '服务器', 'field': 'server', 'align': 'left'},
+            {'name': 'command', 'label': '命令', 'field': 'command', 'align': 'left'},
+            {'name': 'result', 'label': '结果', 'field': 'result', 'align': 'left'},
+            {'name': 'response', 'label': '响应', 'field': 'response', 'align': 'left',
+             'style': 'white-space: pre-wrap'},
+        ], rows=[], row_key='key', pagination=20).classes('w-full')
+
+    def parse_time(value):
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M').timestamp() if value else None
+
+    async def run_query():
+        if range_select.value:
+            since, until = time.time() - range_select.value, None
+        else:
+            try:
+                since, until = parse_time(since_input.value), parse_time(until_input.value)
+            except ValueError:
+                ui.notify('时间格式无效', type='warning', position='bottom')
+                return
+        records = await asyncio.to_thread(
+            audit.query, actor=actor_select.value, player=(player_input.value or '').strip(),
+            command=(command_input.value or '').strip(), server=server_select.value,
+            since=since, until=until, limit=500)
+        results_table.rows = [{
+            'key': f"{i}-{record['at']}",
+            'time': datetime.fromtimestamp(record['at']).strftime('%Y-%m-%d %H:%M:%S'),
+            'actor': record['actor'],
+            'server': record['server'],
+            'command': record['command'],
+            'result': '成功' if record['ok'] else '失败',
+            'response': record['response'],
+        } for i, record in enumerate(records)]
+        results_table.update()
+        actor_select.set_options(await asyncio.to_thread(audit.actors), value=actor_select.value)
+
+    for text_input in (player_input, command_input):
+        text_input.on('keydown.enter', run_query)
+    ui.timer(0, run_query, once=True)
 
 # --- UI 布局和应用启动 ---
 
@@ -450,23 +1122,34 @@ with ui.header(elevated=True).style('background-color: #3874c8').classes('items-
         ui.icon('gamepad', size='lg', color='white')
         ui.label('Minecraft RCON 面板').classes('text-h5')
 
+# 标签页内容在首次切换到该页时才构建，打开面板只需构建仪表盘
+PAGES = {
+    '仪表盘': ('dashboard', dashboard_page),
+    '玩家管理': ('people', players_page),
+    '服务器管理': ('storage', server_page),
+    '实时控制台': ('terminal', console_page),
+    '自动化': ('smart_toy', automation_page),
+    '服务器集群': ('hub', fleet_page),
+    '审计日志': ('history_edu', audit_page),
+}
+built_pages = set()
+
+def build_page(name):
+    """构建某个标签页的内容，已构建过时直接返回"""
+    if name in built_pages:
+        return
+    built_pages.add(name)
+    started = time.perf_counter()
+    with page_panels[name]:
+        PAGES[name][1]()
+    metrics.PAGE_BUILD.observe(time.perf_counter() - started, page=name)
+
 with ui.tabs().classes('w-full') as tabs:
-    ui.tab('仪表盘', icon='dashboard')
-    ui.tab('玩家管理', icon='people')
-    ui.tab('服务器管理', icon='storage')
-    ui.tab('实时控制台', icon='terminal')
-    ui.tab('自动化', icon='smart_toy')
-
-with ui.tab_panels(tabs, value='仪表盘').classes('w-full'):
-    with ui.tab_panel('仪表盘'):
-        dashboard_page()
-    with ui.tab_panel('玩家管理'):
-        players_page()
-    with ui.tab_panel('服务器管理'):
-        server_page()
-    with ui.tab_panel('实时控制台'):
-        console_page()
-    with ui.tab_panel('自动化'):
-        automation_page()
+    for name, (icon, _) in PAGES.items():
+        ui.tab(name, icon=icon)
+
+with ui.tab_panels(tabs, value='仪表盘', on_change=lambda e: build_page(e.value)).classes('w-full'):
+    page_panels = {name: ui.tab_panel(name) for name in PAGES}
+build_page('仪表盘')
 
 ui.run()
\ No newline at end of file
@@ -0,0 +1,640 @@
+import asyncio
+import logging
+import time
+
+from mcrcon_new.command_queue import CommandScheduler, INTERACTIVE, AUTOMATION, POLLING
+from mcrcon_new.metrics import (
+    AUTH_LATENCY, BATCH_LATENCY, CONNECT_LATENCY, ERRORS, Timer, observe_command, observe_result,
+)
+from mcrcon_new.parsers import parse_banlist, parse_whitelist
+from mcrcon_new.rcon_manager import BatchReport, make_result, is_ip_address
+from mcrcon_new.rcon_protocol import (
+    LENGTH, SERVERDATA_AUTH, SERVERDATA_AUTH_RESPONSE, SERVERDATA_EXECCOMMAND, SERVERDATA_RESPONSE_VALUE,
+    DEFAULT_MAX_RESPONSE_BYTES, RCONError, RCONAuthError, RCONConnectionClosed, RCONNotSent, ResponseBuffer,
+    encode_packet, decode_packet, read_length,
+)
+
+
+class AsyncRCONClient:
+    """基于 asyncio 流的 Source RCON 客户端，单条连接
+
+    请求按递增的请求ID发送，由后台读取任务按ID把响应分发给对应的调用方，
+    因此同一连接上可以同时有多条命令在途（流水线），最多 ``pipeline_depth`` 条。
+    ``multipacket`` 为真时在命令的第一个响应包到达后发送一个哨兵包，用于拼接被拆分的长响应，
+    原理见 RCONConnection。
+    """
+
+    def __init__(self, host, port, password, timeout=5.0, pipeline_depth=32, multipacket=True,
+                 max_response_bytes=DEFAULT_MAX_RESPONSE_BYTES):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.pipeline_depth = max(1, int(pipeline_depth))
+        self.multipacket = multipacket
+        self.max_response_bytes = max_response_bytes
+        self.reader = None
+        self.writer = None
+        self._next_id = 0
+        # 请求ID -> (Future, ResponseBuffer, 哨兵ID，尚未发送时为 None)；哨兵ID -> 对应的请求ID
+        self._pending = {}
+        self._sentinels = {}
+        self._reader_task = None
+        self._in_flight = asyncio.Semaphore(self.pipeline_depth)
+        # 批量占用在途名额时加锁，避免多个批次各占一部分后互相等待
+        self._reserve_lock = asyncio.Lock()
+
+    @property
+    def connected(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    def _new_id(self):
+        # 请求ID为正的 int32，-1 被服务器用来表示验证失败
+        self._next_id = self._next_id % 0x7FFFFFFF + 1
+        return self._next_id
+
+    async def connect(self):
+        """建立 TCP 连接并完成密码验证"""
+        try:
+            with Timer() as timer:
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout)
+        except OSError as e:
+            ERRORS.inc(command='connect', type=type(e).__name__)
+            raise
+        CONNECT_LATENCY.observe(timer.elapsed, mode='async')
+        try:
+            with Timer() as timer:
+                request_id = self._new_id()
+                self.writer.write(encode_packet(request_id, SERVERDATA_AUTH, self.password))
+                await self.writer.drain()
+                # 部分服务端会在验证响应前先发送一个空的响应包，跳过它
+                while True:
+                    in_id, in_type, _ = await asyncio.wait_for(self._read_packet(), self.timeout)
+                    if in_id == -1:
+                        raise RCONAuthError("RCON 密码错误")
+                    if in_id == request_id and in_type == SERVERDATA_AUTH_RESPONSE:
+                        break
+        except BaseException as e:
+            ERRORS.inc(command='auth', type=type(e).__name__)
+            await self.close()
+            raise
+        AUTH_LATENCY.observe(timer.elapsed, mode='async')
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._fail_pending(RCONConnectionClosed("连接已关闭"))
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (OSError, ConnectionError):
+                pass
+        self.reader = None
+        self.writer = None
+
+    def _fail_pending(self, exc):
+        pending, self._pending = self._pending, {}
+        self._sentinels = {}
+        for future, *_ in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def _read_packet(self):
+        try:
+            length = read_length(await self.reader.readexactly(LENGTH.size))
+            return decode_packet(await self.reader.readexactly(length))
+        except asyncio.IncompleteReadError as e:
+            raise RCONConnectionClosed("服务器关闭了连接") from e
+
+    async def _read_loop(self):
+        """持续读取响应包，按请求ID拼接分片并唤醒等待者"""
+        try:
+            while True:
+                in_id, _, text = await self._read_packet()
+                if in_id in self._sentinels:
+                    self._finish(self._sentinels.pop(in_id))
+                    continue
+                entry = self._pending.get(in_id)
+                # 已超时或被取消的请求，其迟到的响应直接丢弃
+                if entry is None:
+                    continue
+                future, buffer, sentinel_id = entry
+                try:
+                    buffer.append(text)
+                except RCONError as e:
+                    self._forget(in_id)
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                if not self.multipacket:
+                    self._finish(in_id)
+                elif sentinel_id is None:
+                    self._send_sentinel(in_id, future, buffer)
+        except asyncio.CancelledError:
+            raise
+        except (OSError, RCONError) as e:
+            self._fail_pending(e if isinstance(e, RCONError) else RCONConnectionClosed(str(e)))
+            if self.writer is not None:
+                self.writer.close()
+
+    def _send_sentinel(self, request_id, future, buffer):
+        """命令的第一个响应包已到达，发送它的哨兵包"""
+        sentinel_id = self._new_id()
+        self._sentinels[sentinel_id] = request_id
+        self._pending[request_id] = (future, buffer, sentinel_id)
+        self.writer.write(encode_packet(sentinel_id, SERVERDATA_RESPONSE_VALUE, ''))
+
+    def _forget(self, request_id):
+        """注销请求及其哨兵，之后迟到的响应会被丢弃"""
+        entry = self._pending.pop(request_id, None)
+        if entry is not None and entry[2] is not None:
+            self._sentinels.pop(entry[2], None)
+
+    def _finish(self, request_id):
+        entry = self._pending.pop(request_id, None)
+        if entry is not None and not entry[0].done():
+            entry[0].set_result(entry[1].text())
+
+    def _submit(self, cmds):
+        """把多条命令一次性写入发送缓冲区，返回各自的 Future"""
+        if not self.connected or self.reader.at_eof():
+            # 还没有写出任何数据，调用方可以在新连接上重试
+            raise RCONNotSent("连接未建立或已被服务器关闭")
+        loop = asyncio.get_running_loop()
+        futures = []
+        packets = []
+        for cmd in cmds:
+            request_id = self._new_id()
+            future = loop.create_future()
+            futures.append((request_id, future))
+            packets.append(encode_packet(request_id, SERVERDATA_EXECCOMMAND, cmd))
+            self._pending[request_id] = (future, ResponseBuffer(self.max_response_bytes), None)
+        self.writer.write(b''.join(packets))
+        return futures
+
+    async def _flush(self, submitted):
+        """等待发送缓冲区写出；失败时注销刚提交的请求，避免留下无人等待的 Future"""
+        try:
+            await self.writer.drain()
+        except BaseException:
+            for request_id, future in submitted:
+                self._forget(request_id)
+                future.cancel()
+            raise
+
+    async def _wait(self, request_id, future, timeout):
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        finally:
+            # 超时或取消时注销该请求及其哨兵，连接本身仍可继续使用
+            self._forget(request_id)
+
+    async def _reserve(self, count):
+        """占用 ``count`` 个在途名额，全部拿到后才返回"""
+        async with self._reserve_lock:
+            acquired = 0
+            try:
+                for _ in range(count):
+                    await self._in_flight.acquire()
+                    acquired += 1
+            except BaseException:
+                for _ in range(acquired):
+                    self._in_flight.release()
+                raise
+
+    async def command(self, cmd, timeout=None):
+        """发送一条命令并等待响应"""
+        async with self._in_flight:
+            submitted = self._submit([cmd])
+            await self._flush(submitted)
+            (request_id, future), = submitted
+            return await self._wait(request_id, future, timeout)
+
+    async def command_many(self, cmds, timeout=None, depth=None):
+        """把多条命令连续写入同一连接，按请求ID收集响应，顺序与 ``cmds`` 一致
+
+        每批最多 ``depth``（默认 ``pipeline_depth``）条在途；
+        单条命令失败（超时等）时对应位置为异常对象，不影响其余命令。
+        """
+        depth = max(1, min(depth or self.pipeline_depth, self.pipeline_depth))
+        results = []
+        for start in range(0, len(cmds), depth):
+            chunk = cmds[start:start + depth]
+            # 与 command() 共用在途名额，共享连接上的总在途数不超过 pipeline_depth
+            await self._reserve(len(chunk))
+            try:
+                submitted = self._submit(chunk)
+                await self._flush(submitted)
+                results.extend(await asyncio.gather(
+                    *(self._wait(request_id, future, timeout) for request_id, future in submitted),
+                    return_exceptions=True))
+            finally:
+                for _ in chunk:
+                    self._in_flight.release()
+        return results
+
+
+class AsyncRCONPool:
+    """异步 RCON 连接池，配置项与同步连接池一致
+
+    ``pipeline`` 为假时每个调用方独占一条连接；为真时连接在调用方之间共享，
+    新请求被分配到在途请求最少的连接上，通过请求ID区分各自的响应。
+    """
+
+    def __init__(self, factory, size=4, idle_timeout=300.0, max_lifetime=3600.0,
+                 acquire_timeout=10.0, pipeline=False):
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.pipeline = pipeline
+        self._idle = []
+        self._shared = []
+        self._in_use = 0
+        self._slots = asyncio.Semaphore(self.size)
+        self._connect_lock = asyncio.Lock()
+        self._closed = False
+
+    def _is_usable(self, entry):
+        client, created_at, last_used = entry
+        now = time.monotonic()
+        if not client.connected or client.reader.at_eof():
+            return False
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if self.idle_timeout and now - last_used > self.idle_timeout:
+            return False
+        return True
+
+    async def acquire(self):
+        if self._closed:
+            raise RCONError("连接池已关闭")
+        if self.pipeline:
+            return await self._acquire_shared()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise RCONError("等待可用 RCON 连接超时") from None
+        try:
+            while self._idle:
+                entry = self._idle.pop()
+                if self._is_usable(entry):
+                    self._in_use += 1
+                    return entry[0], entry[1]
+                await entry[0].close()
+            client = self.factory()
+            await client.connect()
+            self._in_use += 1
+            return client, time.monotonic()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _acquire_shared(self):
+        async with self._connect_lock:
+            live = []
+            for entry in self._shared:
+                # 仍有在途请求的连接即使过期也要等请求完成后再关闭
+                if self._is_usable(entry) or entry[0].in_flight:
+                    live.append(entry)
+                else:
+                    await entry[0].close()
+            self._shared = live
+            if live:
+                best = min(live, key=lambda e: e[0].in_flight)
+                if best[0].in_flight == 0 or len(live) >= self.size:
+                    best[2] = time.monotonic()
+                    return best[0], best[1]
+            client = self.factory()
+            await asyncio.wait_for(client.connect(), self.acquire_timeout)
+            entry = [client, time.monotonic(), time.monotonic()]
+            self._shared.append(entry)
+            return client, entry[1]
+
+    async def release(self, client, created_at, discard=False):
+        if self.pipeline:
+            # 共享连接上还有其他调用方的请求，只在连接本身已断开时才关闭
+            if not client.connected or client.reader.at_eof():
+                self._shared = [e for e in self._shared if e[0] is not client]
+                await client.close()
+            return
+        self._in_use -= 1
+        try:
+            if discard or self._closed or not client.connected:
+                await client.close()
+            else:
+                self._idle.append([client, created_at, time.monotonic()])
+        finally:
+            self._slots.release()
+
+    async def run(self, func, retries=1):
+        """在池中连接上执行 ``await func(client)``，确定命令尚未发出时重连并重试
+
+        命令写出后的连接错误直接抛出：命令可能已在服务器上执行，重试会让它执行两次。
+        """
+        for attempt in range(retries + 1):
+            client, created_at = await self.acquire()
+            try:
+                result = await func(client)
+            except asyncio.TimeoutError:
+                # 超时的命令可能已在服务器上执行，不能重试；连接本身仍可复用
+                await self.release(client, created_at)
+                raise
+            except RCONNotSent as e:
+                await self.release(client, created_at, discard=True)
+                if attempt >= retries:
+                    raise
+                logging.warning(f"RCON 连接失效，正在重连: {e}")
+            except (OSError, RCONConnectionClosed):
+                await self.release(client, created_at, discard=True)
+                raise
+            except BaseException:
+                await self.release(client, created_at)
+                raise
+            else:
+                await self.release(client, created_at)
+                return result
+
+    def stats(self):
+        if self.pipeline:
+            in_flight = sum(e[0].in_flight for e in self._shared)
+            return {"size": self.size, "open": len(self._shared), "in_flight": in_flight}
+        return {"size": self.size, "idle": len(self._idle), "in_use": self._in_use}
+
+    async def close(self):
+        self._closed = True
+        entries = self._idle + self._shared
+        self._idle, self._shared = [], []
+        for entry in entries:
+            await entry[0].close()
+
+
+class AsyncRCONManager:
+    """RCONManager 的异步版本，不会阻塞 NiceGUI 事件循环
+
+    配置与本地封禁列表沿用传入的 RCONManager，命令通过异步连接池发送。
+    启用 [queue] 时所有命令先进入共享的 CommandScheduler，按优先级
+    （交互 > 自动化 > 轮询）排队并受令牌桶限速。
+    设置了 ``audit``（AuditLog）时，除轮询外的每条命令及其结果都记入审计日志。
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.pool = None
+        self.scheduler = self._create_scheduler()
+        self.audit = None
+
+    def _create_scheduler(self):
+        q = self.manager.queue_settings
+        if not q.get('enabled', True):
+            return None
+        return CommandScheduler(rate=float(q.get('rate', 20)), burst=float(q.get('burst', 40)),
+                                workers=int(q.get('workers', 4)))
+
+    def _create_pool(self):
+        m = self.manager
+        return AsyncRCONPool(
+            lambda: AsyncRCONClient(m.host, m.port, m.password, timeout=m.timeout,
+                                    pipeline_depth=m.pool_settings.get('pipeline_depth', 32),
+                                    multipacket=m.multipacket, max_response_bytes=m.max_response_bytes),
+            size=m.pool_settings.get('size', 4),
+            idle_timeout=float(m.pool_settings.get('idle_timeout', 300)),
+            max_lifetime=float(m.pool_settings.get('max_lifetime', 3600)),
+            acquire_timeout=float(m.pool_settings.get('acquire_timeout', 10)),
+            pipeline=bool(m.pool_settings.get('pipeline', False)),
+        )
+
+    def _ensure_pool(self):
+        m = self.manager
+        if not all([m.host, m.port, m.password]):
+            return False
+        if self.pool is None:
+            self.pool = self._create_pool()
+        return True
+
+    async def _schedule(self, factory, priority, key=None, cost=1):
+        """经命令队列执行 ``factory``；未启用队列时直接执行"""
+        if self.scheduler is None:
+            return await factory()
+        return await self.scheduler.submit(factory, priority, key, cost)
+
+    async def _run_command(self, cmd, timeout):
+        """在连接池上执行单条命令并记录耗时、响应大小与错误"""
+        started = time.perf_counter()
+        try:
+            response = await self.pool.run(lambda client: client.command(cmd, timeout))
+        except Exception as e:
+            observe_command(cmd, 'async', time.perf_counter() - started, error=e)
+            raise
+        observe_command(cmd, 'async', time.perf_counter() - started, response,
+                        rejected=self.manager.parser.is_failure(response, cmd))
+        return response
+
+    async def _run_many(self, cmds, timeout, depth=None):
+        """在连接池上流水线执行多条命令，记录整批耗时和逐条的响应大小与错误"""
+        started = time.perf_counter()
+        try:
+            results = await self.pool.run(lambda client: client.command_many(cmds, timeout, depth))
+        except Exception as e:
+            for cmd in cmds:
+                observe_result(cmd, error=e)
+            raise
+        finally:
+            BATCH_LATENCY.observe(time.perf_counter() - started, mode='async')
+        for cmd, result in zip(cmds, results):
+            if isinstance(result, Exception):
+                observe_result(cmd, error=result)
+            else:
+                observe_result(cmd, result, rejected=self.manager.parser.is_failure(result, cmd))
+        return results
+
+    async def _audit(self, results, priority):
+        """记录 (命令, 响应, 是否成功) 序列；状态轮询不记录"""
+        if self.audit is None or priority == POLLING:
+            return
+        for cmd, response, ok in results:
+            await self.audit.log(self.manager.name, cmd, response, ok)
+
+    async def command(self, cmd, timeout=None, priority=INTERACTIVE):
+        """异步执行命令，失败时与 RCONManager.command 一样返回错误描述"""
+        response = await self._command(cmd, timeout, priority)
+        await self._audit([(cmd, response, not self.manager.parser.is_failure(response, cmd))], priority)
+        return response
+
+    async def _command(self, cmd, timeout, priority):
+        if not self._ensure_pool():
+            return "服务器配置不完整"
+
+        try:
+            return await self._schedule(lambda: self._run_command(cmd, timeout), priority, key=cmd)
+        except asyncio.TimeoutError:
+            logging.error(f"执行命令 '{cmd}' 超时")
+            return "命令执行失败: 超时"
+        except (OSError, RCONError) as e:
+            logging.error(f"执行命令 '{cmd}' 失败: {e}")
+            return f"命令执行失败: {e}"
+
+    async def command_many(self, cmds, timeout=None, priority=INTERACTIVE):
+        """在同一连接上流水线发送多条命令，整批只需约一次往返
+
+        返回与 ``cmds`` 等长的响应列表，单条失败时对应位置为错误描述。
+        """
+        cmds = list(cmds)
+        responses = await self._command_many(cmds, timeout, priority)
+        is_failure = self.manager.parser.is_failure
+        await self._audit([(c, r, not is_failure(r, c)) for c, r in zip(cmds, responses)], priority)
+        return responses
+
+    async def _command_many(self, cmds, timeout, priority):
+        if not cmds:
+            return []
+        if not self._ensure_pool():
+            return ["服务器配置不完整"] * len(cmds)
+
+        try:
+            results = await self._schedule(lambda: self._run_many(cmds, timeout),
+                                           priority, key=tuple(cmds), cost=len(cmds))
+        except (OSError, RCONError) as e:
+            logging.error(f"批量执行 {len(cmds)} 条命令失败: {e}")
+            return [f"命令执行失败: {e}"] * len(cmds)
+
+        responses = []
+        for cmd, result in zip(cmds, results):
+            if isinstance(result, asyncio.TimeoutError):
+                logging.error(f"执行命令 '{cmd}' 超时")
+                responses.append("命令执行失败: 超时")
+            elif isinstance(result, Exception):
+                logging.error(f"执行命令 '{cmd}' 失败: {result}")
+                responses.append(f"命令执行失败: {result}")
+            else:
+                responses.append(result)
+        return responses
+
+    async def batch(self, commands, concurrency=None, timeout=None, priority=INTERACTIVE):
+        """在一条流水线连接上批量执行命令，返回逐条成功/失败的 BatchReport
+
+        ``concurrency`` 限制同时在途的命令数，失败判定按识别出的服务端类型进行。
+        """
+        report = await self._batch([c for c in commands if c], concurrency, timeout, priority)
+        await self._audit([(r.command, r.error or r.response, r.ok) for r in report.results], priority)
+        return report
+
+    async def _batch(self, commands, concurrency, timeout, priority):
+        report = BatchReport()
+        if not commands:
+            return report
+        if not self._ensure_pool():
+            report.results = [make_result(c, error="服务器配置不完整") for c in commands]
+            return report
+
+        try:
+            results = await self._schedule(lambda: self._run_many(commands, timeout, concurrency),
+                                           priority, key=tuple(commands), cost=len(commands))
+        except (OSError, RCONError) as e:
+            logging.error(f"批量执行 {len(commands)} 条命令失败: {e}")
+            results = [e] * len(commands)
+        for cmd, result in zip(commands, results):
+            if isinstance(result, asyncio.TimeoutError):
+                report.results.append(make_result(cmd, error="超时"))
+            elif isinstance(result, Exception):
+                report.results.append(make_result(cmd, error=result))
+            else:
+                report.results.append(make_result(cmd, result, flavor=self.manager.parser.flavor))
+        return report
+
+    async def close(self):
+        if self.scheduler:
+            await self.scheduler.close()
+        if self.pool:
+            await self.pool.close()
+        self.pool = None
+
+    async def get_server_status(self, priority=POLLING):
+        """获取服务器状态，包括在线人数和玩家列表"""
+        parser = self.manager.parser
+        if parser.version_checked:
+            return parser.parse_list(await self.command('list', priority=priority)).as_status()
+        # 首次轮询时顺带用 'version' 探测服务端类型，识别后不再发送
+        response, version = await self.command_many(['list', 'version'], priority=priority)
+        parser.learn_version(version)
+        return parser.parse_list(response).as_status()
+
+    async def get_whitelist(self):
+        """获取白名单列表"""
+        whitelist = parse_whitelist(await self.command('whitelist list'))
+        return whitelist.players if whitelist else []
+
+    async def add_to_whitelist(self, player_name):
+        """将玩家添加到白名单"""
+        return await self.command(f'whitelist add {player_name}')
+
+    async def remove_from_whitelist(self, player_name):
+        """将玩家从白名单移除"""
+        return await self.command(f'whitelist remove {player_name}')
+
+    def get_ban_list(self):
+        """从内存直接获取封禁列表"""
+        return self.manager.get_ban_list()
+
+    async def get_server_ban_list(self, priority=AUTOMATION):
+        """从服务器读取封禁列表，返回 {'players': [BanRecord], 'ips': [BanRecord]}
+
+        任一列表读取失败时返回 None。
+        """
+        players, ips = await self.command_many(['banlist players', 'banlist ips'], priority=priority)
+        players, ips = parse_banlist(players), parse_banlist(ips)
+        if players is None or ips is None:
+            return None
+        return {'players': players, 'ips': ips}
+
+    async def ban_player(self, player_name, reason='', issuer=''):
+        """封禁玩家，服务器确认成功后立即记录到本地封禁列表"""
+        command = f'ban {player_name} {reason}'.rstrip()
+        response = await self.command(command)
+        if not self.manager.parser.is_failure(response, command):
+            self.manager.record_ban(player_name, reason, issuer)
+        return response
+
+    async def pardon_target(self, target_name):
+        """解封玩家或IP，服务器确认成功后立即更新本地封禁列表"""
+        if not target_name:
+            return "目标不能为空"
+
+        command = f'pardon-ip {target_name}' if is_ip_address(target_name) else f'pardon {target_name}'
+        response = await self.command(command)
+        if not self.manager.parser.is_failure(response, command):
+            self.manager.record_pardon(target_name)
+        return response
+
+    async def ban_players(self, player_names, reason='', issuer='', concurrency=None, priority=INTERACTIVE):
+        """批量封禁玩家，只把服务器确认成功的玩家记入本地列表"""
+        names = [n for n in dict.fromkeys(player_names) if n]
+        report = await self.batch([f'ban {n} {reason}'.rstrip() for n in names], concurrency,
+                                  priority=priority)
+        self.manager.record_bans([n for n, r in zip(names, report.results) if r.ok], reason, issuer)
+        return report
+
+    async def pardon_targets(self, target_names, concurrency=None, priority=INTERACTIVE):
+        """批量解封玩家或IP"""
+        targets = [t for t in dict.fromkeys(target_names) if t]
+        commands = [f'pardon-ip {t}' if is_ip_address(t) else f'pardon {t}' for t in targets]
+        report = await self.batch(commands, concurrency, priority=priority)
+        self.manager.record_pardons([t for t, r in zip(targets, report.results) if r.ok])
+        return report
+
+    async def op_player(self, player_name):
+        """授予玩家OP权限"""
+        return await self.command(f'op {player_name}')
+
+    async def deop_player(self, player_name):
+        """撤销玩家OP权限"""
+        return await self.command(f'deop {player_name}')
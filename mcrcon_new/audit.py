@@ -0,0 +1,241 @@
+"""管理操作的审计日志
+
+每条经面板发送的命令（状态轮询除外）连同执行者、服务器、涉及的玩家和结果记为一条审计记录。
+记录先进入内存中的有界队列，由后台协程成批写入 SQLite（一次事务提交一批，即 group commit），
+发送命令的一方不等待磁盘写入；队列满时写入方等待队列腾出空间，内存占用保持有界。
+"""
+import asyncio
+import contextvars
+import logging
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from mcrcon_new import metrics
+
+# 当前操作的执行者；未设置时由 AuditLog.resolve_actor 推断，仍无法确定时记为 'system'
+current_actor = contextvars.ContextVar('audit_actor', default=None)
+
+# 命令名 -> 玩家名所在的参数位置（从 1 开始，0 为命令名）
+PLAYER_ARGUMENT = {
+    'ban': 1, 'pardon': 1, 'kick': 1, 'op': 1, 'deop': 1, 'tell': 1, 'msg': 1, 'w': 1,
+    'clear': 1, 'give': 1, 'kill': 1, 'tp': 1, 'teleport': 1, 'spawnpoint': 1,
+    'gamemode': 2, 'whitelist': 2, 'effect': 2, 'xp': 2, 'experience': 2, 'advancement': 2,
+}
+PLAYER_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_]{1,16}$')
+# 响应只保留前若干字符，避免长输出撑大数据库
+MAX_RESPONSE_CHARS = 2000
+
+
+@contextmanager
+def acting_as(actor):
+    """在这段代码中发送的命令记在 ``actor`` 名下"""
+    token = current_actor.set(actor)
+    try:
+        yield
+    finally:
+        current_actor.reset(token)
+
+
+def command_verb(command):
+    return command.strip().lstrip('/').split(None, 1)[0].lower() if command and command.strip() else ''
+
+
+def player_from_command(command):
+    """从命令参数中取出目标玩家名，选择器（@a 等）和无法确定的情况返回空字符串"""
+    parts = command.strip().lstrip('/').split()
+    if not parts:
+        return ''
+    index = PLAYER_ARGUMENT.get(parts[0].lower())
+    if index is None or index >= len(parts):
+        return ''
+    name = parts[index]
+    return name if PLAYER_NAME_PATTERN.match(name) else ''
+
+
+@dataclass(frozen=True)
+class AuditRecord:
+    actor: str
+    server: str
+    command: str
+    ok: bool
+    response: str = ''
+    at: float = field(default_factory=time.time)
+
+    @property
+    def verb(self):
+        return command_verb(self.command)
+
+    @property
+    def player(self):
+        return player_from_command(self.command)
+
+
+class AuditLog:
+    """审计记录的异步批量写入与查询
+
+    ``max_queue`` 为内存中最多积压的记录数；``batch_size`` 为单次提交的最多记录数，
+    写入线程忙时到达的记录会在下一次提交中一起写入。``resolve_actor`` 可设置为返回当前
+    执行者的函数（例如面板按浏览器会话推断），在没有显式设置执行者时调用。
+    """
+
+    def __init__(self, db_path='data/audit.sqlite', max_queue=10000, batch_size=500, linger=0.2,
+                 retention_days=180):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.linger = linger
+        self.retention_days = retention_days
+        self.resolve_actor = None
+        self.written = 0
+        self.dropped = 0
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._writer_db = None
+        self._reader_db = None
+        self._task = None
+        self._pruned_at = 0.0
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    # --- 生命周期 ---
+
+    def open(self):
+        """打开数据库并启动后台写入协程，需在事件循环中调用"""
+        # 写入在线程中进行；WAL 模式下页面查询不会被写入阻塞
+        self._writer_db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._writer_db.execute('PRAGMA journal_mode=WAL')
+        self._writer_db.execute(
+            'CREATE TABLE IF NOT EXISTS audit ('
+            'id INTEGER PRIMARY KEY, at REAL, actor TEXT, server TEXT, verb TEXT, player TEXT, '
+            'command TEXT, ok INTEGER, response TEXT)')
+        for column in ('at', 'actor', 'player', 'verb'):
+            suffix = '' if column == 'at' else ', at'
+            self._writer_db.execute(f'CREATE INDEX IF NOT EXISTS audit_{column} ON audit ({column}{suffix})')
+        self._writer_db.commit()
+        # 页面在线程中查询
+        self._reader_db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """停止后台协程并写入队列中剩余的记录"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        remaining = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if remaining and self._writer_db is not None:
+            self._write(remaining)
+        for db in (self._writer_db, self._reader_db):
+            if db is not None:
+                db.close()
+        self._writer_db = self._reader_db = None
+
+    # --- 写入 ---
+
+    def actor(self):
+        actor = current_actor.get()
+        if actor is None and self.resolve_actor is not None:
+            actor = self.resolve_actor()
+        return actor or 'system'
+
+    async def log(self, server, command, response, ok):
+        """提交一条记录；通常立即返回，队列满时等待写入协程腾出空间"""
+        record = AuditRecord(self.actor(), server, command, bool(ok), (response or '')[:MAX_RESPONSE_CHARS])
+        if self._task is None:
+            # 尚未启动或已关闭：不阻塞调用方，队列满时丢弃
+            try:
+                self._queue.put_nowait(record)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                metrics.AUDIT_DROPPED.inc()
+            return
+        await self._queue.put(record)
+
+    def _write(self, records):
+        rows = [(r.at, r.actor, r.server, r.verb, r.player, r.command, int(r.ok), r.response) for r in records]
+        with self._writer_db:
+            self._writer_db.executemany(
+                'INSERT INTO audit (at, actor, server, verb, player, command, ok, response) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            now = time.time()
+            if self.retention_days and now - self._pruned_at > 3600:
+                self._writer_db.execute('DELETE FROM audit WHERE at < ?', (now - self.retention_days * 86400,))
+                self._pruned_at = now
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.linger and self._queue.qsize() < self.batch_size:
+                # 稍等片刻，让短时间内的连续操作合并为一次提交
+                await asyncio.sleep(self.linger)
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except sqlite3.Error as e:
+                logging.error(f"无法写入审计日志，丢弃 {len(batch)} 条记录: {e}")
+                self.dropped += len(batch)
+                metrics.AUDIT_DROPPED.inc(len(batch))
+                continue
+            self.written += len(batch)
+            metrics.AUDIT_WRITTEN.inc(len(batch))
+
+    # --- 查询 ---
+
+    def query(self, actor=None, player=None, command=None, server=None, since=None, until=None, limit=200):
+        """按执行者、玩家、命令名（或命令中的关键字）、服务器与时间范围查询，最新的在前"""
+        if self._reader_db is None:
+            return []
+        sql = 'SELECT at, actor, server, command, ok, response FROM audit WHERE 1'
+        params = []
+        if actor:
+            sql += ' AND actor = ?'
+            params.append(actor)
+        if player:
+            sql += ' AND player = ?'
+            params.append(player)
+        if command:
+            command = command.strip().lstrip('/')
+            if ' ' in command:
+                sql += " AND command LIKE ? ESCAPE '\\'"
+                escaped = command.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                params.append(f'%{escaped}%')
+            else:
+                sql += ' AND verb = ?'
+                params.append(command.lower())
+        if server:
+            sql += ' AND server = ?'
+            params.append(server)
+        if since is not None:
+            sql += ' AND at >= ?'
+            params.append(since)
+        if until is not None:
+            sql += ' AND at < ?'
+            params.append(until)
+        sql += ' ORDER BY at DESC LIMIT ?'
+        params.append(limit)
+        try:
+            rows = self._reader_db.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"查询审计日志失败: {e}")
+            return []
+        return [{'at': at, 'actor': actor, 'server': server, 'command': command, 'ok': bool(ok),
+                 'response': response} for at, actor, server, command, ok, response in rows]
+
+    def actors(self):
+        """出现过的执行者，用于页面筛选"""
+        if self._reader_db is None:
+            return []
+        try:
+            return [row[0] for row in self._reader_db.execute('SELECT DISTINCT actor FROM audit ORDER BY actor')]
+        except sqlite3.Error as e:
+            logging.error(f"查询审计日志失败: {e}")
+            return []
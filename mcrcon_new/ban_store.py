@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class BanEntry:
+    """一条封禁记录"""
+    target: str
+    kind: str = 'player'  # 'player' 或 'ip'
+    reason: str = ''
+    banned_at: float = 0.0
+    issuer: str = ''
+
+
+class BanStore:
+    """带索引的封禁列表存储
+
+    内存中按类型以 dict 索引，成员判断为 O(1)。每次变更只向日志文件追加一行，
+    日志累计超过 ``compact_threshold`` 行时才把完整快照写回 ``snapshot_path``
+    并清空日志。快照格式兼容旧版只含名字列表的 banned_players.json。
+    """
+
+    def __init__(self, snapshot_path, journal_path=None, compact_threshold=1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + '.journal.jsonl'
+        self.compact_threshold = compact_threshold
+        self.entries = {'player': {}, 'ip': {}}
+        self.journal_size = 0
+        self._journal = None
+        self._view = None
+
+    # --- 加载与持久化 ---
+
+    def load(self):
+        """读取快照并重放日志"""
+        self.entries = {'player': {}, 'ip': {}}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key, kind in (('players', 'player'), ('ips', 'ip')):
+                for item in data.get(key, []):
+                    entry = BanEntry(item, kind) if isinstance(item, str) else BanEntry(**{**item, 'kind': kind})
+                    self.entries[kind][entry.target] = entry
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, TypeError, AttributeError) as e:
+            logging.error(f"封禁列表文件格式错误，将以空列表启动: {e}")
+
+        self.journal_size = 0
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                        self.journal_size += 1
+                    except (json.JSONDecodeError, TypeError, KeyError):
+                        # 进程崩溃时最后一行可能不完整，忽略即可
+                        logging.warning(f"忽略无效的封禁日志行: {line.strip()}")
+        except FileNotFoundError:
+            pass
+        self._view = None
+        if not os.path.exists(self.snapshot_path):
+            self.compact()
+
+    def _apply(self, record):
+        kind = record['kind']
+        if record['op'] == 'ban':
+            self.entries[kind][record['target']] = BanEntry(**record['entry'])
+        else:
+            self.entries[kind].pop(record['target'], None)
+
+    def _append(self, records):
+        if not records:
+            return
+        self._view = None
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+            self._journal.flush()
+            self.journal_size += len(records)
+        except IOError as e:
+            logging.error(f"无法写入封禁日志: {e}")
+        if self.journal_size >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """把当前内容写成新快照并清空日志（先写临时文件再原子替换）"""
+        data = {
+            'players': [asdict(e) for e in self.entries['player'].values()],
+            'ips': [asdict(e) for e in self.entries['ip'].values()],
+        }
+        tmp_path = self.snapshot_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            open(self.journal_path, 'w', encoding='utf-8').close()
+            self.journal_size = 0
+        except IOError as e:
+            logging.error(f"无法写入封禁列表文件: {e}")
+
+    def close(self):
+        if self.journal_size:
+            self.compact()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # --- 查询与修改 ---
+
+    def targets(self, kind='player'):
+        """返回某类封禁目标的集合视图"""
+        return self.entries[kind].keys()
+
+    def contains(self, target, kind='player'):
+        return target in self.entries[kind]
+
+    def get(self, target, kind='player'):
+        return self.entries[kind].get(target)
+
+    def ban_many(self, targets, kind='player', reason='', issuer=''):
+        """批量记录封禁，返回实际新增的目标；整批只追加一次日志"""
+        now = time.time()
+        return self.add_entries(BanEntry(t, kind, reason or '', now, issuer or '') for t in targets if t)
+
+    def add_entries(self, entries):
+        """批量写入已构造好的封禁记录，已存在的目标会被跳过"""
+        records = []
+        added = []
+        for entry in entries:
+            if entry.target in self.entries[entry.kind]:
+                continue
+            self.entries[entry.kind][entry.target] = entry
+            records.append({'op': 'ban', 'kind': entry.kind, 'target': entry.target, 'entry': asdict(entry)})
+            added.append(entry.target)
+        self._append(records)
+        return added
+
+    def pardon_many(self, targets, kind='player'):
+        """批量移除封禁，返回实际移除的目标"""
+        records = []
+        removed = []
+        for target in targets:
+            if self.entries[kind].pop(target, None) is not None:
+                records.append({'op': 'pardon', 'kind': kind, 'target': target})
+                removed.append(target)
+        self._append(records)
+        return removed
+
+    def as_lists(self):
+        """返回 {'players': [...], 'ips': [...]} 形式的名单，结果在下次变更前复用"""
+        if self._view is None:
+            self._view = {
+                'players': list(self.entries['player']),
+                'ips': list(self.entries['ip']),
+            }
+        return self._view
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+from mcrcon_new.ban_store import BanEntry
+from mcrcon_new.command_queue import AUTOMATION
+from mcrcon_new.parsers import BanRecord
+
+
+@dataclass(frozen=True)
+class BansChanged:
+    """本地封禁列表发生变化（面板封禁/解封或同步拉取、移除）"""
+    at: float = field(default_factory=time.time)
+
+
+# 服务器目录中的封禁文件：banlist 键 -> (文件名, 目标字段)
+BAN_FILES = {'players': ('banned-players.json', 'name'), 'ips': ('banned-ips.json', 'ip')}
+
+
+class BanReconciler:
+    """把本地封禁列表与服务器的 banlist 双向增量同步
+
+    以上次同步完成时双方一致的集合为基线做三方比较：
+      - 仅服务器有、基线没有：服务器上新增的封禁，拉取到本地
+      - 仅服务器有、基线也有：本地已解封但未同步到服务器，向服务器发送 pardon
+      - 仅本地有、基线有：服务器上已被解封，从本地移除
+      - 仅本地有、基线没有：本地新增但服务器没有，向服务器发送 ban
+    只对差集执行操作，推送按 ``batch_size`` 分批流水线发送。
+    ``server_dir`` 可读时直接读取服务器的 banned-players.json 与 banned-ips.json，否则解析 banlist；
+    解析结果不精确（输出中没有换行）时不拉取也不删除本地封禁，以免误删。
+    """
+
+    KINDS = (('players', 'player'), ('ips', 'ip'))
+
+    def __init__(self, async_rcon, manager, batch_size=100, state_path=None, server_dir=None, bus=None):
+        self.async_rcon = async_rcon
+        self.bus = bus
+        self.manager = manager
+        self.batch_size = batch_size
+        self.server_dir = server_dir
+        self.state_path = state_path or os.path.splitext(manager.ban_file_path)[0] + '.sync.json'
+        self.baseline = {'player': set(), 'ip': set()}
+        self.last_result = None
+        self._lock = asyncio.Lock()
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.baseline = {kind: set(data.get(key, [])) for key, kind in self.KINDS}
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, AttributeError) as e:
+            logging.error(f"封禁同步状态文件格式错误，将重新建立基线: {e}")
+
+    def _save_state(self):
+        data = {key: sorted(self.baseline[kind]) for key, kind in self.KINDS}
+        tmp_path = self.state_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except IOError as e:
+            logging.error(f"无法写入封禁同步状态: {e}")
+
+    def _read_ban_files(self):
+        """读取服务器目录中的封禁文件，任一文件不可用时返回 None"""
+        if not self.server_dir:
+            return None
+        result = {}
+        for key, (filename, target_field) in BAN_FILES.items():
+            path = os.path.join(self.server_dir, filename)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except FileNotFoundError:
+                return None
+            except (OSError, json.JSONDecodeError) as e:
+                logging.error(f"读取 {path} 失败: {e}")
+                return None
+            if not isinstance(entries, list):
+                return None
+            result[key] = [BanRecord(e[target_field], e.get('source', ''), e.get('reason', ''))
+                           for e in entries if isinstance(e, dict) and e.get(target_field)]
+        return result
+
+    async def _push(self, commands, priority):
+        """分批发送命令，返回执行失败的命令对应的下标集合"""
+        failed = set()
+        for start in range(0, len(commands), self.batch_size):
+            report = await self.async_rcon.batch(commands[start:start + self.batch_size], priority=priority)
+            failed.update(start + i for i, r in enumerate(report.results) if not r.ok)
+        return failed
+
+    async def reconcile(self, priority=AUTOMATION):
+        """执行一次同步，返回各方向的变更数量；读取服务器列表失败时返回 None
+
+        后台定期同步走自动化通道，服务器过载时被暂缓；管理员手动同步时传入 INTERACTIVE。
+        """
+        async with self._lock:
+            server = await asyncio.to_thread(self._read_ban_files)
+            if server is None:
+                server = await self.async_rcon.get_server_ban_list(priority=priority)
+            if server is None:
+                logging.warning("无法读取服务器封禁列表，跳过本次同步")
+                return None
+
+            store = self.manager.ban_store
+            result = {'pulled': 0, 'removed': 0, 'pushed_bans': 0, 'pushed_pardons': 0, 'failed': 0}
+            now = time.time()
+            for key, kind in self.KINDS:
+                remote = {r.target: (r.issuer, r.reason) for r in server[key]}
+                remote_set = set(remote)
+                local_set = set(store.targets(kind))
+                base = self.baseline[kind]
+
+                server_only = remote_set - local_set
+                local_only = local_set - remote_set
+                to_pull = server_only - base
+                to_unban_remote = sorted(server_only & base)
+                to_remove = local_only & base
+                to_ban_remote = sorted(local_only - base)
+                if not all(r.exact for r in server[key]):
+                    # 名字边界不确定，服务器集合可能含有拼错的名字、缺少真实的名字
+                    logging.warning(f"服务器 banlist 输出无法精确解析，本次不拉取也不删除本地封禁 ({kind})")
+                    to_pull, to_remove = set(), set()
+
+                pulled = store.add_entries(
+                    BanEntry(t, kind, remote[t][1], now, remote[t][0]) for t in to_pull)
+                removed = store.pardon_many(to_remove, kind)
+
+                ban_cmd = 'ban-ip' if kind == 'ip' else 'ban'
+                pardon_cmd = 'pardon-ip' if kind == 'ip' else 'pardon'
+                ban_commands = []
+                for t in to_ban_remote:
+                    entry = store.get(t, kind)
+                    ban_commands.append(f'{ban_cmd} {t} {entry.reason if entry else ""}'.rstrip())
+                failed_bans = await self._push(ban_commands, priority)
+                failed_pardons = await self._push([f'{pardon_cmd} {t}' for t in to_unban_remote], priority)
+
+                # 推送失败的封禁不进入基线，下次仍视为本地新增；
+                # 推送失败的解封保留在基线中，下次会再次尝试解封
+                self.baseline[kind] = (
+                    (set(store.targets(kind)) - {to_ban_remote[i] for i in failed_bans})
+                    | {to_unban_remote[i] for i in failed_pardons}
+                )
+
+                result['pulled'] += len(pulled)
+                result['removed'] += len(removed)
+                result['pushed_bans'] += len(to_ban_remote) - len(failed_bans)
+                result['pushed_pardons'] += len(to_unban_remote) - len(failed_pardons)
+                result['failed'] += len(failed_bans) + len(failed_pardons)
+
+            self._save_state()
+            self.last_result = {**result, 'at': now}
+            if any(result.values()):
+                logging.info(f"封禁列表同步完成: {result}")
+        if self.bus is not None and (result['pulled'] or result['removed']):
+            await self.bus.publish(BansChanged(now))
+        return result
+
+    async def run(self, interval):
+        """按固定间隔周期性同步"""
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logging.error(f"封禁列表同步失败: {e}")
+            await asyncio.sleep(interval)
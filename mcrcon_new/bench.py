@@ -0,0 +1,336 @@
+"""RCON 客户端性能基准
+
+在本地测试服务器（mcrcon_new.fake_server）上模拟多个页面客户端和自动化任务同时发送命令，
+分别测量以下几种发送方式的吞吐量（命令/秒）、延迟 p50/p99、错误数、建立的连接数
+与峰值内存：
+
+- ``connect``：每条命令新建连接并验证，执行后断开（旧版工具的做法）
+- ``sync-pool``：RCONManager 的同步连接池，每个客户端一个线程
+- ``async-pool``：AsyncRCONManager 的连接池，每条连接同时只有一个请求
+- ``async-pipeline``：AsyncRCONManager 的流水线模式，多个请求共享连接
+
+    python -m mcrcon_new.bench --clients 20 --automations 2 --duration 5 --latency 0.005
+    python -m mcrcon_new.bench --json result.json --baseline last.json
+
+``--baseline`` 读取之前用 ``--json`` 保存的结果并显示变化百分比，便于发现性能回退。
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import toml
+
+from mcrcon_new.async_rcon import AsyncRCONManager
+from mcrcon_new.command_queue import AUTOMATION
+from mcrcon_new.fake_server import FakeRCONServer
+from mcrcon_new.parsers import VANILLA, is_failed_response
+from mcrcon_new.rcon_manager import RCONManager
+from mcrcon_new.rcon_protocol import RCONConnection
+
+MODES = ('connect', 'sync-pool', 'async-pool', 'async-pipeline')
+PASSWORD = 'bench'
+
+# 页面客户端随机发送的命令，大致对应仪表盘、白名单与封禁页面的请求
+UI_COMMANDS = ('list', 'list', 'whitelist list', 'banlist', 'say 基准测试')
+
+
+def failed(response):
+    """连接错误与服务器返回的错误文本都计为失败"""
+    return is_failed_response(response, VANILLA)
+
+
+def percentile(values, q):
+    """最近秩法计算分位数，``q`` 取 0~100"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered), math.ceil(q / 100 * len(ordered))) - 1)]
+
+
+@dataclass
+class BenchResult:
+    """一种发送方式的测量结果，延迟单位为秒"""
+    mode: str
+    duration: float = 0.0
+    commands: int = 0
+    errors: int = 0
+    ui_latencies: list = field(default_factory=list)
+    batch_latencies: list = field(default_factory=list)
+    connections: int = 0
+    peak_memory: int = 0
+
+    @property
+    def throughput(self):
+        return self.commands / self.duration if self.duration else 0.0
+
+    def as_dict(self):
+        return {
+            'mode': self.mode,
+            'commands_per_sec': round(self.throughput, 1),
+            'commands': self.commands,
+            'errors': self.errors,
+            'ui_p50_ms': round(percentile(self.ui_latencies, 50) * 1000, 2),
+            'ui_p99_ms': round(percentile(self.ui_latencies, 99) * 1000, 2),
+            'batch_p50_ms': round(percentile(self.batch_latencies, 50) * 1000, 2),
+            'batch_p99_ms': round(percentile(self.batch_latencies, 99) * 1000, 2),
+            'connections': self.connections,
+            'peak_memory_kib': round(self.peak_memory / 1024, 1),
+        }
+
+
+class ServerThread:
+    """在独立线程的事件循环中运行测试服务器，使同步和异步客户端面对同一个服务器实现"""
+
+    def __init__(self, server):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result()
+        return self.server
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def write_config(directory, port, args, pipeline):
+    """为被测的 RCONManager 生成配置文件"""
+    config = {
+        'server': {'name': 'bench', 'host': '127.0.0.1', 'port': port, 'password': PASSWORD,
+                   'timeout': args.timeout, 'flavor': 'vanilla'},
+        'pool': {'size': args.pool_size, 'pipeline': pipeline, 'pipeline_depth': args.pipeline_depth},
+        'queue': {'enabled': args.queue},
+    }
+    path = os.path.join(directory, f'config.{port}.toml')
+    with open(path, 'w', encoding='utf-8') as f:
+        toml.dump(config, f)
+    return path
+
+
+def automation_commands(worker, round_, size):
+    return [f'say 自动化任务 {worker}-{round_}-{n}' for n in range(size)]
+
+
+def run_sync(mode, args, port, directory):
+    result = BenchResult(mode)
+    manager = None
+    if mode == 'sync-pool':
+        manager = RCONManager(write_config(directory, port, args, pipeline=False),
+                              ban_file_path=os.path.join(directory, 'bans.json'))
+    lock = threading.Lock()
+
+    def one_shot(cmd):
+        conn = RCONConnection('127.0.0.1', port, PASSWORD, timeout=args.timeout)
+        try:
+            conn.connect()
+            return conn.command(cmd)
+        except Exception as e:
+            return f'命令执行失败: {e}'
+        finally:
+            conn.disconnect()
+
+    def count(commands, errors):
+        with lock:
+            result.commands += commands
+            result.errors += errors
+
+    def ui_client(index, deadline):
+        rnd = random.Random(index)
+        while time.perf_counter() < deadline:
+            cmd = rnd.choice(UI_COMMANDS)
+            started = time.perf_counter()
+            response = one_shot(cmd) if manager is None else manager.command(cmd)
+            result.ui_latencies.append(time.perf_counter() - started)
+            count(1, int(failed(response)))
+            if args.think:
+                time.sleep(args.think)
+
+    def automation(index, deadline):
+        round_ = 0
+        while time.perf_counter() < deadline:
+            commands = automation_commands(index, round_, args.batch)
+            started = time.perf_counter()
+            if manager is None:
+                errors = sum(failed(one_shot(c)) for c in commands)
+            else:
+                errors = len(manager.batch(commands).failed)
+            result.batch_latencies.append(time.perf_counter() - started)
+            count(len(commands), errors)
+            round_ += 1
+            time.sleep(args.automation_interval)
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(args.clients + args.automations) as executor:
+        futures = [executor.submit(ui_client, i, deadline) for i in range(args.clients)]
+        futures += [executor.submit(automation, i, deadline) for i in range(args.automations)]
+        for future in futures:
+            future.result()
+    result.duration = time.perf_counter() - started
+    if manager is not None:
+        manager.disconnect()
+    return result
+
+
+async def run_async(mode, args, port, directory):
+    result = BenchResult(mode)
+    manager = RCONManager(write_config(directory, port, args, pipeline=mode == 'async-pipeline'),
+                          ban_file_path=os.path.join(directory, 'bans.json'))
+    rcon = AsyncRCONManager(manager)
+
+    async def ui_client(index, deadline):
+        rnd = random.Random(index)
+        while time.perf_counter() < deadline:
+            cmd = rnd.choice(UI_COMMANDS)
+            started = time.perf_counter()
+            response = await rcon.command(cmd)
+            result.ui_latencies.append(time.perf_counter() - started)
+            result.commands += 1
+            result.errors += int(failed(response))
+            if args.think:
+                await asyncio.sleep(args.think)
+
+    async def automation(index, deadline):
+        round_ = 0
+        while time.perf_counter() < deadline:
+            commands = automation_commands(index, round_, args.batch)
+            started = time.perf_counter()
+            responses = await rcon.command_many(commands, priority=AUTOMATION)
+            result.batch_latencies.append(time.perf_counter() - started)
+            result.commands += len(commands)
+            result.errors += sum(failed(r) for r in responses)
+            round_ += 1
+            await asyncio.sleep(args.automation_interval)
+
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(ui_client(i, deadline) for i in range(args.clients)),
+                         *(automation(i, deadline) for i in range(args.automations)))
+    result.duration = time.perf_counter() - started
+    await rcon.close()
+    return result
+
+
+def run_mode(mode, args, directory):
+    """启动一个全新的测试服务器并测量一种发送方式"""
+    server = FakeRCONServer(
+        password=PASSWORD, latency=args.latency, jitter=args.jitter, service_time=args.service_time,
+        max_payload=args.max_payload, segment_size=args.segment_size, error_rate=args.error_rate,
+        drop_rate=args.drop_rate, players=[f'Player{i}' for i in range(args.players)],
+        max_players=max(20, args.players), seed=0)
+    server.whitelist = list(server.players)
+    with ServerThread(server):
+        if args.memory:
+            tracemalloc.start()
+        try:
+            if mode.startswith('async'):
+                result = asyncio.run(run_async(mode, args, server.port, directory))
+            else:
+                result = run_sync(mode, args, server.port, directory)
+            if args.memory:
+                result.peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            if args.memory:
+                tracemalloc.stop()
+    result.connections = server.connections
+    return result
+
+
+COLUMNS = (
+    ('mode', '方式', '{}'),
+    ('commands_per_sec', '命令/秒', '{:.1f}'),
+    ('ui_p50_ms', '页面 p50 ms', '{:.2f}'),
+    ('ui_p99_ms', '页面 p99 ms', '{:.2f}'),
+    ('batch_p50_ms', '批量 p50 ms', '{:.2f}'),
+    ('batch_p99_ms', '批量 p99 ms', '{:.2f}'),
+    ('errors', '错误', '{}'),
+    ('connections', '连接数', '{}'),
+    ('peak_memory_kib', '峰值内存 KiB', '{:.1f}'),
+)
+# 与基准结果比较时，这些指标越小越好，其余越大越好
+LOWER_IS_BETTER = {'ui_p50_ms', 'ui_p99_ms', 'batch_p50_ms', 'batch_p99_ms', 'errors', 'connections',
+                   'peak_memory_kib'}
+
+
+def format_table(rows, baseline=None):
+    baseline = {row['mode']: row for row in baseline or []}
+    table = [[title for _, title, _ in COLUMNS]]
+    for row in rows:
+        cells = []
+        for key, _, fmt in COLUMNS:
+            cell = fmt.format(row[key])
+            before = baseline.get(row['mode'], {}).get(key)
+            if key != 'mode' and before:
+                change = (row[key] - before) / before * 100
+                worse = change > 0 if key in LOWER_IS_BETTER else change < 0
+                cell += f" ({change:+.0f}%{'!' if worse and abs(change) >= 10 else ''})"
+            cells.append(cell)
+        table.append(cells)
+    widths = [max(len(r[i]) for r in table) for i in range(len(COLUMNS))]
+    return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(r, widths)) for r in table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RCON 客户端性能基准')
+    parser.add_argument('--modes', default=','.join(MODES), help=f'要测量的方式，逗号分隔：{", ".join(MODES)}')
+    parser.add_argument('--clients', type=int, default=10, help='同时发送命令的页面客户端数')
+    parser.add_argument('--automations', type=int, default=2, help='同时执行批量命令的自动化任务数')
+    parser.add_argument('--batch', type=int, default=20, help='每次自动化任务发送的命令数')
+    parser.add_argument('--automation-interval', type=float, default=0.5, help='自动化任务两次执行之间的秒数')
+    parser.add_argument('--think', type=float, default=0.0, help='页面客户端两条命令之间的秒数，0 表示连续发送')
+    parser.add_argument('--duration', type=float, default=5.0, help='每种方式的测量秒数')
+    parser.add_argument('--timeout', type=float, default=5.0, help='单条命令的超时秒数')
+    parser.add_argument('--pool-size', type=int, default=4, help='连接池大小')
+    parser.add_argument('--pipeline-depth', type=int, default=32, help='流水线模式下单条连接的最大在途请求数')
+    parser.add_argument('--queue', action='store_true', help='经过命令队列（包含 [queue] 默认的限速）')
+    parser.add_argument('--latency', type=float, default=0.002, help='测试服务器的单向网络延迟秒数')
+    parser.add_argument('--jitter', type=float, default=0.0, help='附加的随机延迟上限秒数')
+    parser.add_argument('--service-time', type=float, default=0.0, help='每条命令占用服务器主线程的秒数')
+    parser.add_argument('--max-payload', type=int, default=4096, help='单个响应包的最大负载字节数')
+    parser.add_argument('--segment-size', type=int, default=0, help='把服务器写出拆成该字节数的 TCP 分段')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='服务器回复错误文本的概率')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='服务器断开连接的概率')
+    parser.add_argument('--players', type=int, default=20, help='在线玩家数，决定 list 等响应的大小')
+    parser.add_argument('--memory', action='store_true', help='用 tracemalloc 统计峰值内存（会降低吞吐量）')
+    parser.add_argument('--json', help='把结果保存为 JSON 文件')
+    parser.add_argument('--baseline', help='与之前保存的 JSON 结果比较')
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"未知的方式: {', '.join(sorted(unknown))}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in modes:
+            print(f'正在测量 {mode} ...', flush=True)
+            rows.append(run_mode(mode, args, directory).as_dict())
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print(format_table(rows, baseline))
+    if args.json:
+        settings = {k: v for k, v in vars(args).items() if k not in ('json', 'baseline')}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'results': rows}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
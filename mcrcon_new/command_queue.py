@@ -0,0 +1,278 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from mcrcon_new.rcon_protocol import RCONError
+
+# 优先级通道，数值越小越先执行
+INTERACTIVE = 0
+AUTOMATION = 1
+POLLING = 2
+LANE_NAMES = {INTERACTIVE: 'interactive', AUTOMATION: 'automation', POLLING: 'polling'}
+
+
+class TokenBucket:
+    """令牌桶限速：平均每秒 ``rate`` 个令牌，最多积累 ``burst`` 个"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, count=1):
+        """取走 ``count`` 个令牌，不足时等待
+
+        令牌按补充的速度逐个取走，等待期间不持有锁：大批量的请求等令牌时，
+        只需一个令牌的命令（例如交互命令）仍能及时取到，不会排在整批之后。
+        """
+        if self.rate <= 0:
+            return
+        remaining = count
+        while True:
+            async with self._lock:
+                self._refill()
+                take = min(remaining, self.tokens)
+                if take >= 1 or take >= remaining:
+                    self.tokens -= take
+                    remaining -= take
+                if remaining <= 0:
+                    return
+                wait = (min(remaining, 1) - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+class CommandDeferred(RCONError):
+    """命令所在通道被暂缓（服务器过载），超过等待时限仍未执行"""
+
+
+class _Job:
+    __slots__ = ('key', 'factory', 'priority', 'cost', 'future', 'enqueued_at', 'started', 'waiters', 'expiry')
+
+    def __init__(self, key, factory, priority, cost, future):
+        self.key = key
+        self.factory = factory
+        self.priority = priority
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.started = False
+        self.waiters = 0
+        self.expiry = None
+
+
+class LaneStats:
+    """单个优先级通道的排队统计"""
+
+    def __init__(self):
+        self.depth = 0
+        self.executed = 0
+        self.deduplicated = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def as_dict(self):
+        avg = self.wait_total / self.executed if self.executed else 0.0
+        return {
+            'depth': self.depth, 'executed': self.executed, 'deduplicated': self.deduplicated,
+            'wait_avg': avg, 'wait_max': self.wait_max,
+        }
+
+
+class CommandScheduler:
+    """全服务器共享的 RCON 命令调度器
+
+    所有命令先进入按优先级排序的队列，由固定数量的工作协程取出执行，
+    执行前从令牌桶取令牌，保证整体发送速率不超过 ``rate`` 条/秒。
+    同一通道中仍在排队、键相同的命令会被合并为一次执行，结果共享给所有调用方。
+    被 ``hold()`` 暂缓的通道中的命令留在队列里，``release()`` 后再执行；
+    等待超过 ``hold()`` 给出的时限时以 CommandDeferred 失败，调用方不会无限期等待。
+    """
+
+    def __init__(self, rate=20.0, burst=40, workers=4, dedupe_lanes=(AUTOMATION, POLLING)):
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = max(1, int(workers))
+        self.dedupe_lanes = set(dedupe_lanes)
+        self.lanes = {lane: LaneStats() for lane in LANE_NAMES}
+        self._heap = []
+        self._seq = itertools.count()
+        self._queued = {}
+        self._available = None
+        self._tasks = []
+        self.held = frozenset()
+        self.hold_timeout = None
+        # 出队时所在通道被暂缓的任务，release() 时重新入队
+        self._parked = []
+
+    def _start(self):
+        if self._tasks:
+            return
+        self._available = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+        self._available.release()
+
+    def _promote(self, job):
+        """任务优先级提升后按新优先级重新排队
+
+        旧的堆条目留在原处，出队时因优先级不符被跳过；任务数不变，不再释放信号量。
+        """
+        if job in self._parked:
+            if job.priority not in self.held:
+                self._parked.remove(job)
+                if job.expiry is not None:
+                    job.expiry.cancel()
+                    job.expiry = None
+                self._push(job)
+            return
+        heapq.heappush(self._heap, (job.priority, next(self._seq), job))
+
+    def _drop_stale(self):
+        """丢弃堆顶已开始执行或已被提升优先级的旧条目"""
+        while self._heap:
+            priority, _, job = self._heap[0]
+            if not job.started and priority == job.priority:
+                return
+            heapq.heappop(self._heap)
+
+    def _skip(self, job):
+        """出队的任务无人等待时丢弃、所在通道被暂缓时挂起，返回 True 表示本次不执行"""
+        if job.waiters == 0:
+            # 所有调用方都已取消，直接丢弃
+            job.started = True
+            self._dequeue(job)
+            return True
+        if job.priority in self.held:
+            self._park(job)
+            return True
+        return False
+
+    async def submit(self, factory, priority=INTERACTIVE, key=None, cost=1):
+        """排队执行 ``await factory()`` 并返回其结果
+
+        ``key`` 相同且仍在排队的任务会被合并；``cost`` 为该任务消耗的令牌数
+        （例如一批命令的条数）。
+        """
+        self._start()
+        job = self._queued.get(key) if key is not None and priority in self.dedupe_lanes else None
+        if job is not None and not job.started:
+            self.lanes[priority].deduplicated += 1
+            if priority < job.priority:
+                # 更高优先级的调用方合并进来时，把任务提升到更高的通道
+                self.lanes[job.priority].depth -= 1
+                self.lanes[priority].depth += 1
+                job.priority = priority
+                self._promote(job)
+        else:
+            job = _Job(key, factory, priority, max(1, cost), asyncio.get_running_loop().create_future())
+            if key is not None and priority in self.dedupe_lanes:
+                self._queued[key] = job
+            self.lanes[priority].depth += 1
+            self._push(job)
+
+        job.waiters += 1
+        try:
+            return await asyncio.shield(job.future)
+        finally:
+            job.waiters -= 1
+
+    def hold(self, lanes=(AUTOMATION,), timeout=None):
+        """暂缓执行这些通道中的命令，已开始执行的不受影响
+
+        被暂缓的命令最多等待 ``timeout`` 秒，之后以 CommandDeferred 失败；为 None 时一直等待。
+        """
+        self.held = frozenset(lanes)
+        self.hold_timeout = timeout
+
+    def release(self):
+        """恢复所有通道，并把暂缓期间积压的命令按原优先级重新入队"""
+        self.held = frozenset()
+        parked, self._parked = self._parked, []
+        for job in parked:
+            if job.expiry is not None:
+                job.expiry.cancel()
+                job.expiry = None
+            self._push(job)
+
+    def _park(self, job):
+        self._parked.append(job)
+        if self.hold_timeout is not None and job.expiry is None:
+            job.expiry = asyncio.get_running_loop().call_later(self.hold_timeout, self._expire, job)
+
+    def _expire(self, job):
+        """暂缓的任务等待超时：移出队列并让调用方立即得到错误"""
+        job.expiry = None
+        if job.started or job not in self._parked:
+            return
+        self._parked.remove(job)
+        job.started = True
+        self._dequeue(job)
+        if job.waiters and not job.future.done():
+            job.future.set_exception(CommandDeferred(
+                f"服务器负载过高，命令已暂缓 {self.hold_timeout:.0f} 秒仍未执行"))
+        else:
+            job.future.cancel()
+
+    def _dequeue(self, job):
+        if self._queued.get(job.key) is job:
+            del self._queued[job.key]
+        self.lanes[job.priority].depth -= 1
+
+    async def _worker(self):
+        while True:
+            await self._available.acquire()
+            # 无需执行的任务在取令牌前就移出队列，不占用发送配额
+            self._drop_stale()
+            if self._skip(self._heap[0][2]):
+                heapq.heappop(self._heap)
+                continue
+            # 先取令牌再出队，保证等待令牌期间到达的高优先级命令能插到前面
+            await self.bucket.acquire()
+            self._drop_stale()
+            _, _, job = heapq.heappop(self._heap)
+            self._drop_stale()
+            if self._skip(job):
+                continue
+            job.started = True
+            self._dequeue(job)
+            if job.cost > 1:
+                await self.bucket.acquire(job.cost - 1)
+
+            lane = self.lanes[job.priority]
+            wait = time.monotonic() - job.enqueued_at
+            lane.executed += 1
+            lane.wait_total += wait
+            lane.wait_max = max(lane.wait_max, wait)
+            try:
+                job.future.set_result(await job.factory())
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                job.future.set_exception(e)
+
+    def stats(self):
+        """各通道的队列深度、已执行数、合并数与等待时间"""
+        return {LANE_NAMES[lane]: stats.as_dict() for lane, stats in self.lanes.items()}
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        for job in [entry[2] for entry in self._heap] + self._parked:
+            if job.expiry is not None:
+                job.expiry.cancel()
+            if not job.future.done():
+                job.future.cancel()
+        self._heap = []
+        self._parked = []
+        self._queued = {}
@@ -0,0 +1,199 @@
+import bisect
+import logging
+import sqlite3
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import NamedTuple, Union
+
+from mcrcon_new.command_queue import INTERACTIVE
+from mcrcon_new.db_writer import BatchWriter
+from mcrcon_new.parsers import COMMAND_NAMES
+
+# 超过该字节数的响应在内存缓冲区中压缩保存
+COMPRESS_THRESHOLD = 4096
+# 向页面推送长输出时每块的行数
+STREAM_CHUNK_LINES = 200
+# 每插入这么多条记录检查一次磁盘历史是否超出保留条数
+PRUNE_EVERY = 1000
+
+COMMAND, RESPONSE = 'command', 'response'
+
+
+class ConsoleEntry(NamedTuple):
+    """控制台缓冲区中的一条记录，较大的响应以 zlib 压缩后的字节保存"""
+    seq: int
+    at: float
+    kind: str
+    payload: Union[str, bytes]
+
+    @property
+    def text(self):
+        if isinstance(self.payload, bytes):
+            return zlib.decompress(self.payload).decode('utf-8')
+        return self.payload
+
+    def chunks(self, lines=STREAM_CHUNK_LINES):
+        """把文本按行切成若干块，供页面逐块推送"""
+        text_lines = self.text.splitlines() or ['']
+        for start in range(0, len(text_lines), lines):
+            yield '\n'.join(text_lines[start:start + lines])
+
+
+@dataclass(frozen=True)
+class ConsoleAppended:
+    """控制台中新增了一条命令或响应"""
+    server: str
+    entry: ConsoleEntry
+    at: float = field(default_factory=time.time)
+
+
+def _pack(text):
+    encoded = text.encode('utf-8')
+    return zlib.compress(encoded) if len(encoded) > COMPRESS_THRESHOLD else text
+
+
+def _like_pattern(query):
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+class ConsoleService:
+    """所有管理员共享的控制台
+
+    每台服务器在内存中保留最近 ``buffer_size`` 条命令与响应，页面打开时从这里回放，
+    不再各自持有副本；全部记录在后台成批写入 SQLite，供按关键字、类型搜索。
+    命令历史（去重，最新的在后）用于上下键回溯和补全。
+    """
+
+    def __init__(self, fleet, bus, db_path='data/console.sqlite', buffer_size=1000,
+                 history_size=200, retention=100000):
+        self.fleet = fleet
+        self.bus = bus
+        self.db_path = db_path
+        self.buffer_size = buffer_size
+        self.history_size = history_size
+        self.retention = retention
+        self.buffers = {}
+        self.commands = {}
+        self._writer = None
+        self._reader_db = None
+        self._seq = 0
+        self._inserted = 0
+
+    def _buffer(self, server):
+        return self.buffers.setdefault(server, deque(maxlen=self.buffer_size))
+
+    def _remember(self, server, command):
+        history = self.commands.setdefault(server, deque(maxlen=self.history_size))
+        if command in history:
+            history.remove(command)
+        history.append(command)
+
+    # --- 生命周期 ---
+
+    def open(self):
+        """打开历史数据库，并把每台服务器最近的记录载入内存"""
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS console ('
+            'seq INTEGER PRIMARY KEY, server TEXT, at REAL, kind TEXT, text TEXT)')
+        db.execute('CREATE INDEX IF NOT EXISTS console_server_seq ON console (server, seq)')
+        # 序号在内存中分配，写入可以推迟
+        self._seq = db.execute('SELECT MAX(seq) FROM console').fetchone()[0] or 0
+        for server in self.fleet.servers:
+            rows = db.execute(
+                'SELECT seq, at, kind, text FROM console WHERE server = ? ORDER BY seq DESC LIMIT ?',
+                (server, self.buffer_size)).fetchall()
+            buffer = self._buffer(server)
+            for seq, at, kind, text in reversed(rows):
+                buffer.append(ConsoleEntry(seq, at, kind, _pack(text)))
+                if kind == COMMAND:
+                    self._remember(server, text)
+        self._writer = BatchWriter(db, '控制台历史')
+        # 页面在线程中搜索历史
+        self._reader_db = sqlite3.connect(self.db_path, check_same_thread=False)
+
+    async def close(self):
+        """写入积压的记录后关闭数据库"""
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer.db.close()
+        if self._reader_db is not None:
+            self._reader_db.close()
+        self._writer = self._reader_db = None
+
+    # --- 写入 ---
+
+    def _append(self, server, kind, text):
+        at = time.time()
+        self._seq += 1
+        seq = self._seq
+        if self._writer is not None:
+            self._writer.execute('INSERT INTO console (seq, server, at, kind, text) VALUES (?, ?, ?, ?, ?)',
+                                 (seq, server, at, kind, text))
+            self._inserted += 1
+            if self._inserted % PRUNE_EVERY == 0:
+                self._writer.execute('DELETE FROM console WHERE seq <= ?', (seq - self.retention,))
+        entry = ConsoleEntry(seq, at, kind, _pack(text))
+        self._buffer(server).append(entry)
+        return entry
+
+    async def execute(self, server, command, priority=INTERACTIVE):
+        """在指定服务器上执行命令，命令与响应都会推送给所有打开控制台的页面"""
+        target = self.fleet.servers.get(server)
+        if target is None:
+            raise ValueError(f"未知的服务器: {server}")
+        self._remember(server, command)
+        await self.bus.publish(ConsoleAppended(server, self._append(server, COMMAND, command)))
+        response = await target.rcon.command(command, priority=priority)
+        await self.bus.publish(ConsoleAppended(server, self._append(server, RESPONSE, response or '')))
+        return response
+
+    # --- 读取 ---
+
+    def tail(self, server, limit=None):
+        """内存缓冲区中最近的记录，最早的在前"""
+        entries = list(self.buffers.get(server, ()))
+        return entries[-limit:] if limit else entries
+
+    def search(self, server, query='', kind=None, limit=200):
+        """在磁盘历史中按关键字（不区分大小写）和类型搜索，最新的在前"""
+        if self._reader_db is None:
+            return []
+        sql = 'SELECT seq, at, kind, text FROM console WHERE server = ?'
+        params = [server]
+        if query:
+            sql += " AND text LIKE ? ESCAPE '\\'"
+            params.append(_like_pattern(query))
+        if kind:
+            sql += ' AND kind = ?'
+            params.append(kind)
+        sql += ' ORDER BY seq DESC LIMIT ?'
+        params.append(limit)
+        try:
+            rows = self._reader_db.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"搜索控制台历史失败: {e}")
+            return []
+        return [ConsoleEntry(seq, at, kind, text) for seq, at, kind, text in rows]
+
+    def recall(self, server):
+        """命令历史，最新的在前"""
+        return list(reversed(self.commands.get(server, ())))
+
+    def complete(self, server, prefix, limit=10):
+        """补全候选：先是以 ``prefix`` 开头的历史命令（最新的在前），再是命令名"""
+        prefix = prefix.lstrip('/')
+        if not prefix:
+            return self.recall(server)[:limit]
+        result = [c for c in self.recall(server) if c.startswith(prefix) and c != prefix]
+        if ' ' not in prefix:
+            start = bisect.bisect_left(COMMAND_NAMES, prefix)
+            for name in COMMAND_NAMES[start:]:
+                if not name.startswith(prefix):
+                    break
+                if name not in result:
+                    result.append(name)
+        return result[:limit]
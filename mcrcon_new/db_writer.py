@@ -0,0 +1,64 @@
+"""SQLite 的后台批量写入
+
+写入方把语句放入内存中的待写列表后立即返回，由后台协程把积压的语句合并为一个事务，
+在线程中提交，事件循环不等待磁盘。
+"""
+import asyncio
+import logging
+import sqlite3
+
+
+class BatchWriter:
+    """把写入语句推迟到线程中成批提交
+
+    ``db`` 须以 ``check_same_thread=False`` 打开，且只经由本对象写入；``name`` 用于错误日志。
+    没有运行中的事件循环时（例如启动前），语句直接在当前线程写入。
+    """
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self._pending = []
+        self._task = None
+
+    def execute(self, sql, params=()):
+        self.executemany(sql, [params])
+
+    def executemany(self, sql, rows):
+        self._pending.append((sql, list(rows)))
+        if self._task is not None and not self._task.done():
+            # 写入线程忙，下一次提交时一起写入
+            return
+        try:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        except RuntimeError:
+            self._flush()
+
+    def _write(self, batch):
+        with self.db:
+            for sql, rows in batch:
+                self.db.executemany(sql, rows)
+
+    def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            self._write(batch)
+        except sqlite3.Error as e:
+            logging.error(f"无法写入{self.name}，丢弃 {len(batch)} 条语句: {e}")
+
+    async def _run(self):
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except sqlite3.Error as e:
+                logging.error(f"无法写入{self.name}，丢弃 {len(batch)} 条语句: {e}")
+
+    async def close(self):
+        """等待积压的写入全部提交"""
+        if self._task is not None:
+            await self._task
+            self._task = None
+        self._flush()
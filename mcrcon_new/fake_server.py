@@ -0,0 +1,326 @@
+"""本地 RCON 测试服务器
+
+用 asyncio 实现的 Source RCON 协议服务端，行为参照原版 Minecraft：
+按 4096 字节把长响应拆成多个包，对未知类型的包回复 "Unknown request"（客户端的哨兵包
+依赖这一点），同一连接上的命令按顺序处理。'list'、'whitelist'、'ban' 等命令维护一份
+内存中的玩家状态并返回与原版一致的文本，其他命令可以通过 ``responses`` 预设。
+
+可以注入网络延迟、服务器主线程处理时间、TCP 分段写出以及各类故障，
+用于在没有真实服务器时调试面板或运行性能基准（见 mcrcon_new.bench）。
+
+    python -m mcrcon_new.fake_server --port 25575 --password secret --latency 0.02
+"""
+import argparse
+import asyncio
+import logging
+import random
+import re
+
+from mcrcon_new.rcon_protocol import (
+    LENGTH, SERVERDATA_AUTH, SERVERDATA_AUTH_RESPONSE, SERVERDATA_EXECCOMMAND, SERVERDATA_RESPONSE_VALUE,
+    RCONError, decode_packet, encode_packet, read_length,
+)
+
+# 原版服务器单个响应包的最大负载字节数
+MAX_PAYLOAD = 4096
+
+# 注入的错误响应
+ERROR_RESPONSE = 'Unknown or incomplete command, see below for error'
+
+BAN_PATTERN = re.compile(r'^ban(?:-ip)? (\S+)(?: (.*))?$')
+KILL_ITEMS_PATTERN = re.compile(r'^kill @e\[type=(?:minecraft:)?item\b')
+EXECUTE_COUNT_PATTERN = re.compile(r'^execute if entity @e\[type=(?:minecraft:)?(\w+)')
+# 'execute in <维度> ...'：去掉前缀后按维度执行其余部分
+EXECUTE_IN_PATTERN = re.compile(r'^execute in (?:minecraft:)?(\w+) (run )?(.*)$')
+
+
+def _split_payload(data, size):
+    """按字节拆分响应，不在多字节 UTF-8 字符中间断开"""
+    chunks = []
+    while len(data) > size:
+        cut = size
+        while cut > 0 and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        chunks.append(data[:cut])
+        data = data[cut:]
+    chunks.append(data)
+    return chunks
+
+
+class FakeRCONServer:
+    """可脚本化的 RCON 服务端
+
+    ``latency`` 为单向网络延迟秒数（同一连接上的多个请求可以同时在途，流水线能从中获益）；
+    ``service_time`` 为每条命令占用服务器主线程的秒数，所有连接共用一个主线程；
+    ``segment_size`` 大于 0 时把每次写出拆成该字节数的 TCP 分段。
+    ``drop_rate``、``stall_rate``、``error_rate`` 分别是断开连接、不回复、回复错误文本的概率。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, password='password', latency=0.0, jitter=0.0,
+                 service_time=0.0, max_payload=MAX_PAYLOAD, segment_size=0, drop_rate=0.0, stall_rate=0.0,
+                 error_rate=0.0, players=(), max_players=20, responses=None, seed=None, mspt=5.0):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.service_time = service_time
+        self.max_payload = max_payload
+        self.segment_size = segment_size
+        self.drop_rate = drop_rate
+        self.stall_rate = stall_rate
+        self.error_rate = error_rate
+        self.players = list(players)
+        self.max_players = max_players
+        self.whitelist = []
+        self.bans = {}
+        # 维度 -> 掉落物数量；不指定维度的选择器作用于所有维度
+        self.dropped_items = {}
+        # 'tick query' 报告的每刻平均耗时（毫秒），可在运行中修改以模拟卡顿
+        self.mspt = mspt
+        # 命令 -> 响应文本，或接收参数列表返回文本的函数；按首个单词匹配
+        self.responses = dict(responses or {})
+        self.random = random.Random(seed)
+        self.commands = 0
+        self.connections = 0
+        self._server = None
+        self._main_thread = None
+        # 处理协程 -> 对应连接的 writer
+        self._handlers = {}
+
+    # --- 生命周期 ---
+
+    async def start(self):
+        self._main_thread = asyncio.Lock()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        """停止监听并断开所有客户端连接"""
+        if self._server is not None:
+            self._server.close()
+            # 关闭传输层让处理协程自然结束，直接取消会让 asyncio 记录一条错误
+            for writer in list(self._handlers.values()):
+                writer.close()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    # --- 命令 ---
+
+    def _list(self, args):
+        names = ', '.join(self.players)
+        return f'There are {len(self.players)} of a max of {self.max_players} players online: {names}'
+
+    def _whitelist(self, args):
+        action = args[0] if args else ''
+        if action == 'list':
+            if not self.whitelist:
+                return 'There are no whitelisted players'
+            return f'There are {len(self.whitelist)} whitelisted player(s): {", ".join(self.whitelist)}'
+        if action in ('add', 'remove') and len(args) > 1:
+            name = args[1]
+            if (name in self.whitelist) == (action == 'add'):
+                return 'Player is already whitelisted' if action == 'add' else 'Player is not whitelisted'
+            if action == 'add':
+                self.whitelist.append(name)
+                return f'Added {name} to the whitelist'
+            self.whitelist.remove(name)
+            return f'Removed {name} from the whitelist'
+        if action in ('on', 'off', 'reload'):
+            return {'on': 'Whitelist is now turned on', 'off': 'Whitelist is now turned off',
+                    'reload': 'Reloaded the whitelist'}[action]
+        return ERROR_RESPONSE
+
+    def _banlist(self, args):
+        if not self.bans:
+            return 'There are no bans'
+        lines = [f'{target} was banned by Server: {reason}' for target, reason in self.bans.items()]
+        return f'There are {len(self.bans)} ban(s):\n' + '\n'.join(lines)
+
+    def _run(self, command):
+        """执行一条命令并返回响应文本"""
+        command = command.strip().lstrip('/')
+        name, *args = command.split(' ') if command else ['']
+        scripted = self.responses.get(command, self.responses.get(name))
+        if scripted is not None:
+            return scripted(args) if callable(scripted) else scripted
+        if name == 'list':
+            return self._list(args)
+        if name == 'whitelist':
+            return self._whitelist(args)
+        if name == 'banlist':
+            return self._banlist(args)
+        if (match := BAN_PATTERN.match(command)) is not None:
+            target = match.group(1)
+            if target in self.bans:
+                return 'Nothing changed. The player is already banned'
+            self.bans[target] = match.group(2) or 'Banned by an operator.'
+            if target in self.players:
+                self.players.remove(target)
+            return f'Banned {target}: {self.bans[target]}'
+        if name in ('pardon', 'pardon-ip') and args:
+            if self.bans.pop(args[0], None) is None:
+                return 'Nothing changed. The player isn\'t banned'
+            return f'Unbanned {args[0]}'
+        if name == 'kick' and args:
+            if args[0] not in self.players:
+                return 'No player was found'
+            self.players.remove(args[0])
+            return f'Kicked {args[0]}: Kicked by an operator'
+        dimension = None
+        if (match := EXECUTE_IN_PATTERN.match(command)) is not None:
+            dimension = match.group(1)
+            command = match.group(3) if match.group(2) else f'execute {match.group(3)}'
+        if KILL_ITEMS_PATTERN.match(command):
+            if dimension is None:
+                killed = sum(self.dropped_items.values())
+                self.dropped_items.clear()
+            else:
+                killed = self.dropped_items.pop(dimension, 0)
+            return f'Killed {killed} entities' if killed else 'No entity was found'
+        if (match := EXECUTE_COUNT_PATTERN.match(command)) is not None:
+            if match.group(1) != 'item':
+                count = len(self.players)
+            elif dimension is None:
+                count = sum(self.dropped_items.values())
+            else:
+                count = self.dropped_items.get(dimension, 0)
+            return f'Test passed, count: {count}' if count else 'Test failed'
+        if command == 'tick query':
+            tps = min(20.0, 1000 / self.mspt) if self.mspt > 0 else 20.0
+            state = 'The game is running normally' if tps >= 20.0 else 'The game is running overloaded'
+            return (f'{state}\nTarget tick rate: 20.0 per second.\n'
+                    f'Average time per tick: {self.mspt:.1f}ms (Target: 50.0ms)')
+        if name in ('say', 'tell', 'msg', 'tellraw', 'title', 'give', 'gamemode', 'tp', 'time', 'weather',
+                    'save-all', 'effect', 'kill', 'op', 'deop'):
+            return ''
+        return f'Unknown or incomplete command, see below for error\n{command}<--[HERE]'
+
+    # --- 连接处理 ---
+
+    def _delay(self):
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    async def _write(self, writer, data):
+        if self.segment_size > 0:
+            for start in range(0, len(data), self.segment_size):
+                writer.write(data[start:start + self.segment_size])
+                await writer.drain()
+        else:
+            writer.write(data)
+            await writer.drain()
+
+    async def _sender(self, writer, outbox):
+        """按顺序把响应在到期时写出，模拟网络延迟"""
+        loop = asyncio.get_running_loop()
+        while True:
+            due, data = await outbox.get()
+            if data is None:
+                return
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            await self._write(writer, data)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers[task] = writer
+        loop = asyncio.get_running_loop()
+        outbox = asyncio.Queue()
+        sender = asyncio.create_task(self._sender(writer, outbox))
+        authenticated = False
+        try:
+            while True:
+                try:
+                    length = read_length(await reader.readexactly(LENGTH.size))
+                    request_id, packet_type, payload = decode_packet(await reader.readexactly(length))
+                except (asyncio.IncompleteReadError, ConnectionError, RCONError):
+                    break
+                # 请求到达服务器也需要单向延迟，到期时间按到达顺序单调递增
+                due = loop.time() + self._delay() * 2
+
+                if packet_type == SERVERDATA_AUTH:
+                    authenticated = payload == self.password
+                    response_id = request_id if authenticated else -1
+                    await outbox.put((due, encode_packet(response_id, SERVERDATA_AUTH_RESPONSE, '')))
+                    continue
+                if not authenticated:
+                    break
+                if packet_type != SERVERDATA_EXECCOMMAND:
+                    # 原版对无法识别的包类型回复这段文本，客户端的哨兵包依赖这一点
+                    await outbox.put((due, encode_packet(
+                        request_id, SERVERDATA_RESPONSE_VALUE, f'Unknown request {packet_type:x}')))
+                    continue
+
+                self.commands += 1
+                roll = self.random.random()
+                if roll < self.drop_rate:
+                    break
+                if roll < self.drop_rate + self.stall_rate:
+                    continue
+                if self.service_time:
+                    async with self._main_thread:
+                        await asyncio.sleep(self.service_time)
+                    due = max(due, loop.time() + self._delay())
+                if roll < self.drop_rate + self.stall_rate + self.error_rate:
+                    text = ERROR_RESPONSE
+                else:
+                    text = self._run(payload)
+                data = b''.join(encode_packet(request_id, SERVERDATA_RESPONSE_VALUE, chunk.decode('utf-8'))
+                                for chunk in _split_payload(text.encode('utf-8'), self.max_payload))
+                await outbox.put((due, data))
+        finally:
+            self._handlers.pop(task, None)
+            await outbox.put((0, None))
+            try:
+                await asyncio.wait_for(sender, timeout=self._delay() * 2 + 1)
+            except (asyncio.TimeoutError, asyncio.CancelledError, ConnectionError):
+                sender.cancel()
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 RCON 测试服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=25575)
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--latency', type=float, default=0.0, help='单向网络延迟秒数')
+    parser.add_argument('--jitter', type=float, default=0.0, help='附加的随机延迟上限秒数')
+    parser.add_argument('--service-time', type=float, default=0.0, help='每条命令占用服务器主线程的秒数')
+    parser.add_argument('--max-payload', type=int, default=MAX_PAYLOAD, help='单个响应包的最大负载字节数')
+    parser.add_argument('--segment-size', type=int, default=0, help='把写出拆成该字节数的 TCP 分段')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='收到命令后断开连接的概率')
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='收到命令后不回复的概率')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='回复错误文本的概率')
+    parser.add_argument('--mspt', type=float, default=5.0, help="'tick query' 报告的每刻平均耗时毫秒数")
+    parser.add_argument('--players', default='Steve,Alex', help='在线玩家，逗号分隔')
+    args = parser.parse_args()
+
+    server = FakeRCONServer(
+        args.host, args.port, args.password, latency=args.latency, jitter=args.jitter,
+        service_time=args.service_time, max_payload=args.max_payload, segment_size=args.segment_size,
+        drop_rate=args.drop_rate, stall_rate=args.stall_rate, error_rate=args.error_rate,
+        players=[p for p in args.players.split(",") if p], mspt=args.mspt)
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f"测试服务器监听 {args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
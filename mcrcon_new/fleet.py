@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+
+import toml
+
+from mcrcon_new.async_rcon import AsyncRCONManager
+from mcrcon_new.command_queue import INTERACTIVE
+from mcrcon_new.rcon_manager import RCONManager, make_result
+from mcrcon_new.status_cache import ServerStatusCache
+
+
+@dataclass
+class FleetServer:
+    """集群中的一台服务器，拥有独立的连接池、命令队列和状态缓存"""
+    name: str
+    tags: list
+    manager: RCONManager
+    rcon: AsyncRCONManager
+    status_cache: ServerStatusCache
+
+
+@dataclass
+class FleetReport:
+    """一次扇出执行的结果，按服务器名保存 CommandResult"""
+    results: dict = field(default_factory=dict)
+
+    @property
+    def succeeded(self):
+        return {name: r for name, r in self.results.items() if r.ok}
+
+    @property
+    def failed(self):
+        return {name: r for name, r in self.results.items() if not r.ok}
+
+    def summary(self):
+        return f"共 {len(self.results)} 台，成功 {len(self.succeeded)} 台，失败 {len(self.failed)} 台"
+
+
+class FleetRegistry:
+    """多服务器注册表
+
+    主服务器（[server]）沿用面板已有的实例，其余服务器来自 config.toml 中的
+    [[servers]] 表。向多台服务器下发命令时并发执行，总耗时约等于最慢一台的一次往返。
+    """
+
+    def __init__(self, primary, primary_rcon, primary_cache, config_path='config/config.toml'):
+        self.config_path = config_path
+        self.servers = {}
+        self._add(FleetServer(primary.name, primary.tags, primary, primary_rcon, primary_cache))
+        self.load()
+
+    def _add(self, server):
+        if server.name in self.servers:
+            logging.error(f"集群中存在重名服务器，已忽略: {server.name}")
+            return
+        self.servers[server.name] = server
+
+    def load(self):
+        """读取 [[servers]] 并为每台服务器创建连接"""
+        try:
+            entries = toml.load(self.config_path).get('servers', [])
+        except (FileNotFoundError, toml.TomlDecodeError) as e:
+            logging.error(f"读取集群配置失败: {e}")
+            return
+        ban_dir = os.path.dirname(next(iter(self.servers.values())).manager.ban_file_path)
+        for entry in entries:
+            name = entry.get('name')
+            if not name:
+                logging.error(f"[[servers]] 条目缺少 name，已忽略: {entry}")
+                continue
+            if name in self.servers:
+                logging.error(f"集群中存在重名服务器，已忽略: {name}")
+                continue
+            manager = RCONManager(self.config_path,
+                                  ban_file_path=os.path.join(ban_dir, f'banned_players.{name}.json'),
+                                  server_name=name)
+            rcon = AsyncRCONManager(manager)
+            cache = ServerStatusCache(rcon.get_server_status,
+                                      ttl=float(manager.cache_settings.get('status_ttl', 5)))
+            self._add(FleetServer(name, manager.tags, manager, rcon, cache))
+
+    def tags(self):
+        """所有服务器标签，按字母排序"""
+        return sorted({tag for server in self.servers.values() for tag in server.tags})
+
+    def select(self, names=None, tag=None):
+        """按名称或标签筛选服务器，两者都为空时返回全部"""
+        servers = list(self.servers.values())
+        if names:
+            wanted = set(names)
+            servers = [s for s in servers if s.name in wanted]
+        if tag:
+            servers = [s for s in servers if tag in s.tags]
+        return servers
+
+    async def fan_out(self, command, names=None, tag=None, timeout=None, priority=INTERACTIVE):
+        """向选中的服务器并发发送同一条命令，返回 FleetReport"""
+        servers = self.select(names, tag)
+        responses = await asyncio.gather(
+            *(s.rcon.command(command, timeout, priority=priority) for s in servers))
+        return FleetReport({
+            s.name: make_result(command, response, flavor=s.manager.parser.flavor)
+            for s, response in zip(servers, responses)
+        })
+
+    async def statuses(self, max_age=None):
+        """并发读取所有服务器的状态快照，返回 {服务器名: 状态}"""
+        servers = list(self.servers.values())
+        snapshots = await asyncio.gather(*(s.status_cache.get(max_age) for s in servers))
+        return dict(zip((s.name for s in servers), snapshots))
+
+    async def close(self):
+        """关闭除主服务器以外的连接，主服务器由其所有者负责关闭"""
+        for server in list(self.servers.values())[1:]:
+            await server.rcon.close()
+            server.manager.close_ban_store()
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from mcrcon_new import metrics
+from mcrcon_new.command_queue import AUTOMATION, POLLING
+from mcrcon_new.parsers import (PAPER, ESSENTIALS, TickStats, is_panel_error, parse_tick_query,
+                                parse_paper_tps, parse_forge_tps)
+
+# 探测方式 -> (命令, 解析函数)
+PROBES = {
+    'tick': (('tick query',), lambda responses: parse_tick_query(responses[0])),
+    'paper': (('tps', 'mspt'), lambda responses: parse_paper_tps(*responses)),
+    'forge': (('forge tps',), lambda responses: parse_forge_tps(responses[0])),
+    'neoforge': (('neoforge tps',), lambda responses: parse_forge_tps(responses[0])),
+}
+# 所有探测方式都不被服务器支持时，隔多少秒再重新尝试
+REDETECT_INTERVAL = 3600
+
+
+def describe(stats):
+    """把 TickStats 格式化为 "TPS 19.8, MSPT 12.3" 形式的文本"""
+    if stats is None:
+        return '无读数'
+    if stats.mspt is None:
+        return f'TPS {stats.tps:.1f}'
+    return f'TPS {stats.tps:.1f}, MSPT {stats.mspt:.1f}'
+
+
+@dataclass(frozen=True)
+class HealthChanged:
+    """服务器进入或退出过载状态"""
+    server: str
+    overloaded: bool
+    stats: Optional[TickStats]
+    at: float = field(default_factory=time.time)
+
+
+@dataclass
+class ServerHealth:
+    """单台服务器最近一次探测的结果与过载状态"""
+    probe: Optional[str] = None
+    stats: Optional[TickStats] = None
+    updated_at: float = 0.0
+    overloaded: bool = False
+    since: float = 0.0
+    unsupported_until: float = 0.0
+
+
+class HealthMonitor:
+    """定期探测集群中每台服务器的 TPS/MSPT，过载时让自动化让路
+
+    探测命令按服务端类型选择（原版 'tick query'、Paper 'tps' 与 'mspt'、Forge 'forge tps'），
+    第一次成功后记住该方式。MSPT 超过 ``max_mspt`` 或 TPS 低于 ``min_tps`` 时判定过载：
+    暂缓该服务器命令队列中 ``hold_lanes`` 通道的命令，计划任务按 ``backoff()`` 推迟；
+    MSPT 回落到 ``recover_mspt`` 以下且 TPS 恢复后解除。过载期间连续 3 个周期探测失败也会解除，
+    避免因读不到数据而无限期暂缓。被暂缓的命令最多等待 ``hold_timeout`` 秒，之后以错误返回给调用方。
+    """
+
+    def __init__(self, fleet, bus, interval=30.0, max_mspt=45.0, recover_mspt=40.0, min_tps=18.0,
+                 hold_lanes=(AUTOMATION,), hold_timeout=60.0, defer_base=60.0, defer_max=900.0):
+        self.fleet = fleet
+        self.bus = bus
+        self.interval = interval
+        self.max_mspt = max_mspt
+        self.recover_mspt = recover_mspt
+        self.min_tps = min_tps
+        self.hold_lanes = tuple(hold_lanes)
+        self.hold_timeout = hold_timeout
+        self.defer_base = defer_base
+        self.defer_max = defer_max
+        self.servers = {}
+
+    def state(self, server):
+        return self.servers.setdefault(server, ServerHealth())
+
+    def is_overloaded(self, server):
+        health = self.servers.get(server)
+        return health is not None and health.overloaded
+
+    def backoff(self, attempts):
+        """第 ``attempts`` 次（从 0 开始）推迟的秒数，指数增长并以 ``defer_max`` 为上限"""
+        return min(self.defer_max, self.defer_base * 2 ** attempts)
+
+    def _candidates(self, server, health):
+        if health.probe:
+            return [health.probe]
+        if server.manager.parser.flavor in (PAPER, ESSENTIALS):
+            return ['paper', 'tick']
+        return ['tick', 'forge', 'neoforge', 'paper']
+
+    async def probe(self, server):
+        """探测一台服务器并更新其过载状态，返回 TickStats；读不到时返回 None"""
+        health = self.state(server.name)
+        now = time.time()
+        if not health.probe and now < health.unsupported_until:
+            return None
+        stats = None
+        reachable = False
+        for name in self._candidates(server, health):
+            commands, parse = PROBES[name]
+            responses = await server.rcon.command_many(commands, priority=POLLING)
+            if is_panel_error(responses[0]):
+                # 连接失败，不代表服务器不支持该命令
+                break
+            reachable = True
+            stats = parse(responses)
+            if stats is not None:
+                if health.probe != name:
+                    logging.info(f"服务器 {server.name} 使用 '{commands[0]}' 探测 TPS/MSPT")
+                health.probe = name
+                break
+        if stats is None:
+            if health.probe and reachable:
+                # 记住的方式不再可用（例如更换了服务端），下次重新选择
+                health.probe = None
+            elif not health.probe and reachable:
+                logging.warning(f"服务器 {server.name} 不支持任何 TPS/MSPT 查询命令，"
+                                f"{REDETECT_INTERVAL} 秒后重试")
+                health.unsupported_until = now + REDETECT_INTERVAL
+            if health.overloaded and now - health.updated_at > 3 * self.interval:
+                logging.warning(f"服务器 {server.name} 的 TPS/MSPT 已无法读取，解除过载状态")
+                await self._set_overloaded(server, health, False)
+            return None
+
+        health.stats = stats
+        health.updated_at = now
+        metrics.TICK_TPS.set(stats.tps, server=server.name)
+        if stats.mspt is not None:
+            metrics.TICK_MSPT.set(stats.mspt, server=server.name)
+        if health.overloaded:
+            recovered = stats.tps >= self.min_tps and (stats.mspt is None or stats.mspt <= self.recover_mspt)
+            if recovered:
+                await self._set_overloaded(server, health, False)
+        elif stats.tps < self.min_tps or (stats.mspt is not None and stats.mspt > self.max_mspt):
+            await self._set_overloaded(server, health, True)
+        return stats
+
+    async def _set_overloaded(self, server, health, overloaded):
+        health.overloaded = overloaded
+        health.since = time.time()
+        metrics.SERVER_OVERLOADED.set(int(overloaded), server=server.name)
+        scheduler = server.rcon.scheduler
+        stats = health.stats
+        reading = describe(stats)
+        if overloaded:
+            logging.warning(f"服务器 {server.name} 负载过高（{reading}），暂缓自动化命令")
+            if scheduler is not None:
+                scheduler.hold(self.hold_lanes, self.hold_timeout)
+        else:
+            logging.info(f"服务器 {server.name} 负载恢复（{reading}），继续执行自动化命令")
+            if scheduler is not None:
+                scheduler.release()
+        await self.bus.publish(HealthChanged(server.name, overloaded, stats))
+
+    async def run(self):
+        """后台循环：有服务器过载时缩短探测间隔，以便尽快恢复"""
+        while True:
+            servers = list(self.fleet.servers.values())
+            results = await asyncio.gather(*(self.probe(s) for s in servers), return_exceptions=True)
+            for server, result in zip(servers, results):
+                if isinstance(result, Exception):
+                    logging.error(f"探测服务器 {server.name} 的 TPS/MSPT 失败: {result}")
+            overloaded = any(h.overloaded for h in self.servers.values())
+            await asyncio.sleep(self.interval / 3 if overloaded else self.interval)
@@ -0,0 +1,162 @@
+"""物品目录的模糊搜索索引
+
+每个物品的可搜索键包括：中文名、物品ID（含去掉命名空间与下划线拆分后的形式）、
+items.json 中的 ``aliases``，以及安装了 pypinyin 时的全拼与首字母。所有键按二元组
+（bigram）建立倒排索引，查询时只对命中的候选打分，返回前 K 个结果。
+
+索引构建后以 pickle 缓存到磁盘，源文件未变化时启动直接加载缓存。
+"""
+import heapq
+import json
+import logging
+import math
+import os
+import pickle
+import re
+from collections import Counter
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # 未安装时不提供拼音搜索
+    lazy_pinyin = None
+
+# 索引结构变化时递增，使旧缓存失效
+INDEX_VERSION = 1
+
+# 匹配等级，数值越小排名越靠前
+EXACT, PREFIX, SUBSTRING, FUZZY = range(4)
+# 模糊匹配至少要共享查询中这一比例的二元组
+FUZZY_THRESHOLD = 0.5
+
+# 物品ID及其 NBT 中出现的资源位置，例如 'minecraft:potion{Potion:"minecraft:night_vision"}'
+RESOURCE_PATTERN = re.compile(r'[a-z0-9_.-]+:([a-z0-9_/.-]+)')
+
+
+def normalize(text):
+    return ''.join(text.lower().split())
+
+
+def grams(text):
+    """返回文本的二元组集合；单字符文本返回其本身"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def index_grams(text):
+    """索引时除二元组外也收录单字，使单字查询可以命中"""
+    return grams(text) | set(text)
+
+
+def search_keys(item):
+    """生成一个物品的全部搜索键"""
+    name, item_id = item['name'], item['id']
+    keys = {normalize(name), normalize(item_id.split('{', 1)[0])}
+    for path in RESOURCE_PATTERN.findall(item_id.lower()) or [item_id.lower()]:
+        keys.update({path, path.replace('_', '')})
+    keys.update(normalize(alias) for alias in item.get('aliases', []))
+    if lazy_pinyin is not None:
+        syllables = lazy_pinyin(name)
+        keys.add(''.join(syllables).lower())
+        keys.add(''.join(lazy_pinyin(name, style=Style.FIRST_LETTER)).lower())
+    keys.discard('')
+    return sorted(keys)
+
+
+class ItemIndex:
+    """物品搜索索引
+
+    ``items`` 为 [{'name', 'id', 'aliases'?}]，``keys[i]`` 为第 i 个物品的搜索键，
+    ``postings`` 把二元组映射到包含它的物品下标。
+    """
+
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.keys = [search_keys(item) for item in self.items]
+        self.postings = {}
+        for index, keys in enumerate(self.keys):
+            for gram in set().union(*(index_grams(k) for k in keys)):
+                self.postings.setdefault(gram, set()).add(index)
+        self.by_name = {item['name']: item['id'] for item in self.items}
+
+    def __len__(self):
+        return len(self.items)
+
+    @classmethod
+    def load(cls, source_path, cache_path=None):
+        """从 items.json 构建索引，源文件未变化时直接读取磁盘缓存"""
+        cache_path = cache_path or os.path.splitext(source_path)[0] + '.index.pickle'
+        try:
+            stat = os.stat(source_path)
+        except OSError as e:
+            logging.error(f"无法读取物品数据: {e}")
+            return cls()
+        signature = (INDEX_VERSION, stat.st_mtime_ns, stat.st_size, lazy_pinyin is not None)
+
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_signature, index = pickle.load(f)
+            if cached_signature == signature and isinstance(index, cls):
+                return index
+        except FileNotFoundError:
+            pass
+        except (pickle.UnpicklingError, EOFError, AttributeError, ValueError, TypeError) as e:
+            logging.warning(f"物品索引缓存无效，将重新构建: {e}")
+
+        try:
+            with open(source_path, 'r', encoding='utf-8') as f:
+                index = cls(json.load(f).get('items', []))
+        except (json.JSONDecodeError, KeyError, AttributeError) as e:
+            logging.error(f"物品数据格式错误: {e}")
+            return cls()
+
+        tmp_path = cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((signature, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"无法写入物品索引缓存: {e}")
+        return index
+
+    def _rank(self, index, query):
+        best = FUZZY
+        length = min(len(k) for k in self.keys[index])
+        for key in self.keys[index]:
+            if key == query:
+                return EXACT, len(key)
+            if key.startswith(query):
+                best, length = min((best, length), (PREFIX, len(key)))
+            elif query in key:
+                best, length = min((best, length), (SUBSTRING, len(key)))
+        return best, length
+
+    def search(self, query, limit=20):
+        """返回与 ``query`` 最匹配的至多 ``limit`` 个物品
+
+        完整包含查询的结果按 精确 > 前缀 > 子串 排序；都没有时按共享的二元组数量
+        做模糊匹配，可以容忍个别错字。
+        """
+        query = normalize(query)
+        if not query:
+            return self.items[:limit]
+        query_grams = grams(query)
+        hits = Counter()
+        for gram in query_grams:
+            for index in self.postings.get(gram, ()):
+                hits[index] += 1
+        if not hits:
+            return []
+
+        scored = []
+        threshold = max(1, math.ceil(len(query_grams) * FUZZY_THRESHOLD))
+        for index, count in hits.items():
+            rank, length = self._rank(index, query)
+            if rank == FUZZY and count < threshold:
+                continue
+            scored.append((rank, -count, length, index))
+        return [self.items[i] for *_, i in heapq.nsmallest(limit, scored)]
+
+    def resolve(self, value):
+        """把中文名转换为物品ID，已经是ID时原样返回"""
+        return self.by_name.get(value, value)
@@ -0,0 +1,363 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from apscheduler.events import EVENT_JOB_MISSED
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from mcrcon_new.audit import acting_as
+from mcrcon_new.command_queue import AUTOMATION, INTERACTIVE
+from mcrcon_new.db_writer import BatchWriter
+from mcrcon_new.health import describe
+from mcrcon_new.parsers import parse_execute_count, parse_kill_count
+
+# 任务类型 -> 显示名称
+JOB_TYPES = {
+    'clear_items': '清理掉落物',
+    'command': '执行命令',
+}
+
+# 清理掉落物：某个维度的掉落物超过该数量才清理
+DEFAULT_ITEM_THRESHOLD = 200
+# 原版维度及显示名称，模组维度可以直接填写其ID
+DIMENSIONS = {
+    'minecraft:overworld': '主世界',
+    'minecraft:the_nether': '下界',
+    'minecraft:the_end': '末地',
+}
+
+
+@dataclass(frozen=True)
+class JobRun:
+    """一次任务执行的记录"""
+    job_id: str
+    job_type: str
+    server: str
+    started_at: float
+    duration: float
+    ok: bool
+    detail: str = ''
+
+
+@dataclass(frozen=True)
+class ItemCount:
+    """清理掉落物任务的一次计数，``dimension`` 为空表示所有维度，``killed`` 为 None 表示未清理"""
+    server: str
+    dimension: str
+    at: float
+    count: int
+    killed: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class JobFinished:
+    """计划任务执行完成（或错过执行）"""
+    run: JobRun
+    at: float = field(default_factory=time.time)
+
+
+# 任务执行时通过它找到引擎。计划任务以 "模块:函数" 的文本引用持久化，
+# 因此执行入口必须是模块级函数，不能是绑定方法
+_engine = None
+
+
+async def run_job(job_type, server, params):
+    """APScheduler 调用的执行入口"""
+    if _engine is None:
+        logging.error(f"任务引擎未初始化，跳过任务 {job_type}@{server}")
+        return
+    await _engine.run_scheduled(job_type, server, params)
+
+
+def job_id(job_type, server):
+    """同一服务器上同类任务只保留一个"""
+    return f'{job_type}@{server}'
+
+
+def retry_job_id(id_):
+    """过载推迟后的一次性重试任务"""
+    return f'{id_}#retry'
+
+
+def dimension_label(dimension):
+    return DIMENSIONS.get(dimension, dimension) if dimension else '所有维度'
+
+
+def count_items_command(dimension=''):
+    """统计掉落物数量的命令；指定维度时用 distance=0.. 把选择器限定在该维度"""
+    if not dimension:
+        return 'execute if entity @e[type=item]'
+    return f'execute in {dimension} if entity @e[type=item,distance=0..]'
+
+
+def kill_items_command(dimension=''):
+    if not dimension:
+        return 'kill @e[type=item]'
+    return f'execute in {dimension} run kill @e[type=item,distance=0..]'
+
+
+def make_trigger(kind, minutes=None, cron=None, jitter=0):
+    """创建间隔或 cron 触发器，``jitter`` 为随机延迟的最大秒数"""
+    jitter = int(jitter) or None
+    if kind == 'interval':
+        return IntervalTrigger(minutes=float(minutes), jitter=jitter)
+    if kind == 'cron':
+        fields = cron.split()
+        if len(fields) != 5:
+            raise ValueError("cron 表达式应为 5 段：分 时 日 月 星期")
+        minute, hour, day, month, day_of_week = fields
+        return CronTrigger(minute=minute, hour=hour, day=day, month=month, day_of_week=day_of_week,
+                           jitter=jitter)
+    raise ValueError(f"未知的触发器类型: {kind}")
+
+
+class JobEngine:
+    """后台计划任务引擎
+
+    计划保存在 SQLite 中，重启后继续生效；整个进程只有一个引擎，不会因为多个管理员
+    打开页面而重复执行。每个任务最多同时运行一个实例，错过的多次执行合并为一次
+    （超过 ``misfire_grace_time`` 秒则跳过并记入历史）。命令经由各服务器的异步连接池
+    和命令队列的自动化通道发送。
+
+    清理掉落物任务先统计掉落物数量，只清理超过阈值的维度，可在清理前广播警告；
+    每次计数都记入历史。
+
+    提供 ``health``（HealthMonitor）时，目标服务器过载期间到期的任务不执行，
+    而是按 ``health.backoff()`` 推迟，连续推迟的间隔指数增长，负载恢复后的第一次执行清零。
+    推迟通过内存中的一次性重试任务实现，原计划的触发时间不变。
+    """
+
+    def __init__(self, fleet, bus, db_path='data/jobs.sqlite', misfire_grace_time=60, history_size=200,
+                 health=None):
+        global _engine
+        self.fleet = fleet
+        self.bus = bus
+        self.health = health
+        # 任务ID -> 连续推迟次数
+        self._deferrals = {}
+        self.db_path = db_path
+        self.history = deque(maxlen=history_size)
+        self.item_counts = deque(maxlen=history_size)
+        self.scheduler = AsyncIOScheduler(
+            jobstores={'default': SQLAlchemyJobStore(url=f'sqlite:///{os.path.abspath(db_path)}'),
+                       'retries': MemoryJobStore()},
+            job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': misfire_grace_time},
+        )
+        self.scheduler.add_listener(self._on_missed, EVENT_JOB_MISSED)
+        self._db = None
+        self._writer = None
+        _engine = self
+
+    # --- 生命周期 ---
+
+    def start(self):
+        """在事件循环中启动调度器并读取最近的执行历史"""
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS job_history ('
+            'job_id TEXT, job_type TEXT, server TEXT, started_at REAL, duration REAL, ok INTEGER, detail TEXT)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS job_history_started ON job_history (started_at)')
+        rows = self._db.execute(
+            'SELECT job_id, job_type, server, started_at, duration, ok, detail FROM job_history '
+            'ORDER BY started_at DESC LIMIT ?', (self.history.maxlen,)).fetchall()
+        self.history.extend(JobRun(*row[:5], bool(row[5]), row[6]) for row in reversed(rows))
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS item_counts ('
+            'server TEXT, dimension TEXT, at REAL, count INTEGER, killed INTEGER)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS item_counts_at ON item_counts (at)')
+        rows = self._db.execute(
+            'SELECT server, dimension, at, count, killed FROM item_counts ORDER BY at DESC LIMIT ?',
+            (self.item_counts.maxlen,)).fetchall()
+        self.item_counts.extend(ItemCount(*row) for row in reversed(rows))
+        # 执行记录在后台成批写入
+        self._writer = BatchWriter(self._db, '任务历史')
+        self.scheduler.start()
+
+    async def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # --- 计划管理 ---
+
+    def add_job(self, job_type, server, trigger, params=None):
+        """添加或替换某服务器上的某类任务"""
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"未知的任务类型: {job_type}")
+        if server not in self.fleet.servers:
+            raise ValueError(f"未知的服务器: {server}")
+        return self.scheduler.add_job(
+            run_job, trigger, args=[job_type, server, params or {}],
+            id=job_id(job_type, server), name=JOB_TYPES[job_type], replace_existing=True)
+
+    def remove_job(self, job_id):
+        for id_ in (job_id, retry_job_id(job_id)):
+            try:
+                self.scheduler.remove_job(id_)
+            except JobLookupError:
+                pass
+
+    def pause_job(self, job_id):
+        self.scheduler.pause_job(job_id)
+        try:
+            self.scheduler.remove_job(retry_job_id(job_id))
+        except JobLookupError:
+            pass
+
+    def resume_job(self, job_id):
+        self.scheduler.resume_job(job_id)
+
+    def jobs(self):
+        """当前所有计划任务的概要"""
+        result = []
+        for job in self.scheduler.get_jobs(jobstore='default'):
+            job_type, server, params = job.args
+            result.append({
+                'id': job.id, 'type': job_type, 'name': job.name, 'server': server, 'params': params,
+                'trigger': str(job.trigger),
+                'next_run': job.next_run_time.timestamp() if job.next_run_time else None,
+            })
+        return result
+
+    async def run_now(self, job_id):
+        """立即执行一次，不影响原有计划；由管理员触发，走交互通道，服务器过载时也不被暂缓"""
+        job = self.scheduler.get_job(job_id)
+        if job is None:
+            raise ValueError(f"任务不存在: {job_id}")
+        await self.execute(*job.args, priority=INTERACTIVE)
+
+    # --- 执行 ---
+
+    async def run_scheduled(self, job_type, server_name, params):
+        """按计划到期时调用；服务器过载时推迟而不执行"""
+        id_ = job_id(job_type, server_name)
+        if self.health is not None and self.health.is_overloaded(server_name):
+            await self._defer(id_, job_type, server_name)
+            return
+        self._deferrals.pop(id_, None)
+        # 按计划执行的命令在审计日志中记在计划任务名下，手动“立即执行”的记在管理员名下
+        with acting_as('scheduler'):
+            await self.execute(job_type, server_name, params)
+
+    async def _defer(self, id_, job_type, server_name):
+        attempts = self._deferrals.get(id_, 0)
+        delay = self.health.backoff(attempts)
+        self._deferrals[id_] = attempts + 1
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        job = self.scheduler.get_job(id_, jobstore='default')
+        detail = f'服务器负载过高（{describe(self.health.state(server_name).stats)}）'
+        # 重试是单独的一次性任务，原计划的触发时间不受影响；重试晚于下一次计划执行时不再安排
+        if job is not None and job.next_run_time is not None and retry_at < job.next_run_time:
+            self.scheduler.add_job(
+                run_job, DateTrigger(retry_at), args=list(job.args), id=retry_job_id(id_),
+                name=job.name, jobstore='retries', replace_existing=True)
+            detail += f'，{delay:.0f} 秒后重试'
+        else:
+            detail += '，等待下一次计划执行'
+        await self._record(JobRun(id_, job_type, server_name, time.time(), 0.0, False, detail))
+
+    async def execute(self, job_type, server_name, params, priority=AUTOMATION):
+        started_at = time.time()
+        started = time.perf_counter()
+        server = self.fleet.servers.get(server_name)
+        try:
+            if server is None:
+                raise ValueError(f"未知的服务器: {server_name}")
+            ok, detail = await getattr(self, f'_run_{job_type}')(server, params, priority)
+        except Exception as e:
+            logging.error(f"计划任务 {job_type}@{server_name} 执行失败: {e}")
+            ok, detail = False, str(e)
+        await self._record(JobRun(job_id(job_type, server_name), job_type, server_name, started_at,
+                                  time.perf_counter() - started, ok, detail))
+
+    async def _run_clear_items(self, server, params, priority):
+        threshold = int(params.get('threshold', DEFAULT_ITEM_THRESHOLD))
+        dimensions = list(params.get('dimensions') or [''])
+        warning = int(params.get('warning_seconds', 0))
+        # 只统计数量不移除实体，开销远小于直接对全图执行 kill
+        responses = await server.rcon.command_many([count_items_command(d) for d in dimensions],
+                                                   priority=priority)
+        counts = {}
+        for dimension, response in zip(dimensions, responses):
+            count = parse_execute_count(response)
+            if count is None:
+                return False, f'无法读取{dimension_label(dimension)}的掉落物数量: {response}'
+            counts[dimension] = count
+        summary = '，'.join(f'{dimension_label(d)} {c}' for d, c in counts.items())
+        over = [d for d, c in counts.items() if c > threshold]
+        if not over:
+            self._record_counts(server.name, counts)
+            return True, f'掉落物 {summary}，未超过阈值 {threshold}，不清理'
+
+        if warning > 0:
+            places = '、'.join(dimension_label(d) for d in over)
+            await server.rcon.command(f'say {warning} 秒后将清理{places}的掉落物，请及时拾取重要物品',
+                                      priority=priority)
+            await asyncio.sleep(warning)
+        responses = await server.rcon.command_many([kill_items_command(d) for d in over], priority=priority)
+        killed = {d: parse_kill_count(r) for d, r in zip(over, responses)}
+        self._record_counts(server.name, counts, killed)
+        detail = f'掉落物 {summary}，已清理 ' + '，'.join(
+            f'{dimension_label(d)} {k if k is not None else "失败"}' for d, k in killed.items())
+        failed = [r for d, r in zip(over, responses) if killed[d] is None]
+        if failed:
+            return False, f'{detail}: {failed[0]}'
+        return True, detail
+
+    async def _run_command(self, server, params, priority):
+        report = await server.rcon.batch(params.get('commands', []), priority=priority)
+        detail = '; '.join(r.error or r.response for r in report.failed) or report.summary()
+        return not report.failed, detail
+
+    async def _record(self, run):
+        self.history.append(run)
+        if self._writer is not None:
+            self._writer.execute('INSERT INTO job_history VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                 (run.job_id, run.job_type, run.server, run.started_at,
+                                  run.duration, int(run.ok), run.detail))
+        await self.bus.publish(JobFinished(run))
+
+    def _record_counts(self, server, counts, killed=None):
+        at = time.time()
+        records = [ItemCount(server, dimension, at, count, (killed or {}).get(dimension))
+                   for dimension, count in counts.items()]
+        self.item_counts.extend(records)
+        if self._writer is not None:
+            self._writer.executemany('INSERT INTO item_counts VALUES (?, ?, ?, ?, ?)',
+                                     [(r.server, r.dimension, r.at, r.count, r.killed) for r in records])
+
+    def _on_missed(self, event):
+        job = self.scheduler.get_job(event.job_id)
+        if job is None:
+            return
+        job_type, server, _ = job.args
+        run = JobRun(event.job_id, job_type, server, event.scheduled_run_time.timestamp(), 0.0, False,
+                     '错过执行时间，已跳过')
+        # 监听器在事件循环线程中同步调用，记录在后台完成
+        asyncio.ensure_future(self._record(run))
+
+    def recent_runs(self, limit=50):
+        """最近的执行记录，最新的在前"""
+        return [asdict(run) for run in list(self.history)[::-1][:limit]]
+
+    def recent_item_counts(self, server=None, limit=100):
+        """最近的掉落物计数，最新的在前"""
+        records = [r for r in reversed(self.item_counts) if server is None or r.server == server]
+        return [asdict(r) for r in records[:limit]]
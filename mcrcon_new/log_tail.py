@@ -0,0 +1,176 @@
+"""跟踪服务器的 logs/latest.log，实时产生玩家事件
+
+与轮询 'list' 相比，日志能捕获两次轮询之间的短暂进出，延迟在一秒以内，
+且不占用任何 RCON 请求。文件变化优先通过 watchfiles（inotify）得知，
+不可用时退回按偏移量定时读取。日志轮转（改名后新建或原地截断）时从新文件开头继续。
+"""
+import asyncio
+import logging
+import os
+import re
+
+try:
+    from watchfiles import awatch
+except ImportError:  # 未安装时按固定间隔检查文件
+    awatch = None
+
+from mcrcon_new import metrics
+from mcrcon_new.parsers import strip_formatting
+from mcrcon_new.presence import (PlayerJoined, PlayerLeft, PlayerIdentified, ChatMessage, PlayerDied,
+                                 AdvancementMade)
+
+# 单次最多读取的字节数，避免积压的大量日志长时间占用事件循环
+READ_CHUNK = 1 << 20
+
+# 原版 "[12:34:56] [Server thread/INFO]: ..."，Forge 在级别后多一段 "[logger/]"，
+# Paper "[12:34:56 INFO]: ..."。只关心 INFO 级别的服务器消息
+LINE_PATTERN = re.compile(r'^\[[^\]]+?(?:\] \[[^\]]*/| )INFO\](?: \[[^\]]*\])?: (?P<message>.*)$')
+JOIN_PATTERN = re.compile(r'^(?P<name>\w{1,16})(?: \(formerly known as \w+\))? joined the game$')
+LEAVE_PATTERN = re.compile(r'^(?P<name>\w{1,16}) left the game$')
+# 登录验证线程在玩家加入前输出，离线模式下为离线 UUID
+UUID_PATTERN = re.compile(r'^UUID of player (?P<name>\w{1,16}) is (?P<uuid>[0-9a-fA-F-]{32,36})$')
+CHAT_PATTERN = re.compile(r'^(?:\[Not Secure\] )?<(?P<name>\w{1,16})> (?P<message>.*)$')
+ADVANCEMENT_PATTERN = re.compile(
+    r'^(?P<name>\w{1,16}) has (?:made the advancement|completed the challenge|reached the goal) '
+    r'\[(?P<advancement>.+)\]$')
+# 原版死亡信息均以玩家名开头，后接以下动词之一
+DEATH_PATTERN = re.compile(
+    r"^(?P<name>\w{1,16}) (?:was|walked into|drowned|died|blew up|fell|burned to death|went up in flames|"
+    r"went off with a bang|tried to swim in lava|hit the ground too hard|experienced kinetic energy|"
+    r"froze to death|starved to death|suffocated in a wall|withered away|didn't want to live|"
+    r"left the confines of this world|discovered the floor was lava)\b")
+
+
+def parse_log_line(line):
+    """把一行日志解析为事件，不是玩家事件时返回 None"""
+    match = LINE_PATTERN.match(line)
+    if match is None:
+        return None
+    message = strip_formatting(match.group('message').rstrip())
+    if (match := CHAT_PATTERN.match(message)) is not None:
+        return ChatMessage(match.group('name'), match.group('message'))
+    if (match := JOIN_PATTERN.match(message)) is not None:
+        return PlayerJoined(match.group('name'))
+    if (match := LEAVE_PATTERN.match(message)) is not None:
+        return PlayerLeft(match.group('name'))
+    if (match := UUID_PATTERN.match(message)) is not None:
+        return PlayerIdentified(match.group('name'), match.group('uuid'))
+    if (match := ADVANCEMENT_PATTERN.match(message)) is not None:
+        return AdvancementMade(match.group('name'), match.group('advancement'))
+    if (match := DEATH_PATTERN.match(message)) is not None:
+        return PlayerDied(match.group('name'), message)
+    return None
+
+
+class LogTailer:
+    """跟踪一个日志文件并把解析出的事件发布到事件总线
+
+    加入/离开交给 ``PresenceTracker.observe``，与轮询得到的玩家集合保持一致；
+    其他事件直接发布。启动时从文件末尾开始，不重放已有的历史日志。
+    """
+
+    def __init__(self, path, presence, bus, poll_interval=0.5, use_inotify=True):
+        self.path = os.path.abspath(path)
+        self.presence = presence
+        self.bus = bus
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and awatch is not None
+        self._file = None
+        self._inode = None
+        self._offset = 0
+        self._partial = b''
+
+    def _open(self, offset):
+        self._close()
+        self._file = open(self.path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._inode = stat.st_ino
+        self._offset = offset if offset <= stat.st_size else 0
+        self._file.seek(self._offset)
+        self._partial = b''
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_lines(self):
+        """读取当前文件中新增的完整行，最后一行未写完时留到下次"""
+        data = self._file.read(READ_CHUNK)
+        if not data:
+            return []
+        self._offset += len(data)
+        *lines, self._partial = (self._partial + data).split(b'\n')
+        return [line.decode('utf-8', errors='replace').rstrip('\r') for line in lines]
+
+    def poll(self):
+        """返回新增的行（每次至多 ``READ_CHUNK`` 字节），处理轮转与截断"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self._inode is None:
+                # 启动时文件还不存在，之后创建的文件要从头读取
+                self._inode = 0
+            # 轮转过程中文件可能暂时不存在，先用旧句柄读完剩余内容
+            return self._read_lines() if self._file is not None else []
+        lines = []
+        if self._file is None:
+            # 首次打开时跳过历史内容；出错后重新打开同一文件时从上次的位置继续
+            if self._inode is None:
+                self._open(stat.st_size)
+            else:
+                self._open(self._offset if stat.st_ino == self._inode else 0)
+        elif stat.st_ino != self._inode:
+            lines = self._read_lines()
+            self._open(0)
+        elif stat.st_size < self._offset:
+            self._open(0)
+        return lines + self._read_lines()
+
+    async def _changes(self):
+        """文件可能发生变化时返回；watchfiles 超时也返回一次，用于发现轮转"""
+        if self.use_inotify and os.path.isdir(os.path.dirname(self.path)):
+            name = os.path.basename(self.path)
+            try:
+                async for _ in awatch(os.path.dirname(self.path),
+                                      watch_filter=lambda change, path: os.path.basename(path) == name,
+                                      debounce=50, step=50, rust_timeout=1000, yield_on_timeout=True,
+                                      recursive=False):
+                    yield
+                return
+            except (OSError, RuntimeError) as e:
+                logging.error(f"无法监听日志目录，改为定时检查: {e}")
+        while True:
+            yield
+            await asyncio.sleep(self.poll_interval)
+
+    async def _dispatch(self, line):
+        metrics.LOG_LINES.inc()
+        event = parse_log_line(line)
+        if event is None:
+            return
+        metrics.LOG_EVENTS.inc(event=type(event).__name__)
+        if isinstance(event, (PlayerJoined, PlayerLeft)):
+            await self.presence.observe(event.name, isinstance(event, PlayerJoined))
+        else:
+            await self.bus.publish(event)
+
+    async def run(self):
+        """后台任务：持续跟踪日志直到被取消"""
+        try:
+            # 先定位到文件末尾，之后写入的内容都不会错过
+            try:
+                self.poll()
+            except OSError as e:
+                logging.error(f"读取服务器日志失败: {e}")
+                self._close()
+            async for _ in self._changes():
+                try:
+                    while lines := self.poll():
+                        for line in lines:
+                            await self._dispatch(line)
+                except OSError as e:
+                    logging.error(f"读取服务器日志失败: {e}")
+                    self._close()
+        finally:
+            self._close()
@@ -0,0 +1,309 @@
+"""RCON 流量的运行指标
+
+提供计数器、仪表和直方图三种指标，可导出为 Prometheus 文本格式（/metrics），
+也可在面板上直接读取。命令按首个单词归类作为标签，且只保留已知命令名，其余归为 'other'，
+避免参数或任意输入导致标签无限增长。
+"""
+import bisect
+import threading
+import time
+
+from mcrcon_new.parsers import COMMAND_NAMES
+
+# 命令耗时与建连耗时的直方图分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 响应大小的直方图分桶（字节），最大值对应 4MiB 的响应上限
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# 可作为命令标签的命令名：原版命令加上面板探测负载时使用的服务端命令
+KNOWN_COMMANDS = frozenset(COMMAND_NAMES) | {'version', 'tps', 'mspt', 'forge', 'neoforge'}
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _matching(self, labels):
+        wanted = {self.labelnames.index(k): str(v) for k, v in labels.items()}
+        return [value for key, value in self._values.items() if all(key[i] == v for i, v in wanted.items())]
+
+    def samples(self):
+        """返回 [(后缀, 标签值, 额外标签, 数值)]"""
+        with self._lock:
+            return [('', key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """直接设置累计值，用于导出其他对象自己维护的计数"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self, **labels):
+        """匹配标签的所有序列之和，不传标签时为全部序列之和"""
+        with self._lock:
+            return sum(self._matching(labels))
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def total(self, **labels):
+        """匹配标签的所有序列之和"""
+        with self._lock:
+            return sum(self._matching(labels))
+
+
+class _HistogramValue:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = _HistogramValue(len(self.buckets))
+            entry.counts[index] += 1
+            entry.sum += value
+            entry.count += 1
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, entry in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry.counts):
+                    cumulative += count
+                    result.append(('_bucket', key, (('le', _format_value(bound)),), cumulative))
+                result.append(('_sum', key, (), entry.sum))
+                result.append(('_count', key, (), entry.count))
+        return result
+
+    def summary(self, **labels):
+        """汇总匹配标签的所有序列，返回 {'count', 'avg', 'p50', 'p99'}
+
+        分位数按分桶上界估算，落在最后一个桶时返回最大的有限上界。
+        """
+        counts = [0] * len(self.buckets)
+        total, count = 0.0, 0
+        with self._lock:
+            for entry in self._matching(labels):
+                counts = [a + b for a, b in zip(counts, entry.counts)]
+                total += entry.sum
+                count += entry.count
+
+        def quantile(q):
+            if not count:
+                return 0.0
+            threshold = q * count
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                if cumulative >= threshold:
+                    return bound if bound != float('inf') else self.buckets[-2]
+            return self.buckets[-2]
+
+        return {'count': count, 'avg': total / count if count else 0.0,
+                'p50': quantile(0.5), 'p99': quantile(0.99)}
+
+
+class MetricsRegistry:
+    """指标集合；``add_collector`` 注册的回调在每次导出前调用，用于刷新仪表类指标"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, callback):
+        self.collectors.append(callback)
+
+    def collect(self):
+        for callback in self.collectors:
+            callback()
+
+    def render(self):
+        """导出为 Prometheus 文本格式"""
+        self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+COMMAND_LATENCY = REGISTRY.register(Histogram(
+    'rcon_command_duration_seconds', '单条命令从发送到收到完整响应的耗时', ('command', 'mode')))
+BATCH_LATENCY = REGISTRY.register(Histogram(
+    'rcon_batch_duration_seconds', '批量命令整批的耗时', ('mode',)))
+CONNECT_LATENCY = REGISTRY.register(Histogram(
+    'rcon_connect_duration_seconds', '建立 TCP 连接的耗时', ('mode',)))
+AUTH_LATENCY = REGISTRY.register(Histogram(
+    'rcon_auth_duration_seconds', 'RCON 密码验证的耗时', ('mode',)))
+RESPONSE_SIZE = REGISTRY.register(Histogram(
+    'rcon_response_bytes', '命令响应的字节数', ('command',), buckets=SIZE_BUCKETS))
+ERRORS = REGISTRY.register(Counter(
+    'rcon_errors_total', '按类型统计的错误数；ServerRejected 表示服务器返回了失败信息', ('command', 'type')))
+POOL_CONNECTIONS = REGISTRY.register(Gauge(
+    'rcon_pool_connections', '连接池中的连接数，state 为 size/in_use/idle/open/in_flight', ('server', 'mode', 'state')))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'rcon_status_cache_requests_total', '服务器状态缓存的命中与未命中次数', ('server', 'result')))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'rcon_queue_depth', '命令队列中等待执行的任务数', ('server', 'lane')))
+QUEUE_EXECUTED = REGISTRY.register(Counter(
+    'rcon_queue_executed_total', '命令队列已执行的任务数', ('server', 'lane')))
+QUEUE_DEDUPLICATED = REGISTRY.register(Counter(
+    'rcon_queue_deduplicated_total', '命令队列中被合并的重复任务数', ('server', 'lane')))
+QUEUE_WAIT = REGISTRY.register(Counter(
+    'rcon_queue_wait_seconds_total', '任务在命令队列中等待的累计秒数', ('server', 'lane')))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    'panel_startup_seconds', '面板启动各阶段的耗时，phase 为 services/ready', ('phase',)))
+PAGE_BUILD = REGISTRY.register(Histogram(
+    'panel_page_build_seconds', '为客户端构建页面或标签页内容的耗时', ('page',)))
+TICK_TPS = REGISTRY.register(Gauge(
+    'minecraft_tps', '最近一次探测到的服务器每秒刻数', ('server',)))
+TICK_MSPT = REGISTRY.register(Gauge(
+    'minecraft_mspt_milliseconds', '最近一次探测到的服务器每刻平均耗时（毫秒）', ('server',)))
+SERVER_OVERLOADED = REGISTRY.register(Gauge(
+    'panel_server_overloaded', '服务器是否处于过载状态（自动化命令被暂缓）', ('server',)))
+AUDIT_WRITTEN = REGISTRY.register(Counter(
+    'panel_audit_records_total', '已写入审计日志的记录数'))
+AUDIT_DROPPED = REGISTRY.register(Counter(
+    'panel_audit_dropped_total', '因写入失败或尚未启动而丢弃的审计记录数'))
+AUDIT_QUEUE = REGISTRY.register(Gauge(
+    'panel_audit_queue_depth', '等待写入审计日志的记录数'))
+PLAYER_CACHE = REGISTRY.register(Counter(
+    'panel_player_cache_requests_total', '玩家档案 LRU 缓存的命中与未命中次数', ('result',)))
+LOG_LINES = REGISTRY.register(Counter(
+    'panel_log_lines_total', '从服务器日志读取的行数'))
+LOG_EVENTS = REGISTRY.register(Counter(
+    'panel_log_events_total', '从服务器日志解析出的玩家事件数', ('event',)))
+
+
+def command_label(command):
+    """取命令的首个单词作为标签，不在 KNOWN_COMMANDS 中的归为 'other'"""
+    if not command or not command.strip():
+        return ''
+    name = command.split(None, 1)[0].lstrip('/').lower()
+    return name if name in KNOWN_COMMANDS else 'other'
+
+
+def observe_result(command, response=None, error=None, rejected=False):
+    """记录一条命令的响应大小和错误类型；``rejected`` 表示服务器返回了失败信息"""
+    label = command_label(command)
+    if error is not None:
+        ERRORS.inc(command=label, type=type(error).__name__)
+        return
+    if response is not None:
+        RESPONSE_SIZE.observe(len(response.encode('utf-8')), command=label)
+    if rejected:
+        ERRORS.inc(command=label, type='ServerRejected')
+
+
+def observe_command(command, mode, duration, response=None, error=None, rejected=False):
+    """记录一条命令的耗时，以及响应大小和错误类型"""
+    COMMAND_LATENCY.observe(duration, command=command_label(command), mode=mode)
+    observe_result(command, response, error, rejected)
+
+
+class Timer:
+    """简单的计时器：``with Timer() as t: ...`` 之后读取 ``t.elapsed``"""
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        return False
+
+
+def overview():
+    """汇总面板展示所需的关键指标"""
+    REGISTRY.collect()
+    errors_by_type = {}
+    for _, (_, error_type), _, value in ERRORS.samples():
+        errors_by_type[error_type] = errors_by_type.get(error_type, 0) + value
+    hits, misses = CACHE_REQUESTS.total(result='hit'), CACHE_REQUESTS.total(result='miss')
+    return {
+        'command': COMMAND_LATENCY.summary(),
+        'connect': CONNECT_LATENCY.summary(),
+        'auth': AUTH_LATENCY.summary(),
+        'response_bytes': RESPONSE_SIZE.summary(),
+        'errors': errors_by_type,
+        'pool_in_use': POOL_CONNECTIONS.total(mode='async', state='in_use')
+                       + POOL_CONNECTIONS.total(mode='async', state='in_flight'),
+        'pool_size': POOL_CONNECTIONS.total(mode='async', state='size'),
+        'cache_hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        'queue_depth': QUEUE_DEPTH.total(),
+    }
@@ -0,0 +1,546 @@
+"""RCON 命令响应解析
+
+所有正则在导入时编译一次。不同服务端（原版、Paper、Essentials）的输出格式不同，
+ResponseParser 在第一次成功解析 'list' 时识别服务端类型并缓存，之后的轮询直接使用
+对应的解析器，只有格式对不上时才回退尝试其他类型。
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+
+# 原版命令名（按字母排序），用于命令补全和指标的命令标签
+COMMAND_NAMES = (
+    'advancement', 'attribute', 'ban', 'ban-ip', 'banlist', 'bossbar', 'clear', 'clone', 'damage', 'data',
+    'datapack', 'debug', 'defaultgamemode', 'deop', 'difficulty', 'effect', 'enchant', 'execute',
+    'experience', 'fill', 'fillbiome', 'forceload', 'function', 'gamemode', 'gamerule', 'give', 'help',
+    'item', 'kick', 'kill', 'list', 'locate', 'loot', 'me', 'msg', 'op', 'pardon', 'pardon-ip', 'particle',
+    'place', 'playsound', 'recipe', 'reload', 'ride', 'save-all', 'save-off', 'save-on', 'say', 'schedule',
+    'scoreboard', 'seed', 'setblock', 'setidletimeout', 'setworldspawn', 'spawnpoint', 'spectate',
+    'spreadplayers', 'stop', 'stopsound', 'summon', 'tag', 'team', 'teleport', 'tell', 'tellraw', 'tick',
+    'time', 'title', 'tp', 'transfer', 'trigger', 'weather', 'whitelist', 'worldborder', 'xp',
+)
+
+VANILLA = 'vanilla'
+PAPER = 'paper'
+ESSENTIALS = 'essentials'
+FLAVORS = (VANILLA, PAPER, ESSENTIALS)
+
+# '§' 格式代码（颜色、样式以及 §x 十六进制颜色的各位）
+FORMATTING_PATTERN = re.compile(r'§[0-9a-fk-orx]', re.I)
+
+# 面板自身生成的错误描述，说明命令没有到达服务器
+PANEL_ERROR_PATTERN = re.compile(r'^(?:命令执行失败|连接失败|服务器配置不完整|目标不能为空)')
+
+# 'list'：原版/Paper 为 "There are 1 of a max of 20 players online: Steve"，
+# 1.12 及更早为 "There are 1/20 players online:\nSteve"；
+# 'list uuids' 会在名字后附带 "(uuid)"
+VANILLA_LIST_PATTERN = re.compile(r'There (?:are|is) (\d+) of a max(?: of)? (\d+) players? online:?(.*)', re.S)
+LEGACY_LIST_PATTERN = re.compile(r'There (?:are|is) (\d+)/(\d+) players? online:?(.*)', re.S)
+# Essentials："There are 2 out of maximum 20 players online." 之后每行一个权限组 "default: Steve, Alex"
+ESSENTIALS_LIST_PATTERN = re.compile(
+    r'There (?:are|is) (\d+)(?:/\d+)? out of maximum (\d+) players? online\.?(.*)', re.S)
+ESSENTIALS_GROUP_PATTERN = re.compile(r'^\s*([^:\n]+?):\s*(.*)$', re.M)
+PLAYER_ENTRY_PATTERN = re.compile(
+    r'^(?:\[(?:AFK|HIDDEN)\]\s*)*(\S+?)(?:\s*\(([0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12})\))?$')
+NAME_SEPARATOR_PATTERN = re.compile(r',\s*|\s+and\s+|\n')
+
+# 'version'：Bukkit 系服务端会报告自身名称，原版没有该命令
+BUKKIT_VERSION_PATTERN = re.compile(r'running (?:Paper|Purpur|Folia|Pufferfish|Spigot|CraftBukkit)', re.I)
+
+# 'whitelist list'：新版 "There are 2 whitelisted player(s): A, B"，
+# 旧版 "There are 2 (out of 3 seen) whitelisted players:\nA, B"
+WHITELIST_PATTERN = re.compile(
+    r'There (?:are|is) (\d+) (?:\(out of \d+ seen\) )?whitelisted players?(?:\(s\))?:?(.*)', re.S)
+NO_WHITELIST_PATTERN = re.compile(r'There are no whitelisted players')
+
+# 'banlist' 每条记录形如 "Steve was banned by Server: Banned by an operator."
+BANLIST_HEADER_PATTERN = re.compile(r'There (?:are|is) \d+ bans?(?:\(s\))?:?')
+NO_BANS_PATTERN = re.compile(r'There are no bans')
+BAN_LINE_PATTERN = re.compile(r'^\s*(\S+) was banned by (.*?): (.*)$')
+# 部分版本的 RCON 输出去掉了换行，此时以 "<名字或IP> was banned by " 为锚点切分。
+# 若上一条的原因以字母或数字结尾，名字边界无法确定，这样得到的记录都标记为不精确
+BAN_ENTRY_PATTERN = re.compile(r'(\d{1,3}(?:\.\d{1,3}){3}|[A-Za-z0-9_]{1,16}) was banned by ')
+
+# 'data get entity/block/storage'
+DATA_GET_PATTERN = re.compile(
+    r'^(.*?) has the following (?:entity data|block data|contents|[\w ]+? data): (.*)$', re.S)
+
+# 'execute if entity ...'
+EXECUTE_PASSED_PATTERN = re.compile(r'Test passed(?:, count: (\d+))?')
+EXECUTE_FAILED_PATTERN = re.compile(r'Test failed')
+
+# 'kill'：多个实体为 "Killed 12 entities"，单个实体为 "Killed <名称>"
+KILLED_COUNT_PATTERN = re.compile(r'Killed (\d+) entities')
+KILLED_ONE_PATTERN = re.compile(r'Killed \S')
+NO_ENTITY_PATTERN = re.compile(r'No entity was found')
+
+# 'tick query'（1.20.3+）："Target tick rate: 20.0 per second." 与 "Average time per tick: 3.2ms (Target: 50.0ms)"
+TICK_RATE_PATTERN = re.compile(r'Target tick rate: ([\d.]+)')
+TICK_TIME_PATTERN = re.compile(r'Average time per tick: ([\d.]+) ?ms')
+# Paper 'tps'："TPS from last 1m, 5m, 15m: 19.98, 20.0, *20.0"（超过 20 时带 '*'）
+PAPER_TPS_PATTERN = re.compile(r'TPS from last 1m, 5m, 15m: \*?([\d.]+)')
+# Paper 'mspt'："Server tick times (avg/min/max) from last 5s, 10s, 1m:" 下一行为 "◴ 2.1/1.0/5.3, ..."
+PAPER_MSPT_PATTERN = re.compile(r'tick times.*?:\s*\S*?\s*([\d.]+)/[\d.]+/[\d.]+', re.S)
+# Forge 'forge tps'："Overall: Mean tick time: 1.234 ms. Mean TPS: 20.000"，另有每个维度一行；
+# NeoForge 'neoforge tps'："Overall: 20.000 TPS (1.234 ms/tick)"
+FORGE_TPS_PATTERN = re.compile(r'^(.*?): Mean tick time: ([\d.]+) ms\. Mean TPS: ([\d.]+)', re.M)
+NEOFORGE_TPS_PATTERN = re.compile(r'^(.*?): ([\d.]+) TPS \(([\d.]+) ms/tick\)', re.M)
+
+# 失败响应：只匹配出现在行首的已知错误文本，避免把正常输出中的 "unknown" 等词误判为失败
+_COMMON_FAILURES = [
+    r'Unknown or incomplete command',
+    r'Unknown \w+',
+    r'Incorrect argument for command',
+    r'Invalid \w+',
+    r'Expected \w+',
+    r'No (?:player|entity|targets?|elements?) (?:was|were)? ?(?:found|matched)',
+    r'Found no elements matching',
+    r'That player does not exist',
+    r'Nothing changed',
+    r'Player is (?:already|not) whitelisted',
+    r"(?:Failed|Could not|Couldn't|Can't|Cannot|Unable) ",
+    r'An unexpected error occurred',
+    r'.*<--\[HERE\]',
+]
+_PAPER_FAILURES = [
+    r"I'm sorry, but you do not have permission",
+    r'Unknown command\. Type "/help" for help',
+]
+_ESSENTIALS_FAILURES = [
+    r'Error: ',
+    r'Player not found',
+]
+
+
+def _compile_failures(patterns):
+    return re.compile('^(?:' + '|'.join(patterns) + ')', re.M | re.I)
+
+
+FAILURE_PATTERNS = {
+    VANILLA: _compile_failures(_COMMON_FAILURES),
+    PAPER: _compile_failures(_COMMON_FAILURES + _PAPER_FAILURES),
+    ESSENTIALS: _compile_failures(_COMMON_FAILURES + _PAPER_FAILURES + _ESSENTIALS_FAILURES),
+}
+# 服务端类型未知时使用全部规则
+ANY_FAILURE_PATTERN = FAILURE_PATTERNS[ESSENTIALS]
+# 封禁已封禁的目标、解封未封禁的目标时服务器回复 "Nothing changed"，
+# 此时目标状态与期望一致，不算失败
+IDEMPOTENT_COMMANDS = frozenset({'ban', 'ban-ip', 'pardon', 'pardon-ip'})
+NOTHING_CHANGED_PATTERN = re.compile(r'^Nothing changed', re.I)
+
+
+@dataclass
+class PlayerList:
+    """'list' 的解析结果"""
+    online: bool
+    count: int = 0
+    max_players: int = 0
+    players: list = field(default_factory=list)
+    uuids: dict = field(default_factory=dict)     # 名字 -> UUID，仅 'list uuids' 提供
+    groups: dict = field(default_factory=dict)    # 权限组 -> 名字列表，仅 Essentials 提供
+
+    def as_status(self):
+        """转换为面板各处使用的状态字典"""
+        return {"online": self.online, "player_count": self.count,
+                "max_players": self.max_players, "players": list(self.players)}
+
+
+@dataclass
+class Whitelist:
+    """'whitelist list' 的解析结果"""
+    players: list = field(default_factory=list)
+
+
+class BanRecord(NamedTuple):
+    """'banlist' 中的一条记录
+
+    ``exact`` 为假表示记录的边界是推测出来的（例如输出中没有换行），目标名可能混入了上一条的原因。
+    """
+    target: str
+    issuer: str
+    reason: str
+    exact: bool = True
+
+
+@dataclass
+class TickStats:
+    """服务器的每秒刻数与每刻平均耗时（毫秒），耗时未知时为 None"""
+    tps: float
+    mspt: Optional[float]
+
+
+@dataclass
+class DataResult:
+    """'data get' 的解析结果，``value`` 为解析后的 SNBT 值"""
+    target: str
+    value: object
+    raw: str
+
+
+def strip_formatting(text):
+    """去掉 '§' 格式代码"""
+    return FORMATTING_PATTERN.sub('', text) if '§' in text else text
+
+
+def is_panel_error(response):
+    """响应为空或是面板自身生成的错误描述"""
+    return response is None or PANEL_ERROR_PATTERN.match(response) is not None
+
+
+def is_failed_response(response, flavor=None, command=None):
+    """根据已知的错误文本判断命令是否失败，给出 ``command`` 时按命令放宽幂等操作的判断"""
+    if is_panel_error(response):
+        return True
+    text = strip_formatting(response)
+    if command and NOTHING_CHANGED_PATTERN.match(text):
+        verb = command.strip().lstrip('/').split(None, 1)[0].lower() if command.strip() else ''
+        if verb in IDEMPOTENT_COMMANDS:
+            return False
+    pattern = FAILURE_PATTERNS.get(flavor, ANY_FAILURE_PATTERN)
+    return pattern.search(text) is not None
+
+
+def split_names(text):
+    """把 "A, B and C" 或按行分隔的名字列表拆开"""
+    return [name for name in (n.strip() for n in NAME_SEPARATOR_PATTERN.split(text)) if name]
+
+
+def _parse_entries(names, result):
+    for entry in names:
+        match = PLAYER_ENTRY_PATTERN.match(entry)
+        if not match:
+            continue
+        name, uuid = match.groups()
+        result.players.append(name)
+        if uuid:
+            result.uuids[name] = uuid.lower()
+
+
+def _parse_vanilla_list(text):
+    match = VANILLA_LIST_PATTERN.search(text) or LEGACY_LIST_PATTERN.search(text)
+    if not match:
+        return None
+    result = PlayerList(True, int(match.group(1)), int(match.group(2)))
+    if result.count:
+        _parse_entries(split_names(match.group(3)), result)
+    return result
+
+
+def _parse_essentials_list(text):
+    match = ESSENTIALS_LIST_PATTERN.search(text)
+    if not match:
+        return None
+    result = PlayerList(True, int(match.group(1)), int(match.group(2)))
+    for group, names in ESSENTIALS_GROUP_PATTERN.findall(match.group(3)):
+        before = len(result.players)
+        _parse_entries(split_names(names), result)
+        result.groups[group.strip()] = result.players[before:]
+    return result
+
+
+_LIST_PARSERS = {
+    VANILLA: _parse_vanilla_list,
+    PAPER: _parse_vanilla_list,
+    ESSENTIALS: _parse_essentials_list,
+}
+
+
+class ResponseParser:
+    """按服务端类型解析响应，并缓存识别出的类型
+
+    ``flavor`` 为 None 表示尚未识别；``version_checked`` 表示是否已用 'version'
+    探测过服务端（用于区分原版与 Paper，两者的 'list' 格式相同）。
+    """
+
+    def __init__(self, flavor=None):
+        self.flavor = flavor
+        self.version_checked = flavor is not None
+        self._warned = False
+
+    def learn_version(self, response):
+        """根据 'version' 的响应区分原版与 Bukkit 系服务端"""
+        if is_panel_error(response):
+            return
+        self.version_checked = True
+        if BUKKIT_VERSION_PATTERN.search(strip_formatting(response)):
+            if self.flavor != ESSENTIALS:
+                self._set_flavor(PAPER)
+        elif self.flavor is None:
+            self._set_flavor(VANILLA)
+
+    def _set_flavor(self, flavor):
+        if flavor != self.flavor:
+            logging.info(f"识别到服务端类型: {flavor}")
+        self.flavor = flavor
+
+    def parse_list(self, response):
+        """解析 'list'，返回 PlayerList；连接失败时 online 为 False"""
+        if is_panel_error(response):
+            return PlayerList(False)
+        text = strip_formatting(response)
+
+        parser = _LIST_PARSERS.get(self.flavor)
+        result = parser(text) if parser else None
+        if result is not None:
+            return result
+
+        # 缓存的类型不匹配（或尚未识别）时才依次尝试其他格式
+        for flavor in (ESSENTIALS, VANILLA):
+            if _LIST_PARSERS[flavor] is parser:
+                continue
+            result = _LIST_PARSERS[flavor](text)
+            if result is not None:
+                if flavor == ESSENTIALS or self.flavor in (None, ESSENTIALS):
+                    if self.flavor == ESSENTIALS:
+                        # 插件被移除后无法确定底层是原版还是 Paper，下次轮询重新探测
+                        self.version_checked = False
+                    self._set_flavor(flavor)
+                return result
+
+        if not self._warned:
+            logging.error(f"无法识别 'list' 命令的响应格式: {response}")
+            self._warned = True
+        # 至少服务器是在线的
+        return PlayerList(True)
+
+    def is_failure(self, response, command=None):
+        """按当前服务端类型判断响应是否表示失败"""
+        return is_failed_response(response, self.flavor, command)
+
+
+def parse_whitelist(response):
+    """解析 'whitelist list'，无法识别时返回 None"""
+    if is_panel_error(response):
+        return None
+    text = strip_formatting(response)
+    if NO_WHITELIST_PATTERN.search(text):
+        return Whitelist()
+    match = WHITELIST_PATTERN.search(text)
+    if not match:
+        return None
+    return Whitelist(split_names(match.group(2)))
+
+
+def parse_banlist(response):
+    """解析 'banlist players' / 'banlist ips'，返回 [BanRecord]
+
+    响应无法识别（例如连接失败）时返回 None，以免调用方把失败误当作"服务器上没有封禁"。
+    """
+    if is_panel_error(response):
+        return None
+    text = strip_formatting(response)
+    if NO_BANS_PATTERN.search(text):
+        return []
+    if not BANLIST_HEADER_PATTERN.search(text) and 'was banned by' not in text:
+        return None
+
+    if '\n' in text:
+        records = []
+        for line in text.splitlines():
+            match = BAN_LINE_PATTERN.match(line)
+            if match:
+                issuer, reason = match.group(2).strip(), match.group(3).strip()
+                records.append(BanRecord(match.group(1), issuer, reason, bool(issuer and reason)))
+        return records
+
+    matches = list(BAN_ENTRY_PATTERN.finditer(text))
+    records = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        issuer, _, reason = text[match.end():end].strip().partition(': ')
+        issuer, reason = issuer.strip(), reason.strip()
+        # 只有一条记录时没有边界问题
+        records.append(BanRecord(match.group(1), issuer, reason, len(matches) == 1 and bool(issuer and reason)))
+    return records
+
+
+def parse_data_get(response):
+    """解析 'data get entity/block/storage'，无法识别时返回 None"""
+    if is_panel_error(response):
+        return None
+    match = DATA_GET_PATTERN.match(strip_formatting(response).strip())
+    if not match:
+        return None
+    raw = match.group(2).strip()
+    try:
+        value = parse_snbt(raw)
+    except ValueError:
+        value = raw
+    return DataResult(match.group(1), value, raw)
+
+
+def parse_execute_count(response):
+    """解析 'execute if ...' 的结果，返回匹配数量；无法识别时返回 None"""
+    if is_panel_error(response):
+        return None
+    text = strip_formatting(response)
+    match = EXECUTE_PASSED_PATTERN.search(text)
+    if match:
+        return int(match.group(1)) if match.group(1) else 1
+    if EXECUTE_FAILED_PATTERN.search(text):
+        return 0
+    return None
+
+
+def parse_kill_count(response):
+    """解析 'kill' 的结果，返回被清除的实体数；无法识别时返回 None"""
+    if is_panel_error(response):
+        return None
+    text = strip_formatting(response)
+    match = KILLED_COUNT_PATTERN.search(text)
+    if match:
+        return int(match.group(1))
+    if KILLED_ONE_PATTERN.search(text):
+        return 1
+    if NO_ENTITY_PATTERN.search(text):
+        return 0
+    return None
+
+
+def parse_tick_query(response):
+    """解析原版 'tick query'，无法识别时返回 None"""
+    if is_panel_error(response):
+        return None
+    text = strip_formatting(response)
+    match = TICK_TIME_PATTERN.search(text)
+    if not match:
+        return None
+    mspt = float(match.group(1))
+    rate = TICK_RATE_PATTERN.search(text)
+    rate = float(rate.group(1)) if rate else 20.0
+    # 每刻耗时低于目标间隔时服务器以目标速率运行，否则受耗时限制
+    tps = min(rate, 1000 / mspt) if mspt > 0 else rate
+    return TickStats(tps, mspt)
+
+
+def parse_paper_tps(response, mspt_response=None):
+    """解析 Paper 的 'tps'（取最近 1 分钟）与可选的 'mspt'，无法识别时返回 None
+
+    没有 'mspt' 的结果时 ``mspt`` 为 None：TPS 达到 20 时无法从中推算每刻耗时。
+    """
+    if is_panel_error(response):
+        return None
+    match = PAPER_TPS_PATTERN.search(strip_formatting(response))
+    if not match:
+        return None
+    tps = float(match.group(1))
+    if is_panel_error(mspt_response):
+        return TickStats(tps, None)
+    match = PAPER_MSPT_PATTERN.search(strip_formatting(mspt_response))
+    return TickStats(tps, float(match.group(1)) if match else None)
+
+
+def parse_forge_tps(response):
+    """解析 Forge/NeoForge 的 'forge tps'，取 Overall 一行，没有时取最慢的维度
+
+    无法识别时返回 None。
+    """
+    if is_panel_error(response):
+        return None
+    text = strip_formatting(response)
+    rows = [(label, float(mspt), float(tps)) for label, mspt, tps in FORGE_TPS_PATTERN.findall(text)]
+    rows += [(label, float(mspt), float(tps)) for label, tps, mspt in NEOFORGE_TPS_PATTERN.findall(text)]
+    if not rows:
+        return None
+    overall = [row for row in rows if row[0].strip().lower() == 'overall']
+    _, mspt, tps = overall[0] if overall else max(rows, key=lambda row: row[1])
+    return TickStats(tps, mspt)
+
+
+# --- SNBT ---
+
+SNBT_NUMBER_PATTERN = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?([bBsSlLfFdD]?)$')
+SNBT_TOKEN_PATTERN = re.compile(r'[^,:\]\}\s]+')
+
+
+def parse_snbt(text):
+    """把 SNBT 文本解析为 Python 值（复合标签为 dict，列表与数组为 list）"""
+    value, pos = _parse_snbt_value(text, 0)
+    if text[pos:].strip():
+        raise ValueError(f"SNBT 末尾有多余内容: {text[pos:]!r}")
+    return value
+
+
+def _skip_spaces(text, pos):
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _parse_snbt_string(text, pos):
+    quote = text[pos]
+    pos += 1
+    chars = []
+    while pos < len(text):
+        ch = text[pos]
+        if ch == '\\' and pos + 1 < len(text):
+            chars.append(text[pos + 1])
+            pos += 2
+        elif ch == quote:
+            return ''.join(chars), pos + 1
+        else:
+            chars.append(ch)
+            pos += 1
+    raise ValueError("SNBT 字符串缺少结尾引号")
+
+
+def _parse_snbt_scalar(token):
+    match = SNBT_NUMBER_PATTERN.match(token)
+    if match:
+        number = token[:-1] if match.group(1) else token
+        if match.group(1).lower() in ('f', 'd') or '.' in number or 'e' in number.lower():
+            return float(number)
+        return int(number)
+    if token in ('true', 'false'):
+        return token == 'true'
+    return token
+
+
+def _parse_snbt_value(text, pos):
+    pos = _skip_spaces(text, pos)
+    if pos >= len(text):
+        raise ValueError("SNBT 意外结束")
+    ch = text[pos]
+    if ch in '"\'':
+        return _parse_snbt_string(text, pos)
+    if ch == '{':
+        result = {}
+        pos = _skip_spaces(text, pos + 1)
+        while pos < len(text) and text[pos] != '}':
+            if text[pos] in '"\'':
+                key, pos = _parse_snbt_string(text, pos)
+            else:
+                match = SNBT_TOKEN_PATTERN.match(text, pos)
+                if not match:
+                    raise ValueError(f"SNBT 键无效，位置 {pos}")
+                key, pos = match.group(), match.end()
+            pos = _skip_spaces(text, pos)
+            if pos >= len(text) or text[pos] != ':':
+                raise ValueError(f"SNBT 缺少冒号，位置 {pos}")
+            result[key], pos = _parse_snbt_value(text, pos + 1)
+            pos = _skip_spaces(text, pos)
+            if pos < len(text) and text[pos] == ',':
+                pos = _skip_spaces(text, pos + 1)
+        if pos >= len(text):
+            raise ValueError("SNBT 复合标签缺少 '}'")
+        return result, pos + 1
+    if ch == '[':
+        result = []
+        pos = _skip_spaces(text, pos + 1)
+        # 类型数组 [I; 1, 2]、[B; ...]、[L; ...]
+        if text[pos:pos + 2] in ('I;', 'B;', 'L;'):
+            pos = _skip_spaces(text, pos + 2)
+        while pos < len(text) and text[pos] != ']':
+            value, pos = _parse_snbt_value(text, pos)
+            result.append(value)
+            pos = _skip_spaces(text, pos)
+            if pos < len(text) and text[pos] == ',':
+                pos = _skip_spaces(text, pos + 1)
+        if pos >= len(text):
+            raise ValueError("SNBT 列表缺少 ']'")
+        return result, pos + 1
+    match = SNBT_TOKEN_PATTERN.match(text, pos)
+    if not match:
+        raise ValueError(f"SNBT 值无效，位置 {pos}")
+    return _parse_snbt_scalar(match.group()), match.end()
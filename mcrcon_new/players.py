@@ -0,0 +1,408 @@
+"""以 UUID 为键的玩家档案
+
+档案来自服务器目录中的 usercache.json 与 whitelist.json，以及日志中的
+"UUID of player X is ..." 与加入/离开事件。每次加入/离开只增量更新该玩家的累计在线时长、
+会话数与最后在线时间，并记录一条会话；改名时保留曾用名。
+
+所有玩家的名字索引常驻内存（只有名字与 UUID），用于即时解析与补全；完整档案放在 LRU 缓存中，
+未命中时才查询 SQLite。页面选择玩家、封禁与白名单操作都不再需要额外的 RCON 请求。
+服务器文件在启动时导入；之后遇到未知玩家时在线程中读取有变化的文件，不阻塞事件循环。
+"""
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid as uuid_module
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from mcrcon_new import metrics
+from mcrcon_new.presence import PlayerJoined, PlayerLeft, PlayersChanged, PlayerIdentified
+
+# 服务器文件 -> 是否按其中的名字更新改名的玩家；usercache.json 在每次登录时更新，
+# whitelist.json 中的名字是加入白名单时的名字，可能已经过时
+SERVER_FILES = {'usercache.json': True, 'whitelist.json': False}
+
+
+def offline_uuid(name):
+    """离线模式下服务器为玩家生成的 UUID（"OfflinePlayer:<名字>" 的 MD5，版本 3）"""
+    digest = bytearray(hashlib.md5(f'OfflinePlayer:{name}'.encode('utf-8')).digest())
+    digest[6] = digest[6] & 0x0f | 0x30
+    digest[8] = digest[8] & 0x3f | 0x80
+    return str(uuid_module.UUID(bytes=bytes(digest)))
+
+
+def normalize_uuid(value):
+    """统一为带连字符的小写形式，无法解析时返回 None"""
+    try:
+        return str(uuid_module.UUID(str(value)))
+    except (ValueError, TypeError):
+        return None
+
+
+def format_duration(seconds):
+    """把秒数格式化为 "3天4小时" / "2小时5分" / "12分" 形式的文本"""
+    minutes = int(seconds) // 60
+    days, minutes = divmod(minutes, 1440)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f'{days}天{hours}小时'
+    if hours:
+        return f'{hours}小时{minutes}分'
+    return f'{minutes}分'
+
+
+@dataclass
+class PlayerProfile:
+    """一名玩家的档案；``names`` 为曾用名（不含当前名字），时间为 0 表示未知"""
+    uuid: str
+    name: str
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+    playtime: float = 0.0
+    sessions: int = 0
+    names: tuple = field(default_factory=tuple)
+
+
+class PlayerRegistry:
+    """玩家档案的索引、LRU 缓存与会话统计
+
+    订阅事件总线上的加入/离开、在线玩家集合与 UUID 事件。名字尚未对应到 UUID 的玩家
+    （例如没有跟踪日志且 usercache.json 还未写入）先使用离线 UUID 建档，得知真实 UUID 后合并。
+    ``server_dir`` 为服务器根目录，留空则只依靠日志。
+    """
+
+    def __init__(self, bus, db_path='data/players.sqlite', server_dir=None, cache_size=1000):
+        self.db_path = db_path
+        self.server_dir = server_dir
+        self.cache_size = cache_size
+        self._db = None
+        # 小写名字 -> (UUID, 当前名字)，包含所有已知玩家
+        self._index = {}
+        # UUID -> 当前名字，在线玩家列表直接从这里取名字
+        self._names = {}
+        # 排序后的小写名字，用于前缀补全；索引变化后置为 None，下次补全时重建
+        self._sorted = None
+        self._cache = OrderedDict()
+        # UUID -> 本次会话开始的时间
+        self.online = {}
+        self._file_mtimes = {}
+        bus.subscribe(PlayerJoined, self._on_joined)
+        bus.subscribe(PlayerLeft, self._on_left)
+        bus.subscribe(PlayersChanged, self._on_players_changed)
+        bus.subscribe(PlayerIdentified, self._on_identified)
+
+    def __len__(self):
+        return len(self._index)
+
+    # --- 生命周期 ---
+
+    def open(self):
+        """打开数据库，载入名字索引并导入服务器目录中的玩家文件"""
+        self._db = sqlite3.connect(self.db_path)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS players ('
+            'uuid TEXT PRIMARY KEY, name TEXT, name_lower TEXT, first_seen REAL, last_seen REAL, '
+            'playtime REAL, sessions INTEGER)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS players_name ON players (name_lower)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS names ('
+            'uuid TEXT, name TEXT, seen_at REAL, PRIMARY KEY (uuid, name)) WITHOUT ROWID')
+        self._db.execute('CREATE TABLE IF NOT EXISTS sessions (uuid TEXT, joined_at REAL, left_at REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS sessions_uuid ON sessions (uuid, joined_at)')
+        self._db.commit()
+        for player_uuid, name in self._db.execute('SELECT uuid, name FROM players'):
+            self._index[name.lower()] = (player_uuid, name)
+            self._names[player_uuid] = name
+        self._sorted = None
+        self.import_server_files()
+
+    def close(self):
+        """结束仍在进行的会话并关闭数据库"""
+        if self._db is None:
+            return
+        now = time.time()
+        for player_uuid in list(self.online):
+            self._end_session(player_uuid, now)
+        self._db.close()
+        self._db = None
+
+    # --- 服务器文件 ---
+
+    def _read_server_files(self, force):
+        """读取 usercache.json 与 whitelist.json，返回 [(文件名, 修改时间, 条目, 是否改名)]
+
+        只做文件读取，可以在线程中调用；``force`` 为假时跳过没有变化的文件。
+        """
+        loaded = []
+        for filename, rename in SERVER_FILES.items():
+            path = os.path.join(self.server_dir, filename)
+            try:
+                mtime = os.stat(path).st_mtime
+                if not force and self._file_mtimes.get(filename) == mtime:
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, json.JSONDecodeError) as e:
+                logging.error(f"读取 {path} 失败: {e}")
+                continue
+            loaded.append((filename, mtime, entries, rename))
+        return loaded
+
+    def _apply_server_files(self, loaded):
+        if self._db is None:
+            return 0
+        imported = 0
+        for filename, mtime, entries, rename in loaded:
+            self._file_mtimes[filename] = mtime
+            with self._db:
+                for entry in entries if isinstance(entries, list) else []:
+                    if not isinstance(entry, dict):
+                        continue
+                    player_uuid = normalize_uuid(entry.get('uuid'))
+                    name = entry.get('name')
+                    if player_uuid and name:
+                        imported += self._identify(name, player_uuid, rename=rename)
+        return imported
+
+    def import_server_files(self, force=True):
+        """从 usercache.json 与 whitelist.json 导入名字与 UUID，``force`` 为假时只读取有变化的文件"""
+        if not self.server_dir or self._db is None:
+            return 0
+        return self._apply_server_files(self._read_server_files(force))
+
+    async def refresh_server_files(self, names):
+        """``names`` 中有未知玩家时，在线程中读取有变化的服务器文件并导入"""
+        if not self.server_dir or self._db is None:
+            return 0
+        if all(name.lower() in self._index for name in names):
+            return 0
+        loaded = await asyncio.to_thread(self._read_server_files, False)
+        return self._apply_server_files(loaded)
+
+    # --- 查询 ---
+
+    def resolve(self, name):
+        """名字（不区分大小写）对应的 UUID，只查内存中的索引"""
+        entry = self._index.get(name.lower()) if name else None
+        return entry[0] if entry else None
+
+    def canonical(self, name):
+        """名字在档案中的正确大小写，未知玩家原样返回"""
+        entry = self._index.get(name.lower()) if name else None
+        return entry[1] if entry else name
+
+    def get(self, player_uuid):
+        """按 UUID 取档案，先查 LRU 缓存"""
+        profile = self._cache.get(player_uuid)
+        if profile is not None:
+            self._cache.move_to_end(player_uuid)
+            metrics.PLAYER_CACHE.inc(result='hit')
+            return profile
+        metrics.PLAYER_CACHE.inc(result='miss')
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            'SELECT uuid, name, first_seen, last_seen, playtime, sessions FROM players WHERE uuid = ?',
+            (player_uuid,)).fetchone()
+        if row is None:
+            return None
+        names = tuple(n for (n,) in self._db.execute(
+            'SELECT name FROM names WHERE uuid = ? AND name != ? ORDER BY seen_at', (player_uuid, row[1])))
+        profile = PlayerProfile(*row, names=names)
+        self._remember(profile)
+        return profile
+
+    def profile(self, name):
+        player_uuid = self.resolve(name)
+        return self.get(player_uuid) if player_uuid else None
+
+    def playtime(self, profile, now=None):
+        """累计在线时长，包括正在进行的会话"""
+        joined_at = self.online.get(profile.uuid)
+        if joined_at is None:
+            return profile.playtime
+        return profile.playtime + max(0.0, (now or time.time()) - joined_at)
+
+    def online_names(self):
+        names = (self._names.get(player_uuid) for player_uuid in self.online)
+        return sorted((name for name in names if name), key=str.lower)
+
+    def complete(self, prefix='', limit=20):
+        """以 ``prefix`` 开头的玩家名（不区分大小写），在线玩家排在前面"""
+        prefix = (prefix or '').lower()
+        online = [n for n in self.online_names() if n.lower().startswith(prefix)]
+        results = online[:limit]
+        if len(results) >= limit:
+            return results
+        if self._sorted is None:
+            self._sorted = sorted(self._index)
+        seen = set(results)
+        for key in self._sorted[bisect.bisect_left(self._sorted, prefix):]:
+            if not key.startswith(prefix) or len(results) >= limit:
+                break
+            name = self._index[key][1]
+            if name not in seen:
+                results.append(name)
+        return results
+
+    def sessions(self, player_uuid, limit=20):
+        """最近的会话 (开始, 结束)，最新的在前"""
+        if self._db is None:
+            return []
+        return self._db.execute(
+            'SELECT joined_at, left_at FROM sessions WHERE uuid = ? ORDER BY joined_at DESC LIMIT ?',
+            (player_uuid, limit)).fetchall()
+
+    # --- 更新 ---
+
+    def _remember(self, profile):
+        self._cache[profile.uuid] = profile
+        self._cache.move_to_end(profile.uuid)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _set_index(self, name, player_uuid):
+        self._index[name.lower()] = (player_uuid, name)
+        self._names[player_uuid] = name
+        self._sorted = None
+
+    def _identify(self, name, player_uuid, at=0.0, rename=True):
+        """记录名字与 UUID 的对应关系，处理改名与离线 UUID 的合并；有变化时返回 1
+
+        ``rename`` 为假时不改动已有档案的名字，只补充未知的玩家。
+        """
+        current = self._index.get(name.lower())
+        if not rename and current is None and self._db.execute(
+                'SELECT 1 FROM players WHERE uuid = ?', (player_uuid,)).fetchone() is not None:
+            return 0
+        if current is not None and current[0] == player_uuid:
+            if current[1] == name:
+                return 0
+            # 只是大小写变化
+            self._db.execute('UPDATE players SET name = ? WHERE uuid = ?', (name, player_uuid))
+            self._set_index(name, player_uuid)
+            self._cache.pop(player_uuid, None)
+            return 1
+        if current is not None:
+            if current[0] == offline_uuid(current[1]):
+                self._merge(current[0], player_uuid)
+            else:
+                # 名字已被另一名玩家使用，原主人改名后才会出现这种情况
+                del self._index[name.lower()]
+        row = self._db.execute('SELECT name FROM players WHERE uuid = ?', (player_uuid,)).fetchone()
+        if row is None:
+            self._db.execute('INSERT INTO players VALUES (?, ?, ?, ?, ?, 0, 0)',
+                             (player_uuid, name, name.lower(), at, at))
+        elif row[0] != name:
+            logging.info(f"玩家 {row[0]} 已改名为 {name}")
+            self._db.execute('UPDATE players SET name = ?, name_lower = ? WHERE uuid = ?',
+                             (name, name.lower(), player_uuid))
+            if self._index.get(row[0].lower(), (None,))[0] == player_uuid:
+                del self._index[row[0].lower()]
+        self._db.execute('INSERT OR IGNORE INTO names VALUES (?, ?, ?)', (player_uuid, name, at or time.time()))
+        self._set_index(name, player_uuid)
+        self._cache.pop(player_uuid, None)
+        return 1
+
+    def _merge(self, old_uuid, new_uuid):
+        """把离线 UUID 下记录的会话与时长并入真实 UUID"""
+        row = self._db.execute('SELECT first_seen, last_seen, playtime, sessions FROM players WHERE uuid = ?',
+                               (old_uuid,)).fetchone()
+        if self._db.execute('SELECT 1 FROM players WHERE uuid = ?', (new_uuid,)).fetchone() is None:
+            self._db.execute('UPDATE players SET uuid = ? WHERE uuid = ?', (new_uuid, old_uuid))
+        elif row is not None:
+            first_seen, last_seen, playtime, sessions = row
+            self._db.execute(
+                'UPDATE players SET first_seen = CASE WHEN first_seen = 0 OR first_seen > ? THEN ? ELSE first_seen END, '
+                'last_seen = MAX(last_seen, ?), playtime = playtime + ?, sessions = sessions + ? WHERE uuid = ?',
+                (first_seen, first_seen, last_seen, playtime, sessions, new_uuid))
+            self._db.execute('DELETE FROM players WHERE uuid = ?', (old_uuid,))
+        self._db.execute('UPDATE sessions SET uuid = ? WHERE uuid = ?', (new_uuid, old_uuid))
+        self._db.execute('UPDATE OR IGNORE names SET uuid = ? WHERE uuid = ?', (new_uuid, old_uuid))
+        self._db.execute('DELETE FROM names WHERE uuid = ?', (old_uuid,))
+        if old_uuid in self.online:
+            self.online[new_uuid] = self.online.pop(old_uuid)
+        self._names.pop(old_uuid, None)
+        self._cache.pop(old_uuid, None)
+        self._cache.pop(new_uuid, None)
+
+    def identify(self, name, player_uuid):
+        """记录日志或其他来源给出的名字与 UUID"""
+        player_uuid = normalize_uuid(player_uuid)
+        if self._db is None or not player_uuid or not name:
+            return
+        with self._db:
+            self._identify(name, player_uuid)
+
+    def _uuid_for_session(self, name, at):
+        player_uuid = self.resolve(name)
+        if player_uuid is None:
+            player_uuid = offline_uuid(name)
+            self._identify(name, player_uuid, at)
+        return player_uuid
+
+    def join(self, name, at=None):
+        """开始一次会话，已在线时忽略"""
+        if self._db is None:
+            return
+        at = at or time.time()
+        with self._db:
+            player_uuid = self._uuid_for_session(name, at)
+            if player_uuid in self.online:
+                return
+            self.online[player_uuid] = at
+            self._db.execute(
+                'UPDATE players SET last_seen = ?, '
+                'first_seen = CASE WHEN first_seen = 0 THEN ? ELSE first_seen END WHERE uuid = ?',
+                (at, at, player_uuid))
+        self._cache.pop(player_uuid, None)
+
+    def leave(self, name, at=None):
+        """结束一次会话并把时长累加到档案，未在线时忽略"""
+        player_uuid = self.resolve(name)
+        if self._db is None or player_uuid not in self.online:
+            return
+        self._end_session(player_uuid, at or time.time())
+
+    def _end_session(self, player_uuid, at):
+        joined_at = self.online.pop(player_uuid)
+        with self._db:
+            self._db.execute('INSERT INTO sessions VALUES (?, ?, ?)', (player_uuid, joined_at, at))
+            self._db.execute(
+                'UPDATE players SET playtime = playtime + ?, sessions = sessions + 1, last_seen = ? WHERE uuid = ?',
+                (max(0.0, at - joined_at), at, player_uuid))
+        self._cache.pop(player_uuid, None)
+
+    def sync(self, players, at=None):
+        """按在线玩家集合补齐会话：第一次快照中已在线的玩家、校正时发现的遗漏"""
+        if self._db is None:
+            return
+        at = at or time.time()
+        for name in players:
+            self.join(name, at)
+        current = {self.resolve(name) for name in players}
+        for player_uuid in [u for u in self.online if u not in current]:
+            self._end_session(player_uuid, at)
+
+    # --- 事件 ---
+
+    async def _on_joined(self, event):
+        await self.refresh_server_files([event.name])
+        self.join(event.name, event.at)
+
+    def _on_left(self, event):
+        self.leave(event.name, event.at)
+
+    async def _on_players_changed(self, event):
+        await self.refresh_server_files(event.players)
+        self.sync(event.players, event.at)
+
+    def _on_identified(self, event):
+        self.identify(event.name, event.uuid)
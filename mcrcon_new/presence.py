@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class StatusUpdated:
+    """服务器状态快照已刷新"""
+    status: dict
+    at: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class PlayersChanged:
+    """在线玩家集合发生变化"""
+    players: tuple
+    at: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class PlayerJoined:
+    name: str
+    at: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class PlayerLeft:
+    name: str
+    at: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class PlayerIdentified:
+    """服务器为登录的玩家确定了 UUID（来自服务器日志）"""
+    name: str
+    uuid: str
+    at: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class ChatMessage:
+    """玩家在聊天栏发言（来自服务器日志）"""
+    name: str
+    message: str
+    at: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class PlayerDied:
+    """玩家死亡，``message`` 为完整的死亡信息（来自服务器日志）"""
+    name: str
+    message: str
+    at: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class AdvancementMade:
+    """玩家取得进度、完成挑战或达成目标（来自服务器日志）"""
+    name: str
+    advancement: str
+    at: float = field(default_factory=time.time)
+
+
+class EventBus:
+    """按事件类型分发的简单异步事件总线"""
+
+    def __init__(self):
+        self._subscribers = {}
+
+    def subscribe(self, event_type, callback):
+        """订阅某类事件，返回取消订阅的函数；回调可以是同步或异步函数"""
+        self._subscribers.setdefault(event_type, []).append(callback)
+
+        def unsubscribe():
+            callbacks = self._subscribers.get(event_type, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+        return unsubscribe
+
+    async def publish(self, event):
+        for callback in list(self._subscribers.get(type(event), [])):
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                # 单个订阅者出错不影响其他订阅者
+                logging.error(f"处理事件 {type(event).__name__} 失败: {e}")
+
+
+class PresenceTracker:
+    """根据状态快照集中计算玩家加入/离开，并发布到事件总线
+
+    第一次收到快照时只建立基线，不为已经在线的玩家发布加入事件；
+    服务器离线期间保持上次的玩家集合，避免重连时误报全部离开再加入。
+
+    启用日志跟踪时，加入/离开由 ``observe`` 实时上报，快照只用于校正。日志刚上报过的
+    玩家在 ``log_grace`` 秒内不按快照判断，以免发送早于日志事件的快照造成误报。
+    """
+
+    def __init__(self, bus, log_grace=10):
+        self.bus = bus
+        self.players = None
+        self.status = None
+        self.log_grace = log_grace
+        # 玩家名 -> 最近一次由日志上报的时间
+        self._observed = {}
+
+    async def update(self, status):
+        self.status = status
+        await self.bus.publish(StatusUpdated(status))
+        if not status.get('online'):
+            return
+
+        current = set(status.get('players', []))
+        if self.players is None:
+            self.players = current
+            await self.bus.publish(PlayersChanged(tuple(sorted(current))))
+            return
+
+        now = time.monotonic()
+        self._observed = {name: at for name, at in self._observed.items() if now - at < self.log_grace}
+        recent = set(self._observed)
+        joined = current - self.players - recent
+        left = self.players - current - recent
+        self.players = (self.players & recent) | (current - recent)
+        current = self.players
+        for name in sorted(joined):
+            await self.bus.publish(PlayerJoined(name))
+        for name in sorted(left):
+            await self.bus.publish(PlayerLeft(name))
+        if joined or left:
+            await self.bus.publish(PlayersChanged(tuple(sorted(current))))
+
+    async def observe(self, name, online):
+        """由日志跟踪上报的加入（``online`` 为真）或离开，立即发布事件"""
+        self._observed[name] = time.monotonic()
+        if self.players is not None:
+            if online == (name in self.players):
+                return
+            self.players = self.players | {name} if online else self.players - {name}
+        await self.bus.publish(PlayerJoined(name) if online else PlayerLeft(name))
+        if self.players is not None:
+            await self.bus.publish(PlayersChanged(tuple(sorted(self.players))))
+
+    async def run(self, cache, interval):
+        """后台定期读取共享缓存，保证没有页面打开时事件也能照常产生"""
+        while True:
+            try:
+                await cache.get()
+            except Exception as e:
+                logging.error(f"刷新服务器状态失败: {e}")
+            await asyncio.sleep(interval)
@@ -1,110 +1,255 @@
+import asyncio
 import re
+import threading
+import time
 import toml
-import json
-from mcrcon import MCRcon
 import logging
+from dataclasses import dataclass, field
+
+from mcrcon_new.ban_store import BanStore
+from mcrcon_new.command_queue import INTERACTIVE, POLLING
+from mcrcon_new.metrics import BATCH_LATENCY, observe_command, observe_result
+from mcrcon_new.parsers import FLAVORS, ResponseParser, is_failed_response, parse_whitelist
+from mcrcon_new.rcon_pool import RCONConnectionPool
+from mcrcon_new.rcon_protocol import RCONConnection, RCONNotSent, DEFAULT_MAX_RESPONSE_BYTES
+
+IP_PATTERN = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
+
+
+@dataclass
+class CommandResult:
+    """批量执行中单条命令的结果"""
+    command: str
+    response: str = ''
+    ok: bool = False
+    error: str = ''
+
+
+@dataclass
+class BatchReport:
+    """批量执行的汇总结果，按提交顺序保存每条命令的结果"""
+    results: list = field(default_factory=list)
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    def summary(self):
+        return f"共 {len(self.results)} 条，成功 {len(self.succeeded)} 条，失败 {len(self.failed)} 条"
+
+
+def make_result(command, response=None, error=None, flavor=None):
+    """根据响应或异常构造 CommandResult，``flavor`` 为服务端类型"""
+    if error is not None:
+        return CommandResult(command, error=str(error))
+    return CommandResult(command, response=response, ok=not is_failed_response(response, flavor, command))
+
+
+def is_ip_address(target):
+    """判断封禁目标是否为 IPv4 地址"""
+    return IP_PATTERN.match(target) is not None
+
 
 class RCONManager:
-    def __init__(self, config_path='config/config.toml', ban_file_path='data/banned_players.json'):
+    def __init__(self, config_path='config/config.toml', ban_file_path='data/banned_players.json',
+                 server_name=None):
         self.config_path = config_path
         self.ban_file_path = ban_file_path
+        # 为 None 时使用 [server]，否则使用同名的 [[servers]] 条目（未填写的项沿用 [server]）
+        self.server_name = server_name
+        self.name = server_name
+        self.tags = []
         self.host = None
         self.port = None
         self.password = None
-        self.rcon = None
-        self.banned_data = {"players": [], "ips": []}
+        self.timeout = 5.0
+        self.multipacket = True
+        self.max_response_bytes = DEFAULT_MAX_RESPONSE_BYTES
+        self.pool_settings = {}
+        self.cache_settings = {}
+        self.ban_settings = {}
+        self.queue_settings = {}
+        self.jobs_settings = {}
+        self.logs_settings = {}
+        self.console_settings = {}
+        self.history_settings = {}
+        self.health_settings = {}
+        self.audit_settings = {}
+        self.players_settings = {}
+        self.flavor = None
+        self.pool = None
+        # 由 attach_scheduler() 设置后，同步接口也经事件循环中的命令队列排队与限速
+        self.scheduler = None
+        self._loop = None
+        # 封禁列表在首次使用时才加载，避免启动时读取可能很大的文件
+        self._ban_store = None
+        self._ban_store_lock = threading.Lock()
         self.load_config()
-        self.load_ban_list_from_file()
+        # 服务端类型在首次解析 'list' 时识别并缓存，配置中指定时直接使用
+        self.parser = ResponseParser(self.flavor)
 
     def load_config(self):
         try:
             settings = toml.load(self.config_path)
-            self.host = settings['server']['host']
-            self.port = int(settings['server']['port'])
-            self.password = settings['server']['password']
+            server = settings['server']
+            if self.server_name is not None:
+                entries = [s for s in settings.get('servers', []) if s.get('name') == self.server_name]
+                if not entries:
+                    raise KeyError(f"servers.{self.server_name}")
+                server = {**server, 'tags': [], **entries[0]}
+            self.name = server.get('name', 'main')
+            self.tags = list(server.get('tags', []))
+            self.host = server['host']
+            self.port = int(server['port'])
+            self.password = server['password']
+            self.timeout = float(server.get('timeout', 5))
+            self.multipacket = bool(server.get('multipacket', True))
+            self.max_response_bytes = int(server.get('max_response_bytes', DEFAULT_MAX_RESPONSE_BYTES))
+            flavor = server.get('flavor', 'auto')
+            self.flavor = flavor if flavor in FLAVORS else None
+            self.pool_settings = settings.get('pool', {})
+            self.cache_settings = settings.get('cache', {})
+            self.ban_settings = settings.get('bans', {})
+            self.queue_settings = settings.get('queue', {})
+            self.jobs_settings = settings.get('jobs', {})
+            self.logs_settings = settings.get('logs', {})
+            self.console_settings = settings.get('console', {})
+            self.history_settings = settings.get('history', {})
+            self.health_settings = settings.get('health', {})
+            self.audit_settings = settings.get('audit', {})
+            self.players_settings = settings.get('players', {})
         except FileNotFoundError:
             logging.error(f"配置文件未找到: {self.config_path}")
             # 在这里可以考虑生成一个默认配置
         except (KeyError, ValueError) as e:
             logging.error(f"配置文件格式错误: {e}")
 
+    def _create_pool(self):
+        """根据 [pool] 配置创建连接池"""
+        return RCONConnectionPool(
+            lambda: RCONConnection(self.host, self.port, self.password, timeout=self.timeout,
+                                   multipacket=self.multipacket,
+                                   max_response_bytes=self.max_response_bytes),
+            size=self.pool_settings.get('size', 4),
+            idle_timeout=float(self.pool_settings.get('idle_timeout', 300)),
+            max_lifetime=float(self.pool_settings.get('max_lifetime', 3600)),
+            health_check_interval=float(self.pool_settings.get('health_check_interval', 30)),
+            acquire_timeout=float(self.pool_settings.get('acquire_timeout', 10)),
+            retry_exceptions=(RCONNotSent,),
+        )
+
     def connect(self):
+        """初始化连接池并验证能否连接到服务器"""
         if not all([self.host, self.port, self.password]):
             return False, "服务器配置不完整"
-        
+
+        if self.pool is None:
+            self.pool = self._create_pool()
         try:
-            self.rcon = MCRcon(self.host, self.password, self.port)
-            self.rcon.connect()
+            pooled = self.pool.acquire()
+            self.pool.release(pooled)
             return True, "成功连接到服务器"
         except Exception as e:
             logging.error(f"连接 RCON 服务器失败: {e}")
             return False, f"连接失败: {e}"
 
     def disconnect(self):
-        if self.rcon:
-            try:
-                self.rcon.disconnect()
-            except Exception as e:
-                logging.error(f"断开 RCON 连接时出错: {e}")
-        self.rcon = None
+        """关闭连接池中的所有连接"""
+        if self.pool:
+            self.pool.close()
+        self.pool = None
+
+    def attach_scheduler(self, scheduler, loop):
+        """让同步接口与异步接口共用 ``loop`` 中的命令队列
+
+        调用线程阻塞等待结果，实际的网络读写放到线程池中执行，不占用事件循环。
+        """
+        self.scheduler = scheduler
+        self._loop = loop
+
+    def _scheduled(self, func, priority, key=None, cost=1):
+        """经命令队列执行 ``func()``；未接入队列或在事件循环线程中调用时直接执行"""
+        loop = self._loop
+        if self.scheduler is None or loop is None or loop.is_closed():
+            return func()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            # 在事件循环线程中阻塞等待队列会造成死锁
+            return func()
+        future = asyncio.run_coroutine_threadsafe(
+            self.scheduler.submit(lambda: asyncio.to_thread(func), priority, key, cost), loop)
+        return future.result()
 
-    def command(self, cmd):
-        if not self.rcon:
+    def command(self, cmd, priority=INTERACTIVE):
+        if self.pool is None:
             status, msg = self.connect()
             if not status:
                 return msg
 
+        started = time.perf_counter()
         try:
-            response = self.rcon.command(cmd)
-            return response
+            response = self._scheduled(lambda: self.pool.run(lambda rcon: rcon.command(cmd)), priority, key=cmd)
         except Exception as e:
+            observe_command(cmd, 'sync', time.perf_counter() - started, error=e)
             logging.error(f"执行命令 '{cmd}' 失败: {e}")
             return f"命令执行失败: {e}"
-        finally:
-            self.disconnect()
+        observe_command(cmd, 'sync', time.perf_counter() - started, response,
+                        rejected=self.parser.is_failure(response, cmd))
+        return response
 
-    def get_server_status(self):
-        """获取服务器状态，包括在线人数和玩家列表"""
-        response = self.command('list')
-        if response is None or "失败" in response:
-            return {"online": False, "player_count": 0, "players": []}
+    def batch(self, commands, concurrency=None, priority=INTERACTIVE):
+        """在同一连接上批量执行命令，返回 BatchReport
 
-        try:
-            # 解析 'There are 1 of a max of 20 players online: player1' 这样的字符串
-            parts = response.split(':')
-            player_count_str = re.search(r'(\d+)\s+of\s+a\s+max', parts[0])
-            player_count = int(player_count_str.group(1)) if player_count_str else 0
-            
-            players = []
-            if player_count > 0 and len(parts) > 1:
-                players = [p.strip() for p in parts[1].split(',')]
-
-            return {"online": True, "player_count": player_count, "players": players}
-        except (IndexError, ValueError, AttributeError) as e:
-            logging.error(f"解析 'list' 命令响应失败: {response} - 错误: {e}")
-            # 尝试另一种解析方式，针对 '§6default§r: player1, player2'
+        ``concurrency`` 限制同时在途的命令数（默认取 [pool] pipeline_depth）。
+        发送前发现连接已失效时换一条连接重试；命令写出后连接才失效时，
+        尚未得到响应的命令记为失败，不会自动重发。
+        """
+        commands = [c for c in commands if c]
+        report = BatchReport()
+        if not commands:
+            return report
+        if self.pool is None:
+            status, msg = self.connect()
+            if not status:
+                report.results = [make_result(c, error=msg) for c in commands]
+                return report
+
+        depth = max(1, int(concurrency or self.pool_settings.get('pipeline_depth', 32)))
+        for start in range(0, len(commands), depth):
+            chunk = commands[start:start + depth]
+            started = time.perf_counter()
             try:
-                match_names = re.findall(r'§6default§r: (.*)', response)
-                if match_names:
-                    name_list = [re.sub(r'§.', '', name) for name in match_names[0].split(',')]
-                    return {"online": True, "player_count": len(name_list), "players": name_list}
-            except Exception as inner_e:
-                 logging.error(f"再次解析 'list' 命令响应失败: {response} - 错误: {inner_e}")
+                responses = self._scheduled(
+                    lambda: self.pool.run(lambda rcon: rcon.command_many(chunk, depth)),
+                    priority, key=tuple(chunk), cost=len(chunk))
+            except Exception as e:
+                logging.error(f"批量执行命令失败，剩余 {len(commands) - start} 条未完成: {e}")
+                for c in commands[start:]:
+                    observe_result(c, error=e)
+                report.results.extend(make_result(c, error=e) for c in commands[start:])
+                break
+            finally:
+                BATCH_LATENCY.observe(time.perf_counter() - started, mode='sync')
+            for result in (make_result(c, r, flavor=self.parser.flavor) for c, r in zip(chunk, responses)):
+                observe_result(result.command, result.response, rejected=not result.ok)
+                report.results.append(result)
+        return report
 
-            return {"online": True, "player_count": 0, "players": []} # 至少服务器是在线的
+    def get_server_status(self):
+        """获取服务器状态，包括在线人数和玩家列表"""
+        return self.parser.parse_list(self.command('list', priority=POLLING)).as_status()
 
     def get_whitelist(self):
-        """获取白名单列表（更健壮的版本）"""
-        response = self.command('whitelist list')
-        # 检查响应是否有效且包含冒号，以避免空列表时的IndexError
-        if response and "whitelisted players" in response and ":" in response:
-            try:
-                players_str = response.split(':', 1)[1]
-                players = players_str.strip().split(',')
-                return [p.strip() for p in players if p.strip()]
-            except IndexError:
-                return []  # 如果分割失败，返回空列表
-        return [] # 如果响应不符合预期格式，返回空列表
+        """获取白名单列表"""
+        whitelist = parse_whitelist(self.command('whitelist list'))
+        return whitelist.players if whitelist else []
 
     def add_to_whitelist(self, player_name):
         """将玩家添加到白名单"""
@@ -114,50 +259,74 @@ class RCONManager:
         """将玩家从白名单移除"""
         return self.command(f'whitelist remove {player_name}')
 
+    @property
+    def ban_store(self):
+        """本地封禁列表，首次访问时加载"""
+        if self._ban_store is None:
+            with self._ban_store_lock:
+                if self._ban_store is None:
+                    self.load_ban_list_from_file()
+        return self._ban_store
+
     def load_ban_list_from_file(self):
-        """从文件加载封禁列表"""
-        try:
-            with open(self.ban_file_path, 'r', encoding='utf-8') as f:
-                self.banned_data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.save_ban_list_to_file() # 如果文件不存在或无效，则创建一个新的
+        """从快照和追加日志加载封禁列表"""
+        store = BanStore(self.ban_file_path,
+                         compact_threshold=int(self.ban_settings.get('compact_threshold', 1000)))
+        store.load()
+        self._ban_store = store
+
+    def close_ban_store(self):
+        """关闭已加载的封禁列表，未加载过时什么也不做"""
+        if self._ban_store is not None:
+            self._ban_store.close()
 
     def save_ban_list_to_file(self):
-        """将封禁列表保存到文件"""
-        try:
-            with open(self.ban_file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.banned_data, f, indent=2)
-        except IOError as e:
-            logging.error(f"无法写入封禁列表文件: {e}")
+        """把封禁列表压缩为完整快照"""
+        self.ban_store.compact()
 
     def get_ban_list(self):
         """从内存直接获取封禁列表"""
-        return self.banned_data
-
-    def ban_player(self, player_name):
-        """封禁玩家并立即更新本地文件"""
-        response = self.command(f'ban {player_name}')
-        if player_name and player_name not in self.banned_data["players"]:
-            self.banned_data["players"].append(player_name)
-            self.save_ban_list_to_file()
+        return self.ban_store.as_lists()
+
+    def get_ban_entry(self, target_name):
+        """获取封禁记录（原因、时间、操作者），不存在时返回 None"""
+        return self.ban_store.get(target_name, 'ip' if is_ip_address(target_name) else 'player')
+
+    def record_ban(self, player_name, reason='', issuer=''):
+        """在本地封禁列表中记录玩家"""
+        self.record_bans([player_name], reason, issuer)
+
+    def record_bans(self, player_names, reason='', issuer=''):
+        """批量记录被封禁的玩家，整批只追加一次日志"""
+        self.ban_store.ban_many(player_names, 'player', reason, issuer)
+
+    def record_pardon(self, target_name):
+        """从本地封禁列表中移除玩家或IP"""
+        self.record_pardons([target_name])
+
+    def record_pardons(self, target_names):
+        """批量移除被解封的玩家或IP，整批只追加一次日志"""
+        targets = list(target_names)
+        self.ban_store.pardon_many([t for t in targets if is_ip_address(t)], 'ip')
+        self.ban_store.pardon_many([t for t in targets if not is_ip_address(t)], 'player')
+
+    def ban_player(self, player_name, reason='', issuer=''):
+        """封禁玩家，服务器确认成功后立即记录到本地封禁列表"""
+        command = f'ban {player_name} {reason}'.rstrip()
+        response = self.command(command)
+        if not self.parser.is_failure(response, command):
+            self.record_ban(player_name, reason, issuer)
         return response
 
     def pardon_target(self, target_name):
-        """解封玩家或IP并立即更新本地文件"""
+        """解封玩家或IP，服务器确认成功后立即更新本地封禁列表"""
         if not target_name:
             return "目标不能为空"
-            
-        ip_pattern = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
-        if ip_pattern.match(target_name):
-            response = self.command(f'pardon-ip {target_name}')
-            if target_name in self.banned_data["ips"]:
-                self.banned_data["ips"].remove(target_name)
-        else:
-            response = self.command(f'pardon {target_name}')
-            if target_name in self.banned_data["players"]:
-                self.banned_data["players"].remove(target_name)
-            
-        self.save_ban_list_to_file()
+
+        command = f'pardon-ip {target_name}' if is_ip_address(target_name) else f'pardon {target_name}'
+        response = self.command(command)
+        if not self.parser.is_failure(response, command):
+            self.record_pardon(target_name)
         return response
 
     def op_player(self, player_name):
@@ -0,0 +1,190 @@
+import select
+import socket
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+from mcrcon_new.rcon_protocol import RCONNotSent
+
+
+class PooledConnection:
+    """连接池中的单个连接，记录创建与最近使用时间"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def idle_time(self):
+        return time.monotonic() - self.last_used
+
+    def age(self):
+        return time.monotonic() - self.created_at
+
+    def is_alive(self):
+        """通过非阻塞探测 socket 判断连接是否已被服务器关闭"""
+        sock = getattr(self.conn, 'socket', None)
+        if sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return True
+            # 空闲连接上出现可读事件通常意味着对端已关闭
+            return sock.recv(1, socket.MSG_PEEK) != b''
+        except (OSError, ValueError):
+            return False
+
+    def close(self):
+        try:
+            self.conn.disconnect()
+        except Exception as e:
+            logging.error(f"关闭 RCON 连接时出错: {e}")
+
+
+class RCONConnectionPool:
+    """长连接 RCON 连接池
+
+    连接按需创建，最多 ``size`` 个；归还后保持打开以供复用。
+    超过 ``idle_timeout`` 未使用或存活超过 ``max_lifetime`` 的连接会被关闭，
+    空闲超过 ``health_check_interval`` 的连接在借出前会做一次存活检查。
+    """
+
+    def __init__(self, factory, size=4, idle_timeout=300.0, max_lifetime=3600.0,
+                 health_check_interval=30.0, acquire_timeout=10.0,
+                 retry_exceptions=(RCONNotSent,)):
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.retry_exceptions = tuple(retry_exceptions)
+        self._idle = []
+        self._in_use = 0
+        self._lock = threading.Condition()
+        self._closed = False
+
+    def _total(self):
+        return len(self._idle) + self._in_use
+
+    def _is_usable(self, pooled):
+        if self.max_lifetime and pooled.age() > self.max_lifetime:
+            return False
+        if self.idle_timeout and pooled.idle_time() > self.idle_timeout:
+            return False
+        if pooled.idle_time() > self.health_check_interval and not pooled.is_alive():
+            return False
+        return True
+
+    def _create(self):
+        conn = self.factory()
+        conn.connect()
+        return PooledConnection(conn)
+
+    def acquire(self):
+        """借出一个可用连接，必要时新建；池满时等待其他调用方归还"""
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if self._is_usable(pooled):
+                        self._in_use += 1
+                        return pooled
+                    pooled.close()
+                if self._total() < self.size:
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("等待可用 RCON 连接超时")
+                self._lock.wait(remaining)
+
+        # 在锁外建立连接，避免慢速握手阻塞其他调用方
+        try:
+            return self._create()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, pooled, discard=False):
+        """归还连接；``discard`` 为真时直接关闭而不放回池中"""
+        with self._lock:
+            self._in_use -= 1
+            if discard or self._closed:
+                pooled.close()
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        pooled = self.acquire()
+        try:
+            yield pooled.conn
+        except Exception:
+            self.release(pooled, discard=True)
+            raise
+        else:
+            self.release(pooled)
+
+    def run(self, func, retries=1):
+        """在池中连接上执行 ``func(conn)``，确定命令尚未发出时透明重连并重试
+
+        只重试建立连接失败与 ``retry_exceptions``（发送前发现连接失效）；命令写出后
+        出现的错误可能发生在服务器执行之后，重试会让 give、ban 等命令执行两次，因此直接抛出。
+        """
+        for attempt in range(retries + 1):
+            try:
+                pooled = self.acquire()
+            except TimeoutError:
+                # 等待池中连接超时或连接超时，重试只会让调用方等待更久
+                raise
+            except OSError as e:
+                if attempt >= retries:
+                    raise
+                logging.warning(f"连接 RCON 服务器失败，正在重试: {e}")
+                continue
+            try:
+                result = func(pooled.conn)
+            except self.retry_exceptions as e:
+                self.release(pooled, discard=True)
+                if attempt >= retries:
+                    raise
+                logging.warning(f"RCON 连接失效，正在重连: {e}")
+            except Exception:
+                self.release(pooled, discard=True)
+                raise
+            else:
+                self.release(pooled)
+                return result
+
+    def prune(self):
+        """关闭所有过期的空闲连接"""
+        with self._lock:
+            keep = []
+            for pooled in self._idle:
+                if self._is_usable(pooled):
+                    keep.append(pooled)
+                else:
+                    pooled.close()
+            self._idle = keep
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "idle": len(self._idle), "in_use": self._in_use}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for pooled in self._idle:
+                pooled.close()
+            self._idle = []
+            self._lock.notify_all()
@@ -0,0 +1,210 @@
+import select
+import socket
+import struct
+
+from mcrcon_new.metrics import AUTH_LATENCY, CONNECT_LATENCY, ERRORS, Timer
+
+# Source RCON 数据包类型
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+
+# 包头：长度、请求ID、类型，均为小端 int32
+HEADER = struct.Struct('<iii')
+LENGTH = struct.Struct('<i')
+# 长度字段之后至少包含 ID、类型与两个结尾空字节
+MIN_PACKET_LENGTH = 10
+# 协议规定单包负载不超过 4096 字节，部分服务端会超出，这里放宽到 64 KiB
+MAX_PACKET_LENGTH = 65536
+
+
+class RCONError(Exception):
+    """RCON 协议或连接错误"""
+
+
+class RCONAuthError(RCONError):
+    """RCON 密码验证失败"""
+
+
+class RCONConnectionClosed(RCONError):
+    """连接已被关闭；请求可能已经发出并在服务器上执行，不能自动重试"""
+
+
+class RCONNotSent(RCONConnectionClosed):
+    """发送前发现连接未建立或已失效，命令没有到达服务器，可以在新连接上安全重试"""
+
+
+def encode_packet(request_id, packet_type, payload):
+    """将一个请求编码为 Source RCON 数据包"""
+    body = payload.encode('utf-8') + b'\x00\x00'
+    return HEADER.pack(len(body) + 8, request_id, packet_type) + body
+
+
+def decode_packet(data):
+    """解码长度字段之后的数据包内容，返回 (请求ID, 类型, 文本)"""
+    if len(data) < MIN_PACKET_LENGTH:
+        raise RCONError(f"数据包过短: {len(data)} 字节")
+    request_id, packet_type = struct.unpack_from('<ii', data)
+    if data[-2:] != b'\x00\x00':
+        raise RCONError("数据包结尾填充不正确")
+    return request_id, packet_type, data[8:-2].decode('utf-8', errors='replace')
+
+
+def read_length(data):
+    length, = LENGTH.unpack(data)
+    if length < MIN_PACKET_LENGTH or length > MAX_PACKET_LENGTH:
+        raise RCONError(f"数据包长度异常: {length}")
+    return length
+
+
+# 单条命令响应拼接后的默认上限，防止异常输出耗尽内存
+DEFAULT_MAX_RESPONSE_BYTES = 4 * 1024 * 1024
+
+
+class RCONResponseTooLarge(RCONError):
+    """响应超过配置的上限"""
+
+
+class ResponseBuffer:
+    """收集同一请求的多个响应分片，总长度受 ``max_bytes`` 限制
+
+    超过上限时抛出 RCONResponseTooLarge，而不是静默截断。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_RESPONSE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.fragments = []
+
+    def append(self, text):
+        self.size += len(text.encode('utf-8'))
+        if self.max_bytes and self.size > self.max_bytes:
+            raise RCONResponseTooLarge(f"响应超过 {self.max_bytes} 字节上限")
+        self.fragments.append(text)
+
+    def text(self):
+        return ''.join(self.fragments)
+
+
+class RCONConnection:
+    """同步 Source RCON 连接，可正确拼接分片响应
+
+    Minecraft 会把超过 4096 字节的输出拆成多个响应包。收到命令的第一个响应包后再发送一个
+    类型为 SERVERDATA_RESPONSE_VALUE 的空包作为哨兵：服务器按顺序处理请求，
+    收到哨兵的响应即说明该命令的所有分片都已到达。哨兵不与命令一起写出，因为部分原版
+    服务端每次 recv 只处理一个包，同一次写出中的后续包会被丢弃。
+    """
+
+    def __init__(self, host, port, password, timeout=5.0, multipacket=True,
+                 max_response_bytes=DEFAULT_MAX_RESPONSE_BYTES):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.multipacket = multipacket
+        self.max_response_bytes = max_response_bytes
+        self.socket = None
+        self._next_id = 0
+
+    def _new_id(self):
+        self._next_id = self._next_id % 0x7FFFFFFF + 1
+        return self._next_id
+
+    def connect(self):
+        try:
+            with Timer() as timer:
+                self.socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            ERRORS.inc(command='connect', type=type(e).__name__)
+            raise
+        CONNECT_LATENCY.observe(timer.elapsed, mode='sync')
+        try:
+            with Timer() as timer:
+                request_id = self._new_id()
+                self.socket.sendall(encode_packet(request_id, SERVERDATA_AUTH, self.password))
+                # 部分服务端会在验证响应前先发送一个空的响应包，跳过它
+                while True:
+                    in_id, in_type, _ = self._read_packet()
+                    if in_id == -1:
+                        raise RCONAuthError("RCON 密码错误")
+                    if in_id == request_id and in_type == SERVERDATA_AUTH_RESPONSE:
+                        break
+        except BaseException as e:
+            ERRORS.inc(command='auth', type=type(e).__name__)
+            self.disconnect()
+            raise
+        AUTH_LATENCY.observe(timer.elapsed, mode='sync')
+
+    def disconnect(self):
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+        self.socket = None
+
+    def _read_exactly(self, length):
+        data = bytearray()
+        while len(data) < length:
+            chunk = self.socket.recv(length - len(data))
+            if not chunk:
+                raise RCONConnectionClosed("服务器关闭了连接")
+            data += chunk
+        return bytes(data)
+
+    def _read_packet(self):
+        length = read_length(self._read_exactly(LENGTH.size))
+        return decode_packet(self._read_exactly(length))
+
+    def _ensure_open(self):
+        """发送前确认连接仍然可用：对端已关闭时在这里失败，而不是写出命令后才发现"""
+        if self.socket is None:
+            raise RCONNotSent("尚未连接到服务器")
+        try:
+            readable, _, _ = select.select([self.socket], [], [], 0)
+            closed = bool(readable) and self.socket.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            closed = True
+        if closed:
+            raise RCONNotSent("连接已被服务器关闭")
+
+    def _send_commands(self, cmds):
+        """连续写出多条命令，返回各自的请求ID"""
+        ids = [self._new_id() for _ in cmds]
+        self.socket.sendall(b''.join(
+            encode_packet(request_id, SERVERDATA_EXECCOMMAND, cmd) for request_id, cmd in zip(ids, cmds)))
+        return ids
+
+    def _read_responses(self, ids):
+        """按请求ID收集响应，直到每条命令都收到完整结果"""
+        buffers = {request_id: ResponseBuffer(self.max_response_bytes) for request_id in ids}
+        # 哨兵ID -> 请求ID；命令的第一个响应包到达后才发送它的哨兵
+        sentinels = {}
+        done = set()
+        while len(done) < len(ids):
+            in_id, _, text = self._read_packet()
+            if in_id in sentinels:
+                done.add(sentinels.pop(in_id))
+            elif in_id in buffers and in_id not in done:
+                first = not buffers[in_id].fragments
+                buffers[in_id].append(text)
+                if not self.multipacket:
+                    done.add(in_id)
+                elif first:
+                    sentinel_id = self._new_id()
+                    sentinels[sentinel_id] = in_id
+                    self.socket.sendall(encode_packet(sentinel_id, SERVERDATA_RESPONSE_VALUE, ''))
+        return [buffers[request_id].text() for request_id in ids]
+
+    def command(self, cmd):
+        self._ensure_open()
+        return self._read_responses(self._send_commands([cmd]))[0]
+
+    def command_many(self, cmds, depth=32):
+        """流水线发送多条命令，每批最多 ``depth`` 条在途，按顺序返回响应"""
+        self._ensure_open()
+        responses = []
+        for start in range(0, len(cmds), max(1, depth)):
+            responses.extend(self._read_responses(self._send_commands(cmds[start:start + depth])))
+        return responses
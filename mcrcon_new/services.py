@@ -0,0 +1,206 @@
+"""面板共享的后端服务实例
+
+NiceGUI 的脚本模式会为每个客户端重新执行 main_app.py，放在这里的对象只会在
+首次导入时创建一次，从而在所有页面之间共享。
+"""
+import asyncio
+import logging
+import os
+import time
+
+from fastapi.responses import PlainTextResponse
+
+from mcrcon_new import metrics
+from mcrcon_new.command_queue import LANE_NAMES
+from mcrcon_new.rcon_manager import RCONManager
+from mcrcon_new.async_rcon import AsyncRCONManager
+from mcrcon_new.status_cache import ServerStatusCache
+from mcrcon_new.presence import EventBus, PresenceTracker
+from mcrcon_new.ban_sync import BanReconciler
+from mcrcon_new.fleet import FleetRegistry
+from mcrcon_new.item_index import ItemIndex
+from mcrcon_new.jobs import JobEngine
+from mcrcon_new.health import HealthMonitor
+from mcrcon_new.welcome import PlayerGreeter
+from mcrcon_new.log_tail import LogTailer
+from mcrcon_new.console import ConsoleService
+from mcrcon_new.timeseries import TimeSeriesStore
+from mcrcon_new.audit import AuditLog
+from mcrcon_new.players import PlayerRegistry
+
+_started = time.perf_counter()
+_root = os.path.dirname(os.path.dirname(__file__))
+
+rcon_manager = RCONManager()
+# 页面回调统一使用异步管理器，避免慢速服务器阻塞事件循环
+async_rcon = AsyncRCONManager(rcon_manager)
+# 所有页面共享同一份 'list' 快照，避免每个标签页各自轮询
+status_cache = ServerStatusCache(async_rcon.get_server_status,
+                                 ttl=float(rcon_manager.cache_settings.get('status_ttl', 5)))
+event_bus = EventBus()
+presence = PresenceTracker(event_bus)
+status_cache.add_listener(presence.update)
+_logs_settings = rcon_manager.logs_settings
+_players_settings = rcon_manager.players_settings
+# 服务器根目录，未配置时取日志所在服务器的根目录；玩家档案从中导入 usercache.json，
+# 封禁同步优先读取其中的封禁文件
+_server_dir = _players_settings.get('server_dir') or (
+    os.path.dirname(os.path.dirname(os.path.join(_root, _logs_settings['path']))) if _logs_settings.get('path') else '')
+_server_dir = os.path.join(_root, _server_dir) if _server_dir else None
+ban_reconciler = BanReconciler(async_rcon, rcon_manager,
+                               batch_size=int(rcon_manager.ban_settings.get('sync_batch_size', 100)),
+                               server_dir=_server_dir, bus=event_bus)
+# 主服务器加上 [[servers]] 中配置的其他服务器
+fleet = FleetRegistry(rcon_manager, async_rcon, status_cache)
+# 物品搜索索引，由服务端按输入返回候选，不再把完整物品列表发给每个客户端
+item_index = ItemIndex.load(os.path.join(_root, 'data', 'items.json'))
+# 除状态轮询外的每条命令都记入审计日志，成批写入，不阻塞发送命令的一方
+_audit_settings = rcon_manager.audit_settings
+audit = AuditLog(db_path=os.path.join(_root, _audit_settings.get('database', 'data/audit.sqlite')),
+                 max_queue=int(_audit_settings.get('max_queue', 10000)),
+                 batch_size=int(_audit_settings.get('batch_size', 500)),
+                 retention_days=float(_audit_settings.get('retention_days', 180)))
+for _server in fleet.servers.values():
+    _server.rcon.audit = audit
+# 每台服务器的 TPS/MSPT，过载时暂缓自动化命令并推迟计划任务
+_health_settings = rcon_manager.health_settings
+health = HealthMonitor(fleet, event_bus,
+                       interval=float(_health_settings.get('interval', 30)),
+                       max_mspt=float(_health_settings.get('max_mspt', 45)),
+                       recover_mspt=float(_health_settings.get('recover_mspt', 40)),
+                       min_tps=float(_health_settings.get('min_tps', 18)),
+                       hold_timeout=float(_health_settings.get('hold_timeout', 60)),
+                       defer_base=float(_health_settings.get('defer_base', 60)),
+                       defer_max=float(_health_settings.get('defer_max', 900)))
+# 计划任务与玩家欢迎都在后台运行，与是否打开页面、打开了几个页面无关
+_jobs_settings = rcon_manager.jobs_settings
+job_engine = JobEngine(fleet, event_bus,
+                       db_path=os.path.join(_root, _jobs_settings.get('database', 'data/jobs.sqlite')),
+                       misfire_grace_time=int(_jobs_settings.get('misfire_grace_time', 60)),
+                       history_size=int(_jobs_settings.get('history_size', 200)),
+                       health=health)
+greeter = PlayerGreeter(event_bus, async_rcon, settings_path=os.path.join(_root, 'data', 'automation.json'))
+# 所有管理员共享的控制台缓冲区与历史
+_console_settings = rcon_manager.console_settings
+console = ConsoleService(fleet, event_bus,
+                         db_path=os.path.join(_root, _console_settings.get('database', 'data/console.sqlite')),
+                         buffer_size=int(_console_settings.get('buffer_size', 1000)),
+                         history_size=int(_console_settings.get('history_size', 200)),
+                         retention=int(_console_settings.get('retention', 100000)))
+# 每台服务器的在线人数、'list' 延迟与可用性历史，图表读取其中的分钟/小时/天汇总
+_history_settings = rcon_manager.history_settings
+history = TimeSeriesStore(db_path=os.path.join(_root, _history_settings.get('database', 'data/history.sqlite')),
+                          raw_capacity=int(_history_settings.get('raw_capacity', 4320)),
+                          raw_retention_days=float(_history_settings.get('raw_retention_days', 7)),
+                          minute_retention_days=float(_history_settings.get('minute_retention_days', 30)))
+for _server in fleet.servers.values():
+    _server.status_cache.add_listener(history.listener(_server.name, _server.status_cache))
+# 配置了服务器日志路径时，玩家事件来自日志，'list' 轮询只用于校正
+log_tailer = None
+if _logs_settings.get('path'):
+    log_tailer = LogTailer(os.path.join(_root, _logs_settings['path']), presence, event_bus,
+                           poll_interval=float(_logs_settings.get('poll_interval', 0.5)),
+                           use_inotify=bool(_logs_settings.get('inotify', True)))
+
+# 以 UUID 为键的玩家档案，页面按它解析与补全玩家名
+players = PlayerRegistry(event_bus,
+                         db_path=os.path.join(_root, _players_settings.get('database', 'data/players.sqlite')),
+                         server_dir=_server_dir,
+                         cache_size=int(_players_settings.get('cache_size', 1000)))
+
+metrics.STARTUP_SECONDS.set(time.perf_counter() - _started, phase='services')
+
+_installed = False
+_tasks = []
+
+
+def _collect_metrics():
+    """把每台服务器的连接池、状态缓存与命令队列的当前状态写入指标"""
+    for server in fleet.servers.values():
+        for mode, pool in (('sync', server.manager.pool), ('async', server.rcon.pool)):
+            if pool is None:
+                continue
+            for state, value in pool.stats().items():
+                metrics.POOL_CONNECTIONS.set(value, server=server.name, mode=mode, state=state)
+        metrics.CACHE_REQUESTS.set(server.status_cache.hits, server=server.name, result='hit')
+        metrics.CACHE_REQUESTS.set(server.status_cache.misses, server=server.name, result='miss')
+        if server.rcon.scheduler is not None:
+            for lane, stats in server.rcon.scheduler.lanes.items():
+                name = LANE_NAMES[lane]
+                metrics.QUEUE_DEPTH.set(stats.depth, server=server.name, lane=name)
+                metrics.QUEUE_EXECUTED.set(stats.executed, server=server.name, lane=name)
+                metrics.QUEUE_DEDUPLICATED.set(stats.deduplicated, server=server.name, lane=name)
+                metrics.QUEUE_WAIT.set(stats.wait_total, server=server.name, lane=name)
+    metrics.AUDIT_QUEUE.set(audit.depth)
+
+
+metrics.REGISTRY.add_collector(_collect_metrics)
+
+
+def install(app):
+    """向 NiceGUI 应用注册后台任务的启动与停止以及 /metrics 路由，重复调用无副作用"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    @app.get('/metrics', include_in_schema=False)
+    def metrics_endpoint():
+        return PlainTextResponse(metrics.REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+    @app.get('/api/items/search', include_in_schema=False)
+    def item_search_endpoint(q: str = '', limit: int = 20):
+        return item_index.search(q, max(1, min(limit, 100)))
+
+    @app.get('/api/history', include_in_schema=False)
+    def history_endpoint(server: str = rcon_manager.name, seconds: int = 86400):
+        resolution, points = history.history(server, max(60, seconds))
+        return {'server': server, 'resolution': resolution, 'points': points}
+
+    @app.get('/api/players/search', include_in_schema=False)
+    def player_search_endpoint(q: str = '', limit: int = 20):
+        return players.complete(q, max(1, min(limit, 100)))
+
+    async def start():
+        # 同步接口（RCONManager）与异步接口共用同一个命令队列和限速
+        loop = asyncio.get_running_loop()
+        for server in fleet.servers.values():
+            server.manager.attach_scheduler(server.rcon.scheduler, loop)
+        # 封禁列表在后台线程预热，不阻塞启动，也不让第一个用到它的页面等待
+        _tasks.append(asyncio.create_task(asyncio.to_thread(lambda: rcon_manager.ban_store)))
+        if log_tailer is not None:
+            _tasks.append(asyncio.create_task(log_tailer.run()))
+            status_interval = float(_logs_settings.get('status_interval', 60))
+        else:
+            status_interval = status_cache.ttl
+        _tasks.append(asyncio.create_task(presence.run(status_cache, status_interval)))
+        sync_interval = float(rcon_manager.ban_settings.get('sync_interval', 300))
+        if sync_interval > 0:
+            _tasks.append(asyncio.create_task(ban_reconciler.run(sync_interval)))
+        if _health_settings.get('enabled', True):
+            _tasks.append(asyncio.create_task(health.run()))
+        audit.open()
+        job_engine.start()
+        console.open()
+        history.open()
+        players.open()
+        _tasks.append(asyncio.create_task(history.run(fleet, float(_history_settings.get('sample_interval', 15)))))
+        elapsed = time.perf_counter() - _started
+        metrics.STARTUP_SECONDS.set(elapsed, phase='ready')
+        logging.info(f"面板启动完成，用时 {elapsed:.2f} 秒")
+
+    async def stop():
+        for task in _tasks:
+            task.cancel()
+        _tasks.clear()
+        await job_engine.shutdown()
+        await console.close()
+        history.close()
+        players.close()
+        await audit.close()
+        await fleet.close()
+        await async_rcon.close()
+        rcon_manager.close_ban_store()
+
+    app.on_startup(start)
+    app.on_shutdown(stop)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import time
+
+
+class ServerStatusCache:
+    """进程内共享的服务器状态缓存
+
+    所有页面读取同一份 ``list`` 快照：快照未超过 ``ttl`` 秒时直接返回，
+    过期后由第一个调用方发起刷新，刷新期间的并发调用方等待同一次请求（single-flight），
+    因此无论连接多少个浏览器标签页，RCON 负载都保持在每个 TTL 最多一次。
+    """
+
+    def __init__(self, fetch, ttl=5.0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.snapshot = None
+        self.updated_at = 0.0
+        # 最近一次刷新的耗时（秒），供状态历史记录 'list' 延迟
+        self.last_duration = None
+        self.hits = 0
+        self.misses = 0
+        self.listeners = []
+        self._refresh_task = None
+
+    def add_listener(self, callback):
+        """注册刷新回调 ``await callback(status)``，每次取得新快照后调用"""
+        self.listeners.append(callback)
+
+    def is_fresh(self, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        return self.snapshot is not None and time.monotonic() - self.updated_at < max_age
+
+    async def get(self, max_age=None):
+        """返回不早于 ``max_age``（默认 TTL）秒的状态快照"""
+        if self.is_fresh(max_age):
+            self.hits += 1
+            return self.snapshot
+        self.misses += 1
+        return await self.refresh()
+
+    async def refresh(self):
+        """强制刷新；已有刷新在进行时复用它"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+        # shield 保证某个调用方被取消时不会中断其他调用方共享的刷新
+        return await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh(self):
+        started = time.perf_counter()
+        status = await self.fetch()
+        self.last_duration = time.perf_counter() - started
+        self.snapshot = status
+        self.updated_at = time.monotonic()
+        for callback in self.listeners:
+            try:
+                await callback(status)
+            except Exception as e:
+                logging.error(f"状态刷新回调出错: {e}")
+        return status
+
+    def invalidate(self):
+        """使当前快照失效，下次读取时重新请求"""
+        self.updated_at = 0.0
@@ -0,0 +1,263 @@
+"""服务器状态的时间序列记录
+
+每次刷新 'list' 快照时记录一个样本：是否在线、在线人数、'list' 的往返耗时。样本同时
+累加进 1 分钟、1 小时、1 天三级汇总桶，图表只读取汇总，不需要扫描原始样本。
+
+内存中每个序列都是定长的环形缓冲区，每个字段一个 ``array('d')``，不为单条记录创建
+Python 对象；原始样本与汇总每分钟批量写入 SQLite，重启后从数据库恢复。
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+from array import array
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+# 各级汇总在内存中保留的桶数：1 天的分钟、90 天的小时、5 年的天
+CAPACITY = {MINUTE: 1440, HOUR: 2160, DAY: 1830}
+
+SAMPLE_FIELDS = ('at', 'online', 'players', 'latency')
+# latency_sum 与 latency_max 只统计在线的样本
+ROLLUP_FIELDS = ('start', 'count', 'online', 'players_sum', 'players_max', 'latency_sum', 'latency_max')
+
+# 两次写入数据库的最小间隔秒数
+FLUSH_INTERVAL = 60
+
+
+class ArrayRing:
+    """定长环形缓冲区，按字段分列保存为 ``array('d')``，第一个字段为时间且单调递增"""
+
+    def __init__(self, capacity, fields):
+        self.capacity = capacity
+        self.fields = fields
+        self.columns = [array('d', bytes(8 * capacity)) for _ in fields]
+        self.head = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _slot(self, index):
+        """第 ``index`` 条（从最早的一条算起）所在的位置"""
+        return (self.head - self.size + index) % self.capacity
+
+    def append(self, values):
+        for column, value in zip(self.columns, values):
+            column[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def last(self):
+        if not self.size:
+            return None
+        slot = (self.head - 1) % self.capacity
+        return [column[slot] for column in self.columns]
+
+    def replace_last(self, values):
+        slot = (self.head - 1) % self.capacity
+        for column, value in zip(self.columns, values):
+            column[slot] = value
+
+    def rows(self, since=None):
+        """按时间顺序返回记录，``since`` 给出时只返回时间不早于它的记录"""
+        times = self.columns[0]
+        low, high = 0, self.size
+        if since is not None:
+            # 时间单调递增，二分查找起点
+            while low < high:
+                mid = (low + high) // 2
+                if times[self._slot(mid)] < since:
+                    low = mid + 1
+                else:
+                    high = mid
+            high = self.size
+        return [tuple(column[self._slot(i)] for column in self.columns) for i in range(low, high)]
+
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in self.columns)
+
+
+def _fold(bucket, online, players, latency):
+    """把一个样本累加进汇总桶（列表，字段顺序同 ROLLUP_FIELDS）"""
+    bucket[1] += 1
+    bucket[3] += players
+    bucket[4] = max(bucket[4], players)
+    if online:
+        bucket[2] += 1
+        bucket[5] += latency
+        bucket[6] = max(bucket[6], latency)
+
+
+def rollup_point(row):
+    """把汇总桶转换为图表使用的数据点，延迟单位为毫秒"""
+    start, count, online, players_sum, players_max, latency_sum, latency_max = row
+    return {
+        'start': start,
+        'availability': online / count if count else 0.0,
+        'players_avg': players_sum / count if count else 0.0,
+        'players_max': int(players_max),
+        'latency_avg': latency_sum / online * 1000 if online else None,
+        'latency_max': latency_max * 1000 if online else None,
+    }
+
+
+class ServerSeries:
+    """一台服务器的原始样本与各级汇总"""
+
+    def __init__(self, raw_capacity):
+        self.raw = ArrayRing(raw_capacity, SAMPLE_FIELDS)
+        self.rollups = {resolution: ArrayRing(CAPACITY[resolution], ROLLUP_FIELDS) for resolution in RESOLUTIONS}
+
+
+class TimeSeriesStore:
+    """按服务器记录状态样本并维护三级汇总
+
+    ``raw_capacity`` 为内存中每台服务器保留的原始样本数；数据库中原始样本保留
+    ``raw_retention_days`` 天，分钟汇总保留 ``minute_retention_days`` 天，小时与天汇总一直保留。
+    """
+
+    def __init__(self, db_path='data/history.sqlite', raw_capacity=4320, raw_retention_days=7,
+                 minute_retention_days=30):
+        self.db_path = db_path
+        self.raw_capacity = raw_capacity
+        self.raw_retention_days = raw_retention_days
+        self.minute_retention_days = minute_retention_days
+        self.servers = {}
+        self._db = None
+        self._pending = []
+        # (服务器, 级别, 桶起点) -> 自上次写入以来有变化的汇总桶，桶在两次写入之间结束时也不会丢失
+        self._dirty = {}
+        self._flushed_at = time.time()
+
+    def _series(self, server):
+        series = self.servers.get(server)
+        if series is None:
+            series = self.servers[server] = ServerSeries(self.raw_capacity)
+        return series
+
+    # --- 生命周期 ---
+
+    def open(self):
+        """打开数据库并把最近的样本与汇总载入内存"""
+        self._db = sqlite3.connect(self.db_path)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS samples ('
+            'server TEXT, at REAL, online INTEGER, players INTEGER, latency REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS samples_server_at ON samples (server, at)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS rollups ('
+            'server TEXT, resolution INTEGER, start REAL, count INTEGER, online INTEGER, '
+            'players_sum REAL, players_max REAL, latency_sum REAL, latency_max REAL, '
+            'PRIMARY KEY (server, resolution, start)) WITHOUT ROWID')
+        self._db.commit()
+        for (server,) in self._db.execute('SELECT DISTINCT server FROM rollups').fetchall():
+            series = self._series(server)
+            for resolution in RESOLUTIONS:
+                rows = self._db.execute(
+                    'SELECT start, count, online, players_sum, players_max, latency_sum, latency_max '
+                    'FROM rollups WHERE server = ? AND resolution = ? ORDER BY start DESC LIMIT ?',
+                    (server, resolution, CAPACITY[resolution])).fetchall()
+                for row in reversed(rows):
+                    series.rollups[resolution].append(row)
+            rows = self._db.execute(
+                'SELECT at, online, players, latency FROM samples WHERE server = ? ORDER BY at DESC LIMIT ?',
+                (server, self.raw_capacity)).fetchall()
+            for row in reversed(rows):
+                series.raw.append(row)
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    # --- 写入 ---
+
+    def record(self, server, online, players, latency, at=None):
+        """记录一个样本，并累加进各级汇总中它所在的桶"""
+        at = time.time() if at is None else at
+        series = self._series(server)
+        series.raw.append((at, online, players, latency))
+        for resolution, ring in series.rollups.items():
+            start = at - at % resolution
+            bucket = ring.last()
+            if bucket is not None and bucket[0] == start:
+                _fold(bucket, online, players, latency)
+                ring.replace_last(bucket)
+            else:
+                bucket = [start, 0, 0, 0.0, 0.0, 0.0, 0.0]
+                _fold(bucket, online, players, latency)
+                ring.append(bucket)
+            self._dirty[(server, resolution, start)] = tuple(bucket)
+        self._pending.append((server, at, int(online), players, latency))
+        self.flush_if_due()
+
+    def flush(self):
+        """把新样本与有变化的汇总桶批量写入数据库"""
+        self._flushed_at = time.time()
+        if self._db is None or not (self._pending or self._dirty):
+            return
+        rollups = [(server, resolution, *bucket) for (server, resolution, _), bucket in self._dirty.items()]
+        try:
+            with self._db:
+                self._db.executemany('INSERT INTO samples VALUES (?, ?, ?, ?, ?)', self._pending)
+                self._db.executemany('INSERT OR REPLACE INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rollups)
+                now = time.time()
+                self._db.execute('DELETE FROM samples WHERE at < ?', (now - self.raw_retention_days * DAY,))
+                self._db.execute('DELETE FROM rollups WHERE resolution = ? AND start < ?',
+                                 (MINUTE, now - self.minute_retention_days * DAY))
+        except sqlite3.Error as e:
+            logging.error(f"无法写入状态历史: {e}")
+            return
+        self._pending.clear()
+        self._dirty.clear()
+
+    def listener(self, server, cache):
+        """返回可注册到 ServerStatusCache 的回调，记录每次刷新的快照与耗时"""
+        async def record_status(status):
+            self.record(server, bool(status.get('online')), int(status.get('player_count', 0)),
+                        cache.last_duration or 0.0)
+        return record_status
+
+    async def run(self, fleet, interval=15.0):
+        """定期刷新集群中每台服务器的状态快照，保证没有页面打开时也持续采样
+
+        样本由注册在各服务器状态缓存上的回调记录，页面触发的刷新同样会被记录；
+        快照不早于 ``interval`` 秒时不会重复请求。
+        """
+        while True:
+            try:
+                await fleet.statuses(max_age=interval)
+            except Exception as e:
+                logging.error(f"状态采样失败: {e}")
+            self.flush_if_due()
+            await asyncio.sleep(interval)
+
+    def flush_if_due(self):
+        if time.time() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    # --- 读取 ---
+
+    def series(self, server, resolution, since=None):
+        """某一级汇总中不早于 ``since`` 的数据点，按时间顺序"""
+        series = self.servers.get(server)
+        if series is None:
+            return []
+        return [rollup_point(row) for row in series.rollups[resolution].rows(since)]
+
+    def history(self, server, seconds):
+        """最近 ``seconds`` 秒的数据，自动选择能覆盖该范围且点数适中的汇总级别"""
+        if seconds <= DAY:
+            resolution = MINUTE
+        elif seconds <= 90 * DAY:
+            resolution = HOUR
+        else:
+            resolution = DAY
+        return resolution, self.series(server, resolution, time.time() - seconds)
+
+    def memory_usage(self):
+        """内存中所有环形缓冲区占用的字节数"""
+        return sum(series.raw.nbytes() + sum(ring.nbytes() for ring in series.rollups.values())
+                   for series in self.servers.values())
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+
+from mcrcon_new.command_queue import AUTOMATION
+from mcrcon_new.presence import PlayerJoined, PlayerLeft, PlayerDied, AdvancementMade
+
+DEFAULT_MESSAGES = ['欢迎来到服务器!', '请遵守服务器规则，享受游戏！']
+
+
+class PlayerGreeter:
+    """后台玩家监控：记录进出服务器的玩家，并向新加入的玩家发送欢迎消息
+
+    只在进程内订阅一次事件总线，开关与欢迎消息保存在 ``settings_path`` 中，
+    重启后保持不变，也不会因为多个管理员同时打开页面而重复发送。
+    """
+
+    def __init__(self, bus, async_rcon, settings_path='data/automation.json', log_size=100):
+        self.async_rcon = async_rcon
+        self.settings_path = settings_path
+        self.enabled = False
+        self.messages = list(DEFAULT_MESSAGES)
+        # (时间, 文本)，供页面显示最近的监控记录
+        self.log = deque(maxlen=log_size)
+        # 正在发送的欢迎消息，保存引用以免任务被回收
+        self._sending = set()
+        self._load()
+        bus.subscribe(PlayerJoined, self._on_joined)
+        bus.subscribe(PlayerLeft, self._on_left)
+        # 以下事件只在跟踪服务器日志时产生
+        bus.subscribe(PlayerDied, self._on_died)
+        bus.subscribe(AdvancementMade, self._on_advancement)
+
+    def _load(self):
+        try:
+            with open(self.settings_path, 'r', encoding='utf-8') as f:
+                data = json.load(f).get('welcome', {})
+            self.enabled = bool(data.get('enabled', False))
+            self.messages = list(data.get('messages', DEFAULT_MESSAGES))
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, AttributeError) as e:
+            logging.error(f"自动化设置文件格式错误，使用默认设置: {e}")
+
+    def _save(self):
+        try:
+            with open(self.settings_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        data['welcome'] = {'enabled': self.enabled, 'messages': self.messages}
+        tmp_path = self.settings_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.settings_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.settings_path)
+        except IOError as e:
+            logging.error(f"无法保存自动化设置: {e}")
+
+    def configure(self, enabled=None, messages=None):
+        """修改开关或欢迎消息并立即保存"""
+        if enabled is not None and enabled != self.enabled:
+            self.enabled = enabled
+            self.log.append((time.time(), '玩家监控已启动...' if enabled else '玩家监控已停止。'))
+        if messages is not None:
+            self.messages = [m for m in messages if m.strip()]
+        self._save()
+
+    def _on_joined(self, event):
+        if not self.enabled:
+            return
+        self.log.append((event.at, f'玩家 {event.name} 加入了服务器。'))
+        if self.messages:
+            # 所有欢迎消息在同一连接上流水线发送；在后台执行，不阻塞事件分发
+            task = asyncio.create_task(self.async_rcon.command_many(
+                (f'tell {event.name} {msg}' for msg in self.messages), priority=AUTOMATION))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    def _on_left(self, event):
+        if self.enabled:
+            self.log.append((event.at, f'玩家 {event.name} 离开了服务器。'))
+
+    def _on_died(self, event):
+        if self.enabled:
+            self.log.append((event.at, f'{event.message}。'))
+
+    def _on_advancement(self, event):
+        if self.enabled:
+            self.log.append((event.at, f'玩家 {event.name} 取得了进度 [{event.advancement}]。'))
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from mcrcon_new.async_rcon import AsyncRCONClient, AsyncRCONManager, AsyncRCONPool
+from mcrcon_new.fake_server import ERROR_RESPONSE, FakeRCONServer
+from mcrcon_new.rcon_manager import RCONManager
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_client(server, **kwargs):
+    return AsyncRCONClient('127.0.0.1', server.port, server.password, timeout=2, **kwargs)
+
+
+def test_timed_out_request_forgets_its_sentinel():
+    async def scenario():
+        async with FakeRCONServer(latency=0.2) as server:
+            client = make_client(server)
+            await client.connect()
+            with pytest.raises(asyncio.TimeoutError):
+                await client.command('list', timeout=0.05)
+            results = await client.command_many(['list', 'list'], timeout=0.05)
+            assert all(isinstance(r, asyncio.TimeoutError) for r in results)
+            assert client._pending == {} and client._sentinels == {}
+            await client.close()
+    run(scenario())
+
+
+def test_command_many_respects_pipeline_depth():
+    async def scenario():
+        async with FakeRCONServer(latency=0.02) as server:
+            client = make_client(server, pipeline_depth=4)
+            await client.connect()
+            peak = 0
+
+            async def watch():
+                nonlocal peak
+                while True:
+                    peak = max(peak, client.in_flight)
+                    await asyncio.sleep(0)
+
+            watcher = asyncio.create_task(watch())
+            results = await asyncio.gather(client.command_many(['list'] * 6),
+                                           client.command_many(['list'] * 6),
+                                           client.command('list'))
+            watcher.cancel()
+            assert len(results[0]) == len(results[1]) == 6
+            assert peak <= 4
+            await client.close()
+    run(scenario())
+
+
+def test_pipeline_request_errors_keep_shared_connection():
+    async def scenario():
+        async with FakeRCONServer(latency=0.1) as server:
+            pool = AsyncRCONPool(lambda: make_client(server), size=1, pipeline=True)
+            slow = asyncio.create_task(pool.run(lambda client: client.command('list', timeout=1)))
+            await asyncio.sleep(0.01)
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.run(lambda client: client.command('list', timeout=0.05))
+
+            async def failing(client):
+                raise ConnectionResetError('本调用方自己的错误')
+
+            with pytest.raises(ConnectionResetError):
+                await pool.run(failing)
+            assert (await slow).startswith('There are')
+            assert server.connections == 1
+            await pool.close()
+    run(scenario())
+
+
+def test_rejected_ban_is_not_recorded(tmp_path):
+    async def scenario():
+        async with FakeRCONServer(responses={'ban Herobrine': ERROR_RESPONSE}) as server:
+            manager = RCONManager(ban_file_path=str(tmp_path / 'banned_players.json'))
+            manager.host, manager.port, manager.password = '127.0.0.1', server.port, server.password
+            rcon = AsyncRCONManager(manager)
+            await rcon.ban_player('Herobrine')
+            await rcon.ban_player('Steve', 'griefing')
+            assert manager.get_ban_entry('Herobrine') is None
+            assert manager.get_ban_entry('Steve') is not None
+            await rcon.pardon_target('Alex')
+            await rcon.close()
+            await asyncio.to_thread(manager.ban_player, 'Herobrine')
+            assert manager.get_ban_entry('Herobrine') is None
+            manager.disconnect()
+            manager.close_ban_store()
+    run(scenario())
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from mcrcon_new.ban_sync import BanReconciler, BansChanged
+from mcrcon_new.parsers import parse_banlist
+from mcrcon_new.presence import EventBus
+from mcrcon_new.rcon_manager import BatchReport, RCONManager, make_result
+
+
+class FakeRCON:
+    """返回固定 banlist 输出并记录推送的命令"""
+
+    def __init__(self, players_text, ips_text='There are no bans'):
+        self.players_text = players_text
+        self.ips_text = ips_text
+        self.sent = []
+
+    async def get_server_ban_list(self, priority=None):
+        return {'players': parse_banlist(self.players_text), 'ips': parse_banlist(self.ips_text)}
+
+    async def batch(self, commands, priority=None):
+        self.sent.extend(commands)
+        return BatchReport([make_result(c, 'ok') for c in commands])
+
+
+def make_reconciler(tmp_path, rcon, server_dir=None, bus=None):
+    manager = RCONManager(ban_file_path=str(tmp_path / 'banned_players.json'))
+    return manager, BanReconciler(rcon, manager, server_dir=server_dir, bus=bus)
+
+
+def test_ambiguous_banlist_neither_pulls_nor_removes(tmp_path):
+    rcon = FakeRCON('There are 2 ban(s):Alice was banned by Server: griefingBob was banned by Server: x')
+    manager, reconciler = make_reconciler(tmp_path, rcon)
+    manager.record_ban('Bob', 'x')
+    reconciler.baseline['player'] = {'Alice', 'Bob'}
+    manager.record_ban('Alice', 'griefing')
+
+    result = asyncio.run(reconciler.reconcile())
+    assert result['pulled'] == 0 and result['removed'] == 0
+    assert manager.get_ban_entry('Bob') is not None
+    assert manager.get_ban_entry('griefingBob') is None
+    manager.close_ban_store()
+
+
+def test_ban_files_are_preferred_over_banlist(tmp_path):
+    (tmp_path / 'banned-players.json').write_text(json.dumps([
+        {'uuid': '069a79f4-44e9-4726-a5be-fca90e38aaf5', 'name': 'Griefer', 'source': 'Server',
+         'created': '2026-01-01 00:00:00 +0000', 'expires': 'forever', 'reason': 'spam'}]))
+    (tmp_path / 'banned-ips.json').write_text('[]')
+    rcon = FakeRCON('There are 2 ban(s):Alice was banned by Server: griefingBob was banned by Server: x')
+    manager, reconciler = make_reconciler(tmp_path, rcon, server_dir=str(tmp_path))
+
+    result = asyncio.run(reconciler.reconcile())
+    assert result['pulled'] == 1
+    assert manager.get_ban_entry('Griefer').reason == 'spam'
+    assert manager.get_ban_entry('griefingBob') is None
+    manager.close_ban_store()
+
+
+def test_pulled_bans_are_published(tmp_path):
+    bus = EventBus()
+    events = []
+    bus.subscribe(BansChanged, events.append)
+    rcon = FakeRCON('There are 1 ban(s):\nGriefer was banned by Server: spam')
+    manager, reconciler = make_reconciler(tmp_path, rcon, bus=bus)
+
+    asyncio.run(reconciler.reconcile())
+    assert len(events) == 1
+    # 没有变化时不发布
+    asyncio.run(reconciler.reconcile())
+    assert len(events) == 1
+    manager.close_ban_store()
@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import pytest
+
+from mcrcon_new.command_queue import CommandScheduler, CommandDeferred, INTERACTIVE, AUTOMATION, POLLING
+from mcrcon_new.rcon_manager import RCONManager
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class CountingBucket:
+    """记录取走的令牌数，不限速"""
+
+    def __init__(self):
+        self.taken = 0
+
+    async def acquire(self, count=1):
+        self.taken += count
+
+
+async def blocked(scheduler):
+    """让唯一的工作协程卡在一个交互命令上，返回放行用的 Event 和该命令的任务"""
+    gate = asyncio.Event()
+    task = asyncio.create_task(scheduler.submit(gate.wait, INTERACTIVE))
+    await asyncio.sleep(0.01)
+    return gate, task
+
+
+def test_held_lane_fails_after_timeout_while_interactive_runs():
+    async def scenario():
+        scheduler = CommandScheduler(rate=0, workers=1)
+        scheduler.hold((AUTOMATION,), timeout=0.05)
+
+        async def answer(value):
+            return value
+
+        automation = asyncio.create_task(scheduler.submit(lambda: answer('auto'), AUTOMATION))
+        assert await scheduler.submit(lambda: answer('manual'), INTERACTIVE) == 'manual'
+        with pytest.raises(CommandDeferred):
+            await asyncio.wait_for(automation, 1)
+        assert scheduler.lanes[AUTOMATION].depth == 0
+        await scheduler.close()
+    run(scenario())
+
+
+def test_release_runs_parked_jobs():
+    async def scenario():
+        scheduler = CommandScheduler(rate=0, workers=1)
+        scheduler.hold((AUTOMATION,), timeout=5)
+
+        async def answer():
+            return 'done'
+
+        task = asyncio.create_task(scheduler.submit(answer, AUTOMATION))
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        scheduler.release()
+        assert await asyncio.wait_for(task, 1) == 'done'
+        await scheduler.close()
+    run(scenario())
+
+
+def test_duplicate_jobs_run_once():
+    async def scenario():
+        scheduler = CommandScheduler(rate=0, workers=1)
+        gate, first = await blocked(scheduler)
+        calls = []
+
+        async def answer():
+            calls.append(1)
+            return 'ok'
+
+        waiters = [asyncio.create_task(scheduler.submit(answer, AUTOMATION, key='list')) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        gate.set()
+        assert await asyncio.gather(*waiters) == ['ok'] * 3
+        await first
+        assert calls == [1]
+        assert scheduler.lanes[AUTOMATION].deduplicated == 2
+        await scheduler.close()
+    run(scenario())
+
+
+def test_promoted_job_runs_once_and_takes_one_token():
+    async def scenario():
+        scheduler = CommandScheduler(rate=0, workers=1)
+        scheduler.bucket = CountingBucket()
+        gate, first = await blocked(scheduler)
+        calls = []
+
+        async def answer():
+            calls.append(1)
+            return 'ok'
+
+        polling = asyncio.create_task(scheduler.submit(answer, POLLING, key='list'))
+        await asyncio.sleep(0)
+        automation = asyncio.create_task(scheduler.submit(answer, AUTOMATION, key='list'))
+        await asyncio.sleep(0.01)
+        gate.set()
+        assert await asyncio.gather(polling, automation) == ['ok', 'ok']
+        await first
+        await asyncio.sleep(0.01)
+        assert calls == [1]
+        assert scheduler.bucket.taken == 2
+        assert scheduler._heap == []
+        assert scheduler.lanes[POLLING].depth == 0 and scheduler.lanes[AUTOMATION].depth == 0
+        await scheduler.close()
+    run(scenario())
+
+
+def test_cancelled_job_takes_no_token():
+    async def scenario():
+        scheduler = CommandScheduler(rate=0, workers=1)
+        scheduler.bucket = CountingBucket()
+        gate, first = await blocked(scheduler)
+
+        async def answer():
+            return 'ok'
+
+        abandoned = asyncio.create_task(scheduler.submit(answer, AUTOMATION))
+        await asyncio.sleep(0.01)
+        abandoned.cancel()
+        await asyncio.sleep(0.01)
+        gate.set()
+        await first
+        assert await scheduler.submit(answer, AUTOMATION) == 'ok'
+        assert scheduler.bucket.taken == 2
+        await scheduler.close()
+    run(scenario())
+
+
+def test_sync_manager_commands_go_through_scheduler():
+    class Pool:
+        def run(self, func, retries=None):
+            return 'There are 0 of a max of 20 players online: '
+
+    async def scenario():
+        scheduler = CommandScheduler(rate=0, workers=1)
+        manager = RCONManager()
+        manager.pool = Pool()
+        manager.attach_scheduler(scheduler, asyncio.get_running_loop())
+        response = await asyncio.to_thread(manager.command, 'list')
+        assert response.startswith('There are 0')
+        status = await asyncio.to_thread(manager.get_server_status)
+        assert status['player_count'] == 0
+        assert scheduler.lanes[INTERACTIVE].executed == 1
+        assert scheduler.lanes[POLLING].executed == 1
+        await scheduler.close()
+    run(scenario())
+
+
+def test_interactive_job_is_not_stuck_behind_large_batch():
+    async def scenario():
+        scheduler = CommandScheduler(rate=50, burst=1, workers=2)
+
+        async def answer(value):
+            return value
+
+        # 100 个令牌按每秒 50 个补充，整批约需 2 秒
+        batch = asyncio.create_task(scheduler.submit(lambda: answer('batch'), AUTOMATION, cost=100))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        assert await scheduler.submit(lambda: answer('manual'), INTERACTIVE) == 'manual'
+        assert time.monotonic() - started < 0.5
+        assert not batch.done()
+        batch.cancel()
+        await scheduler.close()
+    run(scenario())
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from mcrcon_new.console import COMMAND, RESPONSE, ConsoleService
+from mcrcon_new.presence import EventBus
+
+
+class EchoRCON:
+    async def command(self, command, priority=None):
+        return f'echo {command}'
+
+
+def make_console(tmp_path):
+    fleet = SimpleNamespace(servers={'main': SimpleNamespace(rcon=EchoRCON())})
+    console = ConsoleService(fleet, EventBus(), db_path=str(tmp_path / 'console.sqlite'))
+    console.open()
+    return console
+
+
+def test_history_is_written_off_the_event_loop(tmp_path):
+    async def scenario():
+        console = make_console(tmp_path)
+        loop_thread = threading.get_ident()
+        write = console._writer._write
+        threads = []
+
+        def recording_write(batch):
+            threads.append(threading.get_ident())
+            write(batch)
+        console._writer._write = recording_write
+
+        await console.execute('main', 'list')
+        await console.execute('main', 'seed')
+        await console.close()
+        assert threads and loop_thread not in threads
+    asyncio.run(scenario())
+
+    # 重新打开后记录仍在，序号接着已有的记录分配
+    async def reopen():
+        console = make_console(tmp_path)
+        assert [(e.kind, e.text) for e in console.tail('main')] == [
+            (COMMAND, 'list'), (RESPONSE, 'echo list'), (COMMAND, 'seed'), (RESPONSE, 'echo seed')]
+        assert [e.text for e in console.search('main', 'seed')] == ['echo seed', 'seed']
+        await console.execute('main', 'help')
+        assert [e.seq for e in console.tail('main')] == [1, 2, 3, 4, 5, 6]
+        await console.close()
+    asyncio.run(reopen())
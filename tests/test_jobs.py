@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+from mcrcon_new.jobs import JobEngine, make_trigger, retry_job_id
+from mcrcon_new.presence import EventBus
+
+
+class Overloaded:
+    """始终过载的健康监测替身"""
+
+    def is_overloaded(self, server):
+        return True
+
+    def backoff(self, attempts):
+        return 60 * 2 ** attempts
+
+    def state(self, server):
+        return SimpleNamespace(stats=None)
+
+
+def test_deferral_keeps_interval_schedule(tmp_path):
+    async def scenario():
+        fleet = SimpleNamespace(servers={'main': None})
+        engine = JobEngine(fleet, EventBus(), db_path=str(tmp_path / 'jobs.sqlite'), health=Overloaded())
+        engine.start()
+        job = engine.add_job('command', 'main', make_trigger('interval', minutes=30), {'commands': ['say hi']})
+        next_run = engine.scheduler.get_job(job.id).next_run_time
+
+        await engine.run_scheduled('command', 'main', {'commands': ['say hi']})
+        # 原计划不变，另有一个一次性重试任务，且不出现在任务列表中
+        assert engine.scheduler.get_job(job.id).next_run_time == next_run
+        retry = engine.scheduler.get_job(retry_job_id(job.id))
+        assert retry is not None and retry.next_run_time < next_run
+        assert [j['id'] for j in engine.jobs()] == [job.id]
+
+        engine.remove_job(job.id)
+        assert engine.scheduler.get_job(retry_job_id(job.id)) is None
+        await engine.shutdown()
+    asyncio.run(scenario())
@@ -0,0 +1,20 @@
+from mcrcon_new import metrics
+
+
+def test_command_label_is_bounded():
+    assert metrics.command_label('give @a diamond 64') == 'give'
+    assert metrics.command_label('/Say hi') == 'say'
+    assert metrics.command_label('tps') == 'tps'
+    # 任意输入的首个单词不会成为新的标签值
+    assert metrics.command_label('asdkjh123 foo') == 'other'
+    assert metrics.command_label('  ') == ''
+
+
+def test_totals_across_servers():
+    gauge = metrics.Gauge('test_pool', '', ('server', 'mode', 'state'))
+    gauge.set(2, server='main', mode='async', state='size')
+    gauge.set(3, server='lobby', mode='async', state='size')
+    gauge.set(5, server='main', mode='sync', state='size')
+    assert gauge.total(mode='async', state='size') == 5
+    assert gauge.total(server='main') == 7
+    assert gauge.total() == 10
@@ -0,0 +1,140 @@
+import pytest
+
+from mcrcon_new.fake_server import FakeRCONServer
+from mcrcon_new.parsers import (
+    PAPER, ESSENTIALS, VANILLA, ResponseParser, is_failed_response, parse_banlist, parse_execute_count,
+    parse_forge_tps, parse_kill_count, parse_paper_tps, parse_tick_query, parse_whitelist,
+)
+from mcrcon_new.rcon_manager import make_result
+
+
+@pytest.fixture
+def server():
+    """只调用命令处理逻辑，不启动网络服务"""
+    return FakeRCONServer(players=['Steve', 'Alex'])
+
+
+# --- 封禁 ---
+
+def test_ban_and_pardon_succeed(server):
+    for command in ('ban Griefer spamming', 'pardon Griefer'):
+        assert not is_failed_response(server._run(command), VANILLA, command)
+
+
+@pytest.mark.parametrize('command', ['ban Griefer', 'ban-ip 10.0.0.1', 'pardon Griefer', 'pardon-ip 10.0.0.1'])
+def test_nothing_changed_is_success_for_ban_and_pardon(server, command):
+    if command.startswith('pardon'):
+        response = server._run(command)
+    else:
+        server._run(command)
+        response = server._run(command)
+    assert response.startswith('Nothing changed')
+    assert not is_failed_response(response, VANILLA, command)
+    assert make_result(command, response, flavor=VANILLA).ok
+
+
+def test_nothing_changed_is_still_a_failure_for_other_commands():
+    assert is_failed_response('Nothing changed. That gamerule is already set to true', VANILLA,
+                              'gamerule keepInventory true')
+    assert is_failed_response("Nothing changed. The player isn't banned", VANILLA)
+
+
+def test_parse_banlist(server):
+    assert parse_banlist(server._run('banlist players')) == []
+    server._run('ban Griefer spamming')
+    server._run('ban Cheater')
+    records = parse_banlist(server._run('banlist players'))
+    assert [(r.target, r.reason) for r in records] == [('Griefer', 'spamming'), ('Cheater', 'Banned by an operator.')]
+
+
+def test_parse_banlist_without_newlines():
+    text = 'There are 2 bans:Steve was banned by Server: griefing.Alex was banned by Admin: spam'
+    records = parse_banlist(text)
+    assert [r[:3] for r in records] == [('Steve', 'Server', 'griefing.'), ('Alex', 'Admin', 'spam')]
+    assert not any(r.exact for r in records)
+
+
+def test_parse_banlist_without_newlines_marks_ambiguous_boundaries():
+    text = 'There are 2 ban(s):Alice was banned by Server: griefingBob was banned by Server: x'
+    records = parse_banlist(text)
+    # 原因与下一个名字连在一起，切分结果不可信
+    assert [r.target for r in records] == ['Alice', 'griefingBob']
+    assert not any(r.exact for r in records)
+
+
+def test_parse_banlist_rejects_panel_errors():
+    assert parse_banlist('命令执行失败: 超时') is None
+
+
+# --- 白名单 ---
+
+def test_whitelist_add_remove(server):
+    assert parse_whitelist(server._run('whitelist list')).players == []
+    assert not is_failed_response(server._run('whitelist add Steve'), VANILLA, 'whitelist add Steve')
+    assert is_failed_response(server._run('whitelist add Steve'), VANILLA, 'whitelist add Steve')
+    server._run('whitelist add Alex')
+    assert parse_whitelist(server._run('whitelist list')).players == ['Steve', 'Alex']
+    assert not is_failed_response(server._run('whitelist remove Alex'), VANILLA)
+    assert is_failed_response(server._run('whitelist remove Alex'), VANILLA)
+
+
+def test_parse_legacy_whitelist():
+    assert parse_whitelist('There are 2 (out of 3 seen) whitelisted players:\nA, B').players == ['A', 'B']
+
+
+# --- 清理掉落物 ---
+
+def test_clear_items(server):
+    server.dropped_items = {'overworld': 120, 'the_nether': 30}
+    assert parse_execute_count(server._run('execute if entity @e[type=item]')) == 150
+    assert parse_execute_count(
+        server._run('execute in minecraft:the_nether if entity @e[type=item,distance=0..]')) == 30
+    assert parse_kill_count(server._run('execute in minecraft:overworld run kill @e[type=item,distance=0..]')) == 120
+    assert parse_kill_count(server._run('kill @e[type=item]')) == 30
+    response = server._run('kill @e[type=item]')
+    assert parse_kill_count(response) == 0
+    assert parse_execute_count(server._run('execute if entity @e[type=item]')) == 0
+
+
+def test_kill_single_entity():
+    assert parse_kill_count('Killed Item') == 1
+    assert parse_kill_count('命令执行失败: 超时') is None
+
+
+# --- 列表、失败判断与 TPS ---
+
+def test_parse_list(server):
+    parser = ResponseParser(VANILLA)
+    result = parser.parse_list(server._run('list'))
+    assert result.online and result.count == 2 and result.players == ['Steve', 'Alex']
+
+
+def test_unknown_command_is_failure(server):
+    assert is_failed_response(server._run('bogus'), VANILLA)
+    assert is_failed_response('Unknown command. Type "/help" for help.', PAPER)
+    assert is_failed_response('Error: Player not found.', ESSENTIALS)
+    assert not is_failed_response('Error: something', VANILLA)
+
+
+def test_tick_query(server):
+    server.mspt = 62.5
+    stats = parse_tick_query(server._run('tick query'))
+    assert stats.mspt == 62.5 and stats.tps == pytest.approx(16.0)
+
+
+def test_paper_tps():
+    stats = parse_paper_tps('§6TPS from last 1m, 5m, 15m: §a*20.0, §a19.97, §a19.99',
+                            '§6Server tick times §e(§7avg§e/§7min§e/§7max§e)§6 from last 5s§7,§6 10s§7,§6 1m§e:\n'
+                            '§6◴ §a2.1§7/§a1.0§7/§a5.3§e, §a2.2§7/§a1.0§7/§a6.0§e, §a2.3§7/§a0.9§7/§a9.1')
+    assert stats.tps == 20.0 and stats.mspt == 2.1
+    assert parse_paper_tps('TPS from last 1m, 5m, 15m: 18.5, 19.0, 19.5').mspt is None
+
+
+def test_forge_tps():
+    text = ('minecraft:overworld: Mean tick time: 12.000 ms. Mean TPS: 20.000\n'
+            'minecraft:the_nether: Mean tick time: 1.000 ms. Mean TPS: 20.000\n'
+            'Overall: Mean tick time: 55.000 ms. Mean TPS: 18.182')
+    stats = parse_forge_tps(text)
+    assert stats.mspt == 55.0 and stats.tps == 18.182
+    stats = parse_forge_tps('Overall: 20.000 TPS (1.234 ms/tick)')
+    assert stats.mspt == 1.234 and stats.tps == 20.0
@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+from mcrcon_new.players import PlayerRegistry, offline_uuid
+from mcrcon_new.presence import EventBus, PlayerJoined, PlayersChanged
+
+STEVE = '069a79f4-44e9-4726-a5be-fca90e38aaf5'
+
+
+def make_registry(tmp_path):
+    bus = EventBus()
+    registry = PlayerRegistry(bus, db_path=str(tmp_path / 'players.sqlite'), server_dir=str(tmp_path))
+    registry.open()
+    return bus, registry
+
+
+def test_new_player_in_usercache_is_resolved_on_join(tmp_path):
+    bus, registry = make_registry(tmp_path)
+    # 启动后才写入 usercache.json 的玩家，加入时在线程中读取文件得到真实 UUID
+    (tmp_path / 'usercache.json').write_text(json.dumps([{'name': 'Steve', 'uuid': STEVE}]))
+    asyncio.run(bus.publish(PlayerJoined('Steve', 100.0)))
+    assert registry.resolve('steve') == STEVE
+    assert STEVE in registry.online and offline_uuid('Steve') not in registry.online
+    registry.close()
+
+
+def test_online_names_follow_renames(tmp_path):
+    bus, registry = make_registry(tmp_path)
+    asyncio.run(bus.publish(PlayersChanged(('Alex', 'Steve'), 100.0)))
+    assert registry.online_names() == ['Alex', 'Steve']
+    registry.identify('Steve2', offline_uuid('Steve'))
+    assert registry.online_names() == ['Alex', 'Steve2']
+    asyncio.run(bus.publish(PlayersChanged(('Alex',), 160.0)))
+    assert registry.online_names() == ['Alex']
+    assert registry.profile('Steve2').playtime == 60.0
+    registry.close()
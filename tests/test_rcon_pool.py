@@ -0,0 +1,165 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from mcrcon_new.async_rcon import AsyncRCONClient
+from mcrcon_new.rcon_manager import RCONManager
+from mcrcon_new.rcon_pool import RCONConnectionPool
+from mcrcon_new.rcon_protocol import (
+    LENGTH, SERVERDATA_AUTH_RESPONSE, SERVERDATA_RESPONSE_VALUE, RCONConnection, RCONConnectionClosed,
+    decode_packet, encode_packet,
+)
+
+
+class ScriptedServer:
+    """最小的 RCON 服务端：完成验证后按 ``behaviour`` 处理每条连接上的第一条命令
+
+    'answer' 正常响应；'close' 收到命令后不响应直接断开；'idle_close' 验证后立即断开。
+    """
+
+    def __init__(self, behaviours):
+        self.behaviours = list(behaviours)
+        self.received = []
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _read_packet(self, conn):
+        header = conn.recv(LENGTH.size, socket.MSG_WAITALL)
+        if len(header) < LENGTH.size:
+            return None
+        (length,) = LENGTH.unpack(header)
+        return decode_packet(conn.recv(length, socket.MSG_WAITALL))
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            behaviour = self.behaviours.pop(0) if self.behaviours else 'answer'
+            with conn:
+                request_id, _, _ = self._read_packet(conn)
+                conn.sendall(encode_packet(request_id, SERVERDATA_AUTH_RESPONSE, ''))
+                if behaviour == 'idle_close':
+                    continue
+                while True:
+                    packet = self._read_packet(conn)
+                    if packet is None:
+                        break
+                    in_id, in_type, payload = packet
+                    if in_type != SERVERDATA_RESPONSE_VALUE:
+                        self.received.append(payload)
+                        if behaviour == 'close':
+                            break
+                    conn.sendall(encode_packet(in_id, SERVERDATA_RESPONSE_VALUE, f'ok {payload}'))
+
+    def close(self):
+        self.sock.close()
+
+
+class OnePacketServer:
+    """模拟每次 recv 只处理第一个包、丢弃同一次读到的其余数据的原版服务端
+
+    'long' 命令的响应拆成两个包，其他命令回复 "ok <命令>"。
+    """
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    return
+                (length,) = LENGTH.unpack_from(data)
+                in_id, in_type, payload = decode_packet(data[LENGTH.size:LENGTH.size + length])
+                if in_type == 3:
+                    conn.sendall(encode_packet(in_id, SERVERDATA_AUTH_RESPONSE, ''))
+                elif in_type == SERVERDATA_RESPONSE_VALUE:
+                    conn.sendall(encode_packet(in_id, SERVERDATA_RESPONSE_VALUE, 'Unknown request 0'))
+                elif payload == 'long':
+                    conn.sendall(encode_packet(in_id, SERVERDATA_RESPONSE_VALUE, 'a' * 4096)
+                                 + encode_packet(in_id, SERVERDATA_RESPONSE_VALUE, 'b'))
+                else:
+                    conn.sendall(encode_packet(in_id, SERVERDATA_RESPONSE_VALUE, f'ok {payload}'))
+
+    def close(self):
+        self.sock.close()
+
+
+def make_pool(server):
+    return RCONConnectionPool(lambda: RCONConnection('127.0.0.1', server.port, 'pw', timeout=2),
+                              health_check_interval=3600)
+
+
+def test_stale_connection_is_retried_before_sending():
+    server = ScriptedServer(['idle_close'])
+    pool = make_pool(server)
+    pool.release(pool.acquire())
+    # 对端已关闭空闲连接，发送前即可发现，命令在新连接上只执行一次
+    assert pool.run(lambda conn: conn.command('give Steve diamond')) == 'ok give Steve diamond'
+    assert server.received == ['give Steve diamond']
+    pool.close()
+    server.close()
+
+
+def test_batch_retries_stale_connection():
+    server = ScriptedServer(['idle_close'])
+    manager = RCONManager()
+    manager.pool = make_pool(server)
+    manager.pool.release(manager.pool.acquire())
+    report = manager.batch(['whitelist add Steve', 'whitelist add Alex'])
+    assert [r.ok for r in report.results] == [True, True]
+    manager.disconnect()
+    server.close()
+
+
+def test_failure_after_sending_is_not_retried():
+    server = ScriptedServer(['close'])
+    pool = make_pool(server)
+    with pytest.raises((OSError, RCONConnectionClosed)):
+        pool.run(lambda conn: conn.command('give Steve diamond'))
+    assert server.received == ['give Steve diamond']
+    pool.close()
+    server.close()
+
+
+def test_sentinel_survives_one_packet_per_recv():
+    server = OnePacketServer()
+    conn = RCONConnection('127.0.0.1', server.port, 'pw', timeout=2)
+    conn.connect()
+    assert conn.command('list') == 'ok list'
+    assert conn.command('long') == 'a' * 4096 + 'b'
+    conn.disconnect()
+    server.close()
+
+
+def test_async_sentinel_survives_one_packet_per_recv():
+    server = OnePacketServer()
+
+    async def scenario():
+        client = AsyncRCONClient('127.0.0.1', server.port, 'pw', timeout=2)
+        await client.connect()
+        assert await client.command('list') == 'ok list'
+        assert await client.command('long') == 'a' * 4096 + 'b'
+        await client.close()
+    asyncio.run(scenario())
+    server.close()
@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from mcrcon_new.timeseries import TimeSeriesStore, MINUTE, HOUR
+
+
+def test_flush_keeps_buckets_closed_between_flushes(tmp_path):
+    db_path = tmp_path / 'history.sqlite'
+    store = TimeSeriesStore(str(db_path))
+    store.open()
+    start = time.time() // HOUR * HOUR - 2 * HOUR
+    # 15 秒一个样本，但每 7 个样本才写入一次，分钟桶总是在两次写入之间结束
+    for i in range(40):
+        store.record('main', True, i % 5, 0.01, at=start + i * 15)
+        if i % 7 == 6:
+            store.flush()
+    store.close()
+
+    db = sqlite3.connect(db_path)
+    minutes = db.execute('SELECT count FROM rollups WHERE resolution = ? ORDER BY start', (MINUTE,)).fetchall()
+    hours = db.execute('SELECT count FROM rollups WHERE resolution = ?', (HOUR,)).fetchall()
+    assert minutes == [(4,)] * 10
+    assert hours == [(40,)]
+
+
+def test_reopen_restores_rollups(tmp_path):
+    db_path = str(tmp_path / 'history.sqlite')
+    store = TimeSeriesStore(db_path)
+    store.open()
+    start = time.time() // HOUR * HOUR - HOUR
+    store.record('main', True, 3, 0.02, at=start + 15)
+    store.record('main', False, 0, 0.0, at=start + 30)
+    store.close()
+
+    reopened = TimeSeriesStore(db_path)
+    reopened.open()
+    points = reopened.series('main', HOUR)
+    assert points[-1]['players_max'] == 3
+    assert points[-1]['availability'] == 0.5
+    reopened.close()